@@ -61,6 +61,19 @@ CREATE TABLE Annotation (
     image_id INT REFERENCES Image(image_id) ON DELETE CASCADE
 );
 
+-- Vecteur complet des features d'une image (ImageFeatures.extract_all_features)
+-- Une ligne par version de l'extracteur : une nouvelle version n'écrase pas l'ancienne
+-- tier : palier du mode éco utilisé ('full', 'reduced', 'metadata')
+DROP TABLE IF EXISTS image_features CASCADE;
+CREATE TABLE image_features (
+    image_id INT NOT NULL REFERENCES Image(image_id) ON DELETE CASCADE,
+    extractor_version INT NOT NULL,
+    features JSONB NOT NULL,
+    tier VARCHAR(20) NOT NULL DEFAULT 'full',
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (image_id, extractor_version)
+);
+
 -- 4. FONCTIONS -------------------------------------------------------------
 
 -- Création d’un utilisateur
@@ -119,8 +132,13 @@ CREATE OR REPLACE FUNCTION creation_image(
     p_avg_blue FLOAT,
     p_contrast FLOAT,
     p_edges_detected BOOLEAN,
-    p_localisation TEXT
+    p_localisation TEXT,
+    p_features JSONB DEFAULT NULL,
+    p_extractor_version INT DEFAULT NULL,
+    p_tier VARCHAR DEFAULT 'full'
 ) RETURNS VOID AS $$
+DECLARE
+    v_image_id INT;
 BEGIN
     INSERT INTO Image (
         user_id, file_path, name_image, size, width, height,
@@ -128,7 +146,13 @@ BEGIN
     ) VALUES (
         p_user_id, p_file_path, p_name_image, p_size, p_width, p_height,
         p_avg_red, p_avg_green, p_avg_blue, p_contrast, p_edges_detected, p_localisation
-    );
+    )
+    RETURNING image_id INTO v_image_id;
+
+    IF p_features IS NOT NULL THEN
+        INSERT INTO image_features (image_id, extractor_version, features, tier)
+        VALUES (v_image_id, p_extractor_version, p_features, p_tier);
+    END IF;
 END;
 $$ LANGUAGE plpgsql;
 
@@ -185,6 +209,114 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Création d’une image et de son annotation en un seul appel (une transaction)
+-- Retourne l'identifiant de l'image créée ; pas d'annotation si p_label est NULL,
+-- pas de ligne image_features si p_features est NULL
+CREATE OR REPLACE FUNCTION creation_image_with_annotation(
+    p_user_id INT,
+    p_file_path VARCHAR,
+    p_name_image VARCHAR,
+    p_size FLOAT,
+    p_width INT,
+    p_height INT,
+    p_avg_red FLOAT,
+    p_avg_green FLOAT,
+    p_avg_blue FLOAT,
+    p_contrast FLOAT,
+    p_edges_detected BOOLEAN,
+    p_localisation TEXT,
+    p_label annotation_label_v DEFAULT NULL,
+    p_source annotation_source DEFAULT 'manuel',
+    p_features JSONB DEFAULT NULL,
+    p_extractor_version INT DEFAULT NULL,
+    p_tier VARCHAR DEFAULT 'full'
+) RETURNS INT AS $$
+DECLARE
+    v_image_id INT;
+BEGIN
+    INSERT INTO Image (
+        user_id, file_path, name_image, size, width, height,
+        avg_red, avg_green, avg_blue, contrast, edges_detected, localisation
+    ) VALUES (
+        p_user_id, p_file_path, p_name_image, p_size, p_width, p_height,
+        p_avg_red, p_avg_green, p_avg_blue, p_contrast, p_edges_detected, p_localisation
+    )
+    RETURNING image_id INTO v_image_id;
+
+    IF p_label IS NOT NULL THEN
+        INSERT INTO Annotation (image_id, label, source)
+        VALUES (v_image_id, p_label, p_source);
+    END IF;
+
+    IF p_features IS NOT NULL THEN
+        INSERT INTO image_features (image_id, extractor_version, features, tier)
+        VALUES (v_image_id, p_extractor_version, p_features, p_tier);
+    END IF;
+
+    RETURN v_image_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Création d'un lot d'images avec leurs annotations et leurs features en un seul
+-- appel (une transaction : tout le lot ou rien)
+-- p_images : [{user_id, file_path, name_image, size, ..., localisation,
+--              label, source, features, tier}, ...] ; label et features optionnels
+-- Retourne les identifiants des images créées, dans l'ordre du lot
+CREATE OR REPLACE FUNCTION creation_images_batch(
+    p_images JSONB,
+    p_extractor_version INT DEFAULT NULL
+) RETURNS INT[] AS $$
+DECLARE
+    v_item JSONB;
+    v_ids INT[] := '{}';
+BEGIN
+    FOR v_item IN
+        SELECT t.value FROM jsonb_array_elements(p_images) WITH ORDINALITY AS t(value, position)
+        ORDER BY t.position
+    LOOP
+        v_ids := array_append(v_ids, creation_image_with_annotation(
+            (v_item->>'user_id')::INT,
+            v_item->>'file_path',
+            v_item->>'name_image',
+            (v_item->>'size')::FLOAT,
+            (v_item->>'width')::INT,
+            (v_item->>'height')::INT,
+            (v_item->>'avg_red')::FLOAT,
+            (v_item->>'avg_green')::FLOAT,
+            (v_item->>'avg_blue')::FLOAT,
+            (v_item->>'contrast')::FLOAT,
+            (v_item->>'edges_detected')::BOOLEAN,
+            v_item->>'localisation',
+            (v_item->>'label')::annotation_label_v,
+            COALESCE(v_item->>'source', 'manuel')::annotation_source,
+            NULLIF(v_item->'features', 'null'::JSONB),
+            p_extractor_version,
+            COALESCE(v_item->>'tier', 'full')
+        ));
+    END LOOP;
+
+    RETURN v_ids;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Enregistrement (ou remplacement) des features d'une image pour une version de l'extracteur
+-- Utilisé par la re-classification du mode éco et le recalcul après changement de version
+CREATE OR REPLACE FUNCTION creation_image_features(
+    p_image_id INT,
+    p_extractor_version INT,
+    p_features JSONB,
+    p_tier VARCHAR DEFAULT 'full'
+) RETURNS VOID AS $$
+BEGIN
+    INSERT INTO image_features (image_id, extractor_version, features, tier)
+    VALUES (p_image_id, p_extractor_version, p_features, p_tier)
+    ON CONFLICT (image_id, extractor_version) DO UPDATE
+    SET features = EXCLUDED.features,
+        tier = EXCLUDED.tier,
+        computed_at = CURRENT_TIMESTAMP;
+END;
+$$ LANGUAGE plpgsql;
+
 -- Modification d’une annotation
 CREATE OR REPLACE FUNCTION modif_annotation(
     p_annotation_id INT,
@@ -259,6 +391,65 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Statistiques de toutes les villes en une seule requête (tableau de bord)
+CREATE OR REPLACE FUNCTION stats_par_ville()
+RETURNS TABLE(ville TEXT, pleines BIGINT, vides BIGINT, non_annotées BIGINT) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT i.localisation::TEXT,
+           COUNT(*) FILTER (WHERE a.label = 'plein'),
+           COUNT(*) FILTER (WHERE a.label = 'vide'),
+           COUNT(*) FILTER (WHERE a.annotation_id IS NULL)
+    FROM Image i
+    LEFT JOIN Annotation a ON a.image_id = i.image_id
+    WHERE i.localisation IS NOT NULL AND i.localisation <> ''
+    GROUP BY i.localisation
+    ORDER BY i.localisation;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Agrégats du tableau de bord (comptes par label, taille moyenne, histogramme des tailles)
+CREATE OR REPLACE FUNCTION dashboard_summary(p_buckets INTEGER DEFAULT 20)
+RETURNS JSON AS $$
+DECLARE
+    result JSON;
+BEGIN
+    WITH annotated AS (
+        SELECT a.label, i.size
+        FROM Annotation a
+        JOIN Image i ON i.image_id = a.image_id
+        WHERE a.label IS NOT NULL AND i.size IS NOT NULL
+    ),
+    bounds AS (
+        SELECT MIN(size) AS min_size, MAX(size) AS max_size FROM annotated
+    ),
+    buckets AS (
+        SELECT LEAST(width_bucket(a.size, b.min_size, b.max_size + 1e-9, p_buckets), p_buckets) AS bucket,
+               COUNT(*) AS n
+        FROM annotated a, bounds b
+        GROUP BY 1
+    )
+    SELECT json_build_object(
+        'total', (SELECT COUNT(*) FROM annotated),
+        'avg_size', (SELECT AVG(size) FROM annotated),
+        'min_size', b.min_size,
+        'max_size', b.max_size,
+        'labels', COALESCE((
+            SELECT json_agg(json_build_object('label', label, 'count', n) ORDER BY n DESC, label)
+            FROM (SELECT label, COUNT(*) AS n FROM annotated GROUP BY label) l
+        ), '[]'::json),
+        'size_histogram', COALESCE((
+            SELECT json_agg(json_build_object('bucket', bucket, 'count', n) ORDER BY bucket)
+            FROM buckets
+        ), '[]'::json)
+    )
+    INTO result
+    FROM bounds b;
+
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql;
+
 CREATE OR REPLACE FUNCTION verify_password(p_email VARCHAR, p_password VARCHAR)
 RETURNS BOOLEAN AS $$
 DECLARE
@@ -344,6 +535,25 @@ END;
 $$ LANGUAGE plpgsql;
 
 
+-- Mise à jour de plusieurs seuils en une transaction
+-- p_thresholds : {"nom_regle": valeur, ...} ; les noms inconnus sont ignorés
+CREATE OR REPLACE FUNCTION bulk_update_thresholds(
+    p_thresholds JSONB
+) RETURNS INTEGER AS $$
+DECLARE
+    nb_updated INTEGER;
+BEGIN
+    UPDATE classification_rules r
+    SET threshold_value = t.value::DOUBLE PRECISION
+    FROM jsonb_each_text(p_thresholds) AS t(key, value)
+    WHERE r.rule_name = t.key;
+
+    GET DIAGNOSTICS nb_updated = ROW_COUNT;
+    RETURN nb_updated;
+END;
+$$ LANGUAGE plpgsql;
+
+
 -- Création de nos règles
 
 INSERT INTO classification_rules 
@@ -1,26 +1,36 @@
 import os
+import sys
+import time
 import locale
-from flask import Flask, render_template
-from backend.routes.upload_routes import upload_bp
-from backend.routes.user_routes import user_bp
-from backend.routes.annotation_routes import annotate_bp
-from backend.routes.auth_routes import auth_bp
-from backend.routes.dashboard_routes import dashboard_bp
-from backend.routes.greenit_routes import greenit_bp
+import logging
+import importlib
+from flask import Flask, render_template, request, g, Response
 from datetime import datetime
 
+from backend.config import LOG_LEVEL, MAX_REQUEST_BYTES
+from backend.utils import metrics, profiler
+from backend.services import footprint, eco_mode
+
+request_logger = logging.getLogger("backend.request")
+
 
 # === Chemins absolus pour les dossiers templates et statics ===
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 TEMPLATES_FOLDER = os.path.join(BASE_DIR, "..", "frontend")  # ../frontend (ex-templates)
 STATIC_FOLDER = os.path.join(BASE_DIR, "..", "static")       # ../static
 
-# === Création de l'application Flask ===
-app = Flask(__name__, template_folder=TEMPLATES_FOLDER, static_folder=STATIC_FOLDER)
-app.secret_key = "dev_une_clé_pas_sécurisée"
-
-# === Configuration du dossier d'upload ===
-app.config['UPLOAD_FOLDER'] = os.path.join(BASE_DIR, "uploads")
+# === Blueprints (module, attribut, préfixe) ===
+# Les modules sont importés par create_app() : les dépendances lourdes
+# (pandas, matplotlib, cv2) ne sont chargées qu'à l'appel des routes qui en ont besoin
+BLUEPRINTS = [
+    ("backend.routes.upload_routes", "upload_bp", "/upload"),
+    ("backend.routes.user_routes", "user_bp", "/users"),
+    ("backend.routes.annotation_routes", "annotate_bp", "/annotate"),
+    ("backend.routes.auth_routes", "auth_bp", "/auth"),
+    ("backend.routes.dashboard_routes", "dashboard_bp", "/dashboard"),
+    ("backend.routes.greenit_routes", "greenit_bp", "/greenit"),
+    ("backend.routes.profile_routes", "profile_bp", "/admin/profiles"),
+]
 
 # Pour avoir les mois et jours en français (ex : juillet)
 try:
@@ -42,40 +52,189 @@ def format_time_fr(value):
     except ValueError:
         return value
 
-app.jinja_env.filters['date_fr'] = format_date_fr
-app.jinja_env.filters['heure_fr'] = format_time_fr
-
-
-# === Enregistrement des blueprints avec des préfixes ===
-app.register_blueprint(upload_bp, url_prefix="/upload")
-app.register_blueprint(user_bp, url_prefix="/users")
-app.register_blueprint(annotate_bp, url_prefix="/annotate")
-app.register_blueprint(auth_bp, url_prefix="/auth")
-app.register_blueprint(dashboard_bp, url_prefix="/dashboard")
-app.register_blueprint(greenit_bp, url_prefix="/greenit")
 
-# === Pages principales ===
-@app.route("/")
-def home():
-    return render_template("accueil.html")
+def warm_up():
+    """
+    Pré-chauffe le chemin d'extraction avant de servir : import de cv2/numpy,
+    création du moteur de règles et classification d'une petite image
+    synthétique. La première vraie requête ne paie plus ces coûts.
+
+    Returns:
+        float: durée du pré-chauffage en millisecondes
+    """
+    start = time.perf_counter()
+
+    import io
+    import numpy as np
+    from PIL import Image
+    from backend.services.feature_extractor import ImageFeatures
+    from backend.services.classifier import BinClassifier
+    from backend.services.rules_engine import RulesEngine
+
+    # Image synthétique (dégradé) encodée en JPEG comme un vrai upload
+    gradient = np.linspace(0, 255, 64 * 64 * 3, dtype=np.uint8).reshape(64, 64, 3)
+    buffer = io.BytesIO()
+    Image.fromarray(gradient).save(buffer, format="JPEG")
+
+    features = ImageFeatures.from_bytes(buffer.getvalue()).extract_all_features()
+    BinClassifier(rules_engine=RulesEngine()).classify(features)
+
+    return (time.perf_counter() - start) * 1000
+
+
+def create_app(warmup=None):
+    """
+    Crée et configure l'application Flask.
+
+    Les temps d'import de chaque blueprint, la durée de création, celle du
+    pré-chauffage et la latence de la première requête sont enregistrés dans
+    app.config["STARTUP_TIMINGS"] (en millisecondes).
+
+    Args:
+        warmup (bool): Pré-chauffer le chemin d'extraction avant de servir.
+            Par défaut : variable d'environnement WDP_WARMUP ("1" pour activer)
+
+    Returns:
+        Flask: application prête à servir
+    """
+    app_start = time.perf_counter()
+    timings = {"imports": {}}
+    metrics.configure_logging(LOG_LEVEL)
+
+    # === Création de l'application Flask ===
+    app = Flask(__name__, template_folder=TEMPLATES_FOLDER, static_folder=STATIC_FOLDER)
+    app.secret_key = "dev_une_clé_pas_sécurisée"
+
+    # === Configuration du dossier d'upload ===
+    app.config['UPLOAD_FOLDER'] = os.path.join(BASE_DIR, "uploads")
+    # Corps refusé (413) pendant la lecture, avant d'être chargé en mémoire ;
+    # /upload/bulk relève la limite pour sa requête (BULK_MAX_REQUEST_BYTES)
+    app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
+    app.config['STARTUP_TIMINGS'] = timings
+
+    app.jinja_env.filters['date_fr'] = format_date_fr
+    app.jinja_env.filters['heure_fr'] = format_time_fr
+
+    # === Enregistrement des blueprints avec des préfixes ===
+    for module_name, attribute, prefix in BLUEPRINTS:
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        timings["imports"][module_name] = round((time.perf_counter() - start) * 1000, 2)
+        app.register_blueprint(getattr(module, attribute), url_prefix=prefix)
+
+    # === Pages principales ===
+    @app.route("/")
+    def home():
+        return render_template("accueil.html")
+
+    @app.route("/help")
+    def aide():
+        return render_template("aide.html")
+
+    @app.route("/privacy")
+    def privacy():
+        return render_template("privacy.html")
+
+    @app.route("/terms")
+    def terms():
+        return render_template("terms.html")
+
+    @app.route("/cookies")
+    def cookies():
+        return render_template("cookies.html")
+
+    # === Mesure de la latence de la première requête ===
+    @app.before_request
+    def _start_first_request_timer():
+        if "first_request_ms" not in timings:
+            g.request_start = time.perf_counter()
+
+    @app.after_request
+    def _record_first_request(response):
+        if "first_request_ms" not in timings and "request_start" in g:
+            timings["first_request_ms"] = round((time.perf_counter() - g.request_start) * 1000, 2)
+            timings["first_request_path"] = request.path
+            app.logger.info("Première requête %s servie en %.1f ms", request.path, timings["first_request_ms"])
+        return response
+
+    # === Durée de chaque requête et de ses étapes (voir utils/metrics.py) ===
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics_start = time.perf_counter()
+        g.metrics_token = metrics.start_request()
+
+    @app.after_request
+    def _record_request_metrics(response):
+        if "metrics_token" not in g:
+            return response
+        elapsed = time.perf_counter() - g.metrics_start
+        stages = metrics.end_request(g.pop("metrics_token"))
+        endpoint = request.url_rule.rule if request.url_rule else "<inconnu>"
+        metrics.observe(metrics.REQUEST_METRIC, elapsed,
+                        endpoint=endpoint, method=request.method, status=response.status_code)
+
+        stages["total"] = elapsed
+        response.headers["Server-Timing"] = metrics.server_timing(stages)
+        request_logger.info("%s %s", request.method, request.path, extra={
+            "status": response.status_code,
+            "ms": round(elapsed * 1000, 1),
+            **{f"{name}_ms": round(seconds * 1000, 1) for name, seconds in stages.items() if name != "total"},
+        })
+        return response
+
+    # === Profilage à la demande (admin, X-Profile: 1 ou ?profile=1) ===
+    profiler.init_app(app)
+
+    # === Empreinte énergétique des classifications (page Green IT) ===
+    footprint.init_app(app)
+
+    # === Mode éco : palier de classification selon la charge ===
+    eco_mode.init_app(app)
+
+    @app.route("/metrics")
+    def prometheus_metrics():
+        """Histogrammes de latence + compteurs des caches et de l'admission (format Prometheus)"""
+        from backend.utils.ttl_cache import get_cache_stats
+
+        caches = get_cache_stats()
+        # L'admission n'est comptée que si elle a déjà servi (évite d'importer PIL pour un scrape)
+        admission = sys.modules.get("backend.services.admission")
+        decisions = [(key, n) for key, n in admission.get_admission_stats().items() if ":" in key] if admission else []
+        counters = {
+            f"wdp_cache_{field}_total": (
+                f"Lectures des caches en mémoire ({field})", "counter",
+                [({"cache": name}, stats[field]) for name, stats in caches.items()],
+            )
+            for field in ("hits", "stale_hits", "misses", "refreshes", "errors")
+        }
+        counters["wdp_cache_entries"] = (
+            "Entrées présentes dans les caches en mémoire", "gauge",
+            [({"cache": name}, stats["size"]) for name, stats in caches.items()],
+        )
+        counters["wdp_admission_decisions_total"] = (
+            "Décisions d'admission des images", "counter",
+            [(dict(zip(("decision", "reason"), key.split(":", 1))), n) for key, n in decisions],
+        )
+        eco = eco_mode.governor.stats()
+        counters["wdp_eco_tier"] = (
+            "Palier de classification en cours (0 : full, 1 : reduced, 2 : metadata)", "gauge",
+            [({}, eco_mode.TIERS.index(eco["tier"]))],
+        )
+        counters["wdp_eco_tier_changes_total"] = (
+            "Changements de palier du mode éco", "counter", [({}, eco["tier_changes"])],
+        )
+        return Response(metrics.render_prometheus(counters), mimetype="text/plain; version=0.0.4")
+
+    timings["create_app_ms"] = round((time.perf_counter() - app_start) * 1000, 2)
+
+    if warmup is None:
+        warmup = os.environ.get("WDP_WARMUP") == "1"
+    if warmup:
+        timings["warmup_ms"] = round(warm_up(), 2)
+
+    app.logger.info("Application créée en %.1f ms (imports : %s)", timings["create_app_ms"], timings["imports"])
+    return app
 
 
-@app.route("/help")
-def aide():
-    return render_template("aide.html")
-
-@app.route("/privacy")
-def privacy():
-    return render_template("privacy.html")
-
-@app.route("/terms")
-def terms():
-    return render_template("terms.html")
-
-@app.route("/cookies")
-def cookies():
-    return render_template("cookies.html")
-
 if __name__ == "__main__":
-    app.run(debug=True)
-
+    create_app().run(debug=True)
@@ -1,199 +1,103 @@
-from flask import Blueprint, render_template, flash
-from backend.config import supabase
-import pandas as pd
-import matplotlib.pyplot as plt
-from datetime import datetime
-import numpy as np
-import os
-import matplotlib
-matplotlib.use('Agg')
-
+import logging
+from flask import Blueprint, render_template, flash, url_for, request, jsonify
+from backend.config import supabase, CITY_STATS_TTL
+from backend.services.dashboard_service import get_dashboard_summary, get_annotated_images_page, IMAGES_PAGE_SIZE
+from backend.utils.ttl_cache import ttl_cache
 
 
 dashboard_bp = Blueprint('dashboard', __name__)
+logger = logging.getLogger(__name__)
+
+EMPTY_DASHBOARD = {
+    "total_images": 0,
+    "full_percentage": 0,
+    "empty_percentage": 0,
+    "full_count": 0,
+    "empty_count": 0,
+    "size_histogram": [],
+    "plot_filename": None,
+}
+
 
 @dashboard_bp.route('/')
 def dashboard():
-    
     try:
-        print("Tentative de récupération des données depuis Supabase...")
-        # On récupère les annotations et la taille de l'image liée
-        response = supabase.table("annotation").select("label, image_id, image(size)").execute()
-        # Correction : APIResponse n'a pas d'attribut 'error', il faut vérifier 'status_code' et 'data'
-        if hasattr(response, 'status_code') and response.status_code >= 400:
-            print(f"Erreur Supabase: status_code={response.status_code}")
-            flash("Erreur lors de la récupération des données.")
-            return render_template("dashboard.html",
-                                   error="Erreur de récupération Supabase.",
-                                   total_images=0,
-                                   full_percentage=0,
-                                   empty_percentage=0,
-                                   full_count=0,
-                                   empty_count=0,
-                                   file_sizes=[],
-                                   plot_filename=None,
-                                   images=[])
-
-        data = getattr(response, 'data', None)
-        if not data:
+        # Comptes, pourcentages et tailles calculés par la base (une requête)
+        summary = get_dashboard_summary()
+        if not summary["total_images"]:
             flash("Aucune annotation trouvée.")
-            return render_template("dashboard.html",
-                                   error="Aucune donnée disponible.",
-                                   total_images=0,
-                                   full_percentage=0,
-                                   empty_percentage=0,
-                                   full_count=0,
-                                   empty_count=0,
-                                   file_sizes=[],
-                                   plot_filename=None,
-                                   images=[])
-
-        # DEBUG : Afficher les données brutes et le DataFrame
-        #print('DATA RECUE:', data)
-        df = pd.DataFrame(data)
-        #print('DATAFRAME:', df.head())
-
-        # Extraire la taille depuis le champ imbriqué 'image'
-        if 'image' in df.columns:
-            df['size'] = df['image'].apply(lambda x: x['size'] if isinstance(x, dict) and 'size' in x else None)
-
-        # Vérifiez que les colonnes attendues existent
-        if 'label' not in df.columns or 'size' not in df.columns:
-            flash("Champs manquants dans les données.")
-            return render_template("dashboard.html",
-                                   error="Champs manquants dans les données.",
-                                   total_images=0,
-                                   full_percentage=0,
-                                   empty_percentage=0,
-                                   full_count=0,
-                                   empty_count=0,
-                                   file_sizes=[],
-                                   plot_filename=None,
-                                   images=[])
-
-        # Nettoyer les valeurs manquantes
-        df = df.dropna(subset=['label', 'size'])
-        total_images = len(df)
-        full_count = df['label'].value_counts().get('plein', 0)
-        empty_count = df['label'].value_counts().get('vide', 0)
-        full_percentage = round((full_count / total_images) * 100, 2) if total_images > 0 else 0
-        empty_percentage = round((empty_count / total_images) * 100, 2) if total_images > 0 else 0
-        file_sizes = df['size'].dropna().tolist() if 'size' in df.columns else []
-
-        # Conversion des types de données
-        total_images = int(total_images)
-        full_count = int(full_count)
-        empty_count = int(empty_count)
-        file_sizes = [float(x) for x in file_sizes]
-        # Calcul de la taille moyenne des fichiers (en Ko)
-        if file_sizes:
-            moyenne_taille = round(np.mean(file_sizes) / 1024, 2)
-        else:
-            moyenne_taille = 0.0
-
-        # Générer un graphique matplotlib
-        import os
-        plot_dir = os.path.join('static', 'plots')
-        if not os.path.exists(plot_dir):
-            os.makedirs(plot_dir)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        plot_filename = f'plots/distribution_{timestamp}.png'
-        filepath = os.path.join('static', plot_filename)
-        radar_filename = f'plots/radar_{timestamp}.png'
-        radar_filepath = os.path.join('static', radar_filename)
-
-        # Crée le graphique APRES plt.figure
-        plt.figure(figsize=(10, 6))
-        df['label'].value_counts().plot(kind='bar', color=['red', 'green'])
-        plt.title("Répartition des annotations")
-        plt.xlabel("État")
-        plt.ylabel("Nombre d'images")
-        plt.xticks(rotation=0)
-        plt.tight_layout()
-        plt.savefig(filepath)
-        plt.close()
-
-        try:
-            # Crée le graphique à barres
-            plt.figure(figsize=(10, 6))
-            df['label'].value_counts().plot(kind='bar', color=['red', 'green'])
-            plt.title("Répartition des annotations")
-            plt.xlabel("État")
-            plt.ylabel("Nombre d'images")
-            plt.xticks(rotation=0)
-            plt.tight_layout()
-            plt.savefig(filepath)
-            plt.close()
-        except Exception as plot_err:
-            print(f"Erreur lors de la génération des graphiques : {plot_err}")
-            flash("Erreur lors de la génération des graphiques.")
+            return render_template("dashboard.html", error="Aucune donnée disponible.", **EMPTY_DASHBOARD)
 
+        # Graphique matplotlib : rendu seulement quand les comptes changent
+        from backend.services.chart_cache import get_distribution_chart
+        plot_filename = get_distribution_chart(summary["label_counts"])
 
         city_stats = get_city_stats()
         return render_template("dashboard.html",
-                               total_images=total_images,
-                               full_percentage=full_percentage,
-                               empty_percentage=empty_percentage,
-                               full_count=full_count,
-                               empty_count=empty_count,
-                               file_sizes=file_sizes,
+                               total_images=summary["total_images"],
+                               full_percentage=summary["full_percentage"],
+                               empty_percentage=summary["empty_percentage"],
+                               full_count=summary["full_count"],
+                               empty_count=summary["empty_count"],
+                               size_histogram=summary["size_histogram"],
                                plot_filename=plot_filename,
-                               images=data,
-                               moyenne_taille=moyenne_taille,
-                                radar_filename=radar_filename,
-                                city_stats=city_stats)
+                               moyenne_taille=summary["moyenne_taille"],
+                               images_page_size=IMAGES_PAGE_SIZE,
+                               city_stats=city_stats)
 
-    except Exception as e:
-        print(f"Erreur critique : {e}")
+    except Exception:
+        logger.exception("Erreur critique lors du chargement du tableau de bord")
         flash("Erreur critique lors du chargement du tableau de bord.")
-        return render_template("dashboard.html",
-                               error="Erreur critique.",
-                               total_images=0,
-                               full_percentage=0,
-                               empty_percentage=0,
-                               full_count=0,
-                               empty_count=0,
-                               file_sizes=[],
-                               plot_filename=None,
-                               images=[])
-    
+        return render_template("dashboard.html", error="Erreur critique.", **EMPTY_DASHBOARD)
 
 
-def get_city_stats():
-    villes_possibles = [
-        "Paris", "Lyon", "Marseille", "Toulouse", "Nice",
-        "Lille", "Nantes", "Strasbourg", "Bordeaux", "Montpellier",
-        "Rennes", "Reims", "Le Havre"
+@dashboard_bp.route('/images')
+def images():
+    """
+    Liste paginée des images annotées (JSON), chargée au fil du défilement.
+    Paramètres : after (curseur renvoyé par la page précédente), limit
+    """
+    try:
+        after = request.args.get('after', type=int)
+        limit = request.args.get('limit', IMAGES_PAGE_SIZE, type=int)
+        rows, next_cursor = get_annotated_images_page(after=after, limit=limit)
+    except Exception:
+        logger.exception("Erreur récupération des images")
+        return jsonify({"error": "Erreur lors de la récupération des images."}), 500
+
+    items = [
+        {
+            "label": row["label"],
+            "thumb_url": url_for('upload.uploaded_file', filename=row["name_image"], variant="thumb"),
+            "url": url_for('upload.uploaded_file', filename=row["name_image"], variant="display"),
+        }
+        for row in rows
+    ]
+    return jsonify({"items": items, "next": next_cursor})
+
+
+@ttl_cache(CITY_STATS_TTL)
+def fetch_city_stats():
+    """
+    Comptes plein / vide / non annoté par ville, en une seule requête
+    (fonction stats_par_ville de Data/schema.sql). Les villes sont celles
+    présentes dans les données.
+    """
+    response = supabase.rpc("stats_par_ville", {}).execute()
+    return [
+        {
+            "ville": row["ville"],
+            "pleines": row["pleines"] or 0,
+            "vides": row["vides"] or 0,
+            "non_annotées": row["non_annotées"] or 0
+        }
+        for row in (response.data or [])
     ]
 
-    stats = []
-
-    for ville in villes_possibles:
-        try:
-            pleines_resp = supabase.rpc("nb_poubelles_pleines", {"par_ville": ville}).execute()
-            vides_resp = supabase.rpc("nb_poubelles_vides", {"par_ville": ville}).execute()
-            non_annot_resp = supabase.rpc("nb_poubelles_non_annotées", {"par_ville": ville}).execute()
-
-
-            pleines = pleines_resp.data if pleines_resp.data is not None else 0
-            vides = vides_resp.data if vides_resp.data is not None else 0
-            non_annotées = non_annot_resp.data if non_annot_resp.data is not None else 0
-
-            stats.append({
-                "ville": ville,
-                "pleines": pleines,
-                "vides": vides,
-                "non_annotées": non_annotées
-            })
-
-        except Exception as e:
-            print(f"Erreur récupération stats pour {ville} : {e}")
-            stats.append({
-                "ville": ville,
-                "pleines": 0,
-                "vides": 0,
-                "non_annotées": 0
-            })
-
-    return stats
 
+def get_city_stats():
+    try:
+        return fetch_city_stats()
+    except Exception:
+        logger.exception("Erreur récupération stats par ville")
+        return []
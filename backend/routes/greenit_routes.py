@@ -1,12 +1,19 @@
 from flask import Blueprint, render_template, send_from_directory
 import os
 from flask import abort
+from backend.services import footprint
 
 greenit_bp = Blueprint('greenit', __name__)
 
 @greenit_bp.route('/')
 def greenit():
-    return render_template('greenit.html')
+    # Empreinte mesurée des classifications (voir services/footprint.py)
+    return render_template(
+        'greenit.html',
+        footprint_days=footprint.daily_summary(days=14),
+        feature_costs=footprint.feature_costs(days=7),
+        coefficients=footprint.coefficients()
+    )
 
 @greenit_bp.route('/documents/<path:filename>')
 def download_document(filename):
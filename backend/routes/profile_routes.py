@@ -0,0 +1,38 @@
+from flask import Blueprint, jsonify, send_file, abort, Response, request
+from backend.utils.decorators import admin_required
+from backend.utils.profiler import list_profiles, profile_path, profile_summary
+
+profile_bp = Blueprint('profile', __name__)
+
+
+@profile_bp.route('/')
+@admin_required
+def profiles():
+    """Liste des profils enregistrés (JSON), du plus récent au plus ancien"""
+    return jsonify(list_profiles())
+
+
+@profile_bp.route('/<profile_id>')
+@admin_required
+def download_profile(profile_id):
+    """Fichier pstats brut (python -m pstats, snakeviz...)"""
+    path = profile_path(profile_id)
+    if path is None:
+        abort(404)
+    try:
+        return send_file(path, as_attachment=True, download_name=f"{profile_id}.pstats")
+    except FileNotFoundError:
+        abort(404)
+
+
+@profile_bp.route('/<profile_id>/summary')
+@admin_required
+def show_profile_summary(profile_id):
+    """Fonctions les plus coûteuses (texte) ; ?sort=tottime|cumulative&limit=n"""
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'ncalls'):
+        sort = 'cumulative'
+    summary = profile_summary(profile_id, limit=request.args.get('limit', 40, type=int), sort=sort)
+    if summary is None:
+        abort(404)
+    return Response(summary, mimetype="text/plain")
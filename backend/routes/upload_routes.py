@@ -1,14 +1,35 @@
+import io
 import os
-from flask import Blueprint, render_template, request, redirect, flash, url_for, current_app, send_from_directory, session, jsonify
-from backend.services.image_service import insert_image_metadata, insert_annotation, get_image_id_by_filename
-from backend.services.feature_extractor import calculate_image_properties, ImageFeatures
-from backend.services.user_service import  get_user_id_by_email
-from backend.utils.helpers import allowed_file, generate_unique_filename
+import json
+import logging
+from flask import Blueprint, render_template, request, redirect, flash, url_for, current_app, send_from_directory, session, jsonify, Response, stream_with_context
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
+from backend.config import BULK_MAX_REQUEST_BYTES
+from backend.services.image_service import create_image_with_annotation
+from backend.services.user_service import get_anon_user_id
+from backend.utils.helpers import allowed_file, VILLES_POSSIBLES
 from backend.services.rule_service import get_all_rules, update_rule_threshold, reset_all_thresholds
-from backend.services.classifier import BinClassifier
-from backend.services.rules_engine import RulesEngine
+from backend.services import eco_mode
+from backend.services.storage import (
+    store_bytes, relative_path, resolve_path, is_content_name,
+    generate_derivatives, derivative_name, VARIANTS
+)
 
 upload_bp = Blueprint('upload', __name__)
+logger = logging.getLogger(__name__)
+
+
+@upload_bp.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    """Corps de requête au-delà de MAX_CONTENT_LENGTH (refusé avant d'être lu)"""
+    limit = request.max_content_length or 0
+    message = f"Requête trop volumineuse (max {limit / 1024 / 1024:.0f} Mo)"
+    if request.endpoint == 'upload.upload_file':
+        flash(message, 'error')
+        return redirect(request.url)
+    return jsonify({"status": "error", "message": message}), 413
+
 
 @upload_bp.route('/', methods=['GET', 'POST'])
 def upload_file():
@@ -28,128 +49,242 @@ def upload_file():
             flash("Fichier non autorisé.", 'error')
             return redirect(request.url)
 
-        # Sauvegarde du fichier
+        # Formulaire validé avant toute écriture : un upload refusé ne laisse
+        # ni original ni variantes sans ligne en base
+        location = request.form.get("location")
+        if location not in VILLES_POSSIBLES:
+            flash("La ville sélectionnée n'est pas autorisée.", "error")
+            return redirect(request.url)
+
+        choice = request.form.get("choice")
+        if choice and choice.lower() in ["vide", "plein"] and session.get("role") != "Admin":
+            flash("Seuls les administrateurs peuvent faire une annotation manuelle.", "error")
+            return redirect(request.url)
+
+        # Imports locaux : PIL/cv2/numpy ne sont chargés qu'au premier upload
+        from backend.services.admission import admit, ImageRejected
+        from backend.services.feature_extractor import ImageFeatures
+
+        # Admission sur l'en-tête seul, avant tout décodage et toute écriture
+        data = file.read()
+        try:
+            decision = admit(data)
+        except ImageRejected as e:
+            flash(str(e), 'error')
+            return redirect(request.url)
+
+        # Sauvegarde du fichier (stockage adressé par contenu)
         upload_folder = current_app.config['UPLOAD_FOLDER']
         ext = file.filename.rsplit('.', 1)[1].lower()
-        filename = generate_unique_filename(upload_folder, ext)
-        filepath = os.path.join(upload_folder, filename)
-        file.save(str(filepath))
+        filename, filepath, _ = store_bytes(upload_folder, data, ext)
+        generate_derivatives(filepath)
 
         # Infos du formulaire
         session["temp_date"] = request.form.get("date")
         session["temp_time"] = request.form.get("time")
         session["temp_notes"] = request.form.get("notes")
 
-        villes_possibles = [
-            "Paris", "Lyon", "Marseille", "Toulouse", "Nice",
-            "Lille", "Nantes", "Strasbourg", "Bordeaux", "Montpellier",
-            "Rennes", "Reims", "Le Havre"
-        ]
+        # Caractéristiques de l’image (un seul décodage, réutilisé pour la classification)
+        image_features = ImageFeatures.from_bytes(data, decision=decision, file_path=filepath)
+        props = image_features.image_data
+        size, width, height = props['size'], props['width'], props['height']
+        avg_r, avg_g, avg_b = props['avg_red'], props['avg_green'], props['avg_blue']
+        contrast, edges_detected = props['contrast'], props['edges_detected']
 
-        location = request.form.get("location")
-        if location not in villes_possibles:
-            flash("La ville sélectionnée n'est pas autorisée.", "error")
-            return redirect(request.url)
-
-        choice = request.form.get("choice")
-
-        # Caractéristiques de l’image
-        size, width, height, avg_r, avg_g, avg_b, contrast, edges_detected = calculate_image_properties(filepath)
-
-        # Insertion des métadonnées (sans date/time/notes)
         if "user_id" in session:
             user_id = session["user_id"]
         else:
-            user_id = get_user_id_by_email("anon@trashalyser.test")
-
-        insert_image_metadata(
-            filename=filename,
-            user_id=user_id,
-            location=location,
-            size=size,
-            width=width,
-            height=height,
-            avg_red=avg_r,
-            avg_green=avg_g,
-            avg_blue=avg_b,
-            contrast=contrast,
-            edges_detected=bool(edges_detected)  # ou int(edges_detected) si Supabase exige un entier
-        )
+            user_id = get_anon_user_id()
 
         # Annotation
-        image_id = get_image_id_by_filename(filename)
         label = None
         source = 'manuel'
+        tier = None
+        advanced_features = None  # Vecteur complet, enregistré avec l'image (table image_features)
 
         if choice == "IA":
-            # ✅ UTILISATION COMPLÈTE DU MOTEUR DE RÈGLES AVANCÉ
+            # ✅ MOTEUR DE RÈGLES AVANCÉ, au palier permis par la charge (mode éco)
             try:
-                # Créer le moteur de règles et le classifier
-                rules_engine = RulesEngine()
-                classifier = BinClassifier(rules_engine=rules_engine)
-                
-                # Extraire toutes les features avancées avec ImageFeatures
-                base_features = {
-                    'avg_red': avg_r,
-                    'avg_green': avg_g,
-                    'avg_blue': avg_b,
-                    'size': size,
-                    'width': width,
-                    'height': height,
-                    'contrast': contrast,
-                    'edges_detected': edges_detected,
-                    'file_path': filepath  # AJOUT CRITIQUE: le chemin vers l'image
-                }
-                
-                # Utiliser ImageFeatures pour extraire les features avancées
-                image_features = ImageFeatures(base_features)
-                advanced_features = image_features.extract_all_features()
-                
-                # Classification avec le moteur de règles sophistiqué
-                result = classifier.classify(advanced_features)
+                # ImageFeatures (image déjà décodée) : features selon le palier puis classification
+                advanced_features, result = eco_mode.classify(image_features)
                 prediction = result['prediction']
                 confidence = result['confidence']
-                
+                tier = result['tier']
+
                 label = prediction
                 source = 'auto'  # L'enum n'accepte que 'manuel' ou 'auto'
-                
-                # Log pour debugging
-                print(f"🤖 Classification IA: {prediction} (confiance: {confidence:.2f})")
-                print(f"⚙️ Règles actives: {len(result['details']['active_rules'])}")
-                print(f"📊 Score: {result['score']:.3f}")
-                
-            except Exception as e:
+
+                logger.info("Classification IA", extra={
+                    "prediction": prediction,
+                    "confidence": round(confidence, 3),
+                    "score": round(result['score'], 3),
+                    "active_rules": len(result['details']['active_rules']),
+                    "tier": tier,
+                })
+
+            except Exception:
                 # Fallback simple en cas d'erreur
-                print(f"❌ Erreur classification IA: {e}")
+                logger.exception("Erreur classification IA, repli sur la règle simple")
                 prediction = "plein" if avg_r < 100 and size > 150 else "vide"
                 label = prediction
                 source = 'auto'  # Utiliser 'auto' au lieu de 'auto (fallback)'
+                tier = eco_mode.METADATA
+                advanced_features = None
 
         elif choice and choice.lower() in ["vide", "plein"]:
-            if session.get("role") == "Admin":
-                label = choice.lower()
-                source = 'manuel'
-            else:
-                flash("Seuls les administrateurs peuvent faire une annotation manuelle.", "error")
-                return redirect(request.url)
-
-        if label and image_id:
-            print(f"🔍 DEBUG: Insertion annotation - image_id={image_id}, label='{label}', source='{source}'")
-            try:
-                result = insert_annotation(image_id=image_id, label=label, source=source)
-                print(f"✅ DEBUG: Annotation insérée avec succès - result: {result}")
-            except Exception as e:
-                print(f"❌ DEBUG: Erreur lors de l'insertion annotation: {e}")
-        else:
-            print(f"❌ DEBUG: Annotation NON insérée - label='{label}', image_id={image_id}")
+            # Rôle Admin vérifié avant l'enregistrement du fichier
+            label = choice.lower()
+            source = 'manuel'
+
+        # Vecteur complet enregistré aussi sans classification IA (calibration, analyses)
+        if choice != "IA":
+            tier = eco_mode.governor.tier()
+            advanced_features = eco_mode.extract_features(image_features, tier)
+
+        # Image + annotation + features insérées en un seul appel (sans date/time/notes)
+        image_id = create_image_with_annotation(
+            filename=filename,
+            user_id=user_id,
+            location=location,
+            size=size,
+            width=width,
+            height=height,
+            avg_red=avg_r,
+            avg_green=avg_g,
+            avg_blue=avg_b,
+            contrast=contrast,
+            edges_detected=bool(edges_detected),
+            label=label,
+            source=source,
+            features=advanced_features,
+            tier=tier
+        )
+        logger.debug("Image insérée", extra={"image_id": image_id, "label": label, "source": source})
+
+        # Palier dégradé : features complètes (et re-classification si auto) quand la charge retombe
+        if tier not in (None, eco_mode.FULL):
+            eco_mode.enqueue_rescore(image_id, filename, tier, label)
 
         return redirect(url_for("annotate.show_annotation", filename=filename))
     rules = get_all_rules()  # Ajouté pour le rendu HTML
     return render_template("upload.html",rules=rules)
 
+def _detach_uploads(files):
+    """
+    Flask ferme les fichiers de la requête à la fin de la vue, avant que la
+    réponse en flux ne soit produite : le générateur reprend les flux et la
+    requête garde des flux vides à fermer
+    """
+    detached = []
+    for file in files:
+        detached.append(FileStorage(stream=file.stream, filename=file.filename, content_type=file.content_type))
+        file.stream = io.BytesIO()
+    return detached
+
+
+@upload_bp.route('/bulk', methods=['POST'])
+def bulk_upload():
+    """
+    Route API d'ingestion en masse : plusieurs fichiers (champ `files`) et/ou
+    archives ZIP. Renvoie la progression fichier par fichier en NDJSON
+    (une ligne JSON par image traitée, puis un résumé final).
+    """
+    # Limite propre à l'ingestion en masse, fixée avant la lecture du corps
+    request.max_content_length = BULK_MAX_REQUEST_BYTES
+    files = request.files.getlist('files') + request.files.getlist('file')
+    files = [f for f in files if f and f.filename]
+    if not files:
+        return jsonify({
+            "status": "error",
+            "message": "Aucun fichier fourni"
+        }), 400
+
+    location = request.form.get("location")
+    if location not in VILLES_POSSIBLES:
+        return jsonify({
+            "status": "error",
+            "message": "La ville sélectionnée n'est pas autorisée."
+        }), 400
+
+    choice = request.form.get("choice")
+    if choice and choice.lower() in ["vide", "plein"]:
+        if session.get("role") != "Admin":
+            return jsonify({
+                "status": "error",
+                "message": "Seuls les administrateurs peuvent faire une annotation manuelle."
+            }), 403
+        choice = choice.lower()
+
+    user_id = session.get("user_id") or get_anon_user_id()
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+
+    from backend.services.bulk_ingest import iter_upload_entries, ingest_entries
+
+    files = _detach_uploads(files)
+
+    def generate():
+        try:
+            events = ingest_entries(
+                iter_upload_entries(files),
+                upload_folder=upload_folder,
+                user_id=user_id,
+                location=location,
+                choice=choice,
+            )
+            for event in events:
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        finally:
+            for file in files:
+                file.close()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+# Durée de cache : un fichier adressé par contenu ne change jamais
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+LEGACY_MAX_AGE = 3600
+
+
 @upload_bp.route('/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+    """
+    Sert une image uploadée (ou sa variante réduite avec ?variant=thumb|display).
+
+    - ETag fort dérivé du hash du contenu, Cache-Control long et immutable
+    - Requêtes conditionnelles (If-None-Match -> 304) et Range gérées par send_file
+    - Les variantes manquantes (anciens uploads) sont générées à la demande,
+      après admission ; une image refusée ou illisible est servie telle quelle
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+
+    variant = request.args.get('variant')
+    if variant in VARIANTS:
+        derivative = derivative_name(filename, variant)
+        if os.path.isfile(resolve_path(upload_folder, derivative)):
+            filename = derivative
+        else:
+            original_path = resolve_path(upload_folder, filename)
+            if os.path.isfile(original_path):
+                from backend.services.admission import admit, ImageRejected
+                try:
+                    admit(original_path)
+                    generate_derivatives(original_path)
+                    filename = derivative
+                except (ImageRejected, OSError) as e:
+                    logger.warning("Variante non générée, original servi",
+                                   extra={"file": filename, "variant": variant, "error": str(e)})
+
+    if is_content_name(filename):
+        response = send_from_directory(
+            upload_folder, relative_path(filename),
+            etag=filename.rsplit('.', 1)[0],
+            max_age=IMMUTABLE_MAX_AGE,
+        )
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    return send_from_directory(upload_folder, filename, max_age=LEGACY_MAX_AGE)
 
 
 
@@ -220,57 +355,41 @@ def classify_image():
                 "message": "Type de fichier non autorisé"
             }), 400
         
-        # Sauvegarder temporairement le fichier
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        ext = file.filename.rsplit('.', 1)[1].lower()
-        temp_filename = f"temp_classify.{ext}"
-        filepath = os.path.join(upload_folder, temp_filename)
-        file.save(str(filepath))
-        
+        from backend.services.admission import ImageRejected
+        from backend.services.feature_extractor import ImageFeatures
+
+        # Lecture en mémoire : pas de fichier temporaire, donc pas de collision
+        # entre requêtes concurrentes ni d'aller-retour disque
+        data = file.read()
+
+        # Extraire les features de l'image (admission puis un seul décodage)
         try:
-            # Extraire les features de l'image
-            size, width, height, avg_r, avg_g, avg_b, contrast, edges_detected = calculate_image_properties(filepath)
-            
-            # Utiliser le moteur de règles pour classifier
-            rules_engine = RulesEngine()
-            classifier = BinClassifier(rules_engine=rules_engine)
-            
-            # Extraire toutes les features avancées
-            base_features = {
-                'avg_red': avg_r,
-                'avg_green': avg_g,
-                'avg_blue': avg_b,
-                'size': size,
-                'width': width,
-                'height': height,
-                'contrast': contrast,
-                'edges_detected': edges_detected,
-                'file_path': filepath  # AJOUT CRITIQUE: le chemin vers l'image
-            }
-            
-            image_features = ImageFeatures(base_features)
-            advanced_features = image_features.extract_all_features()
-            
-            # Classification
-            result = classifier.classify(advanced_features)
-            
+            image_features = ImageFeatures.from_bytes(data)
+        except ImageRejected as e:
+            # 400 : fichier illisible ; 413 : trop lourd ou trop de pixels
             return jsonify({
-                "status": "success",
-                "prediction": result['prediction'],
-                "confidence": round(result['confidence'], 3),
-                "score": round(result['score'], 3),
-                "active_rules": result['details']['active_rules'],
-                "rules_count": len(result['details']['active_rules']),
-                "advanced_rules": result.get('advanced_rules', []),
-                "features_extracted": len(advanced_features),
-                "message": f"Classification réussie: {result['prediction']} (confiance: {result['confidence']:.1%})"
-            })
-            
-        finally:
-            # Supprimer le fichier temporaire
-            if os.path.exists(filepath):
-                os.remove(filepath)
-        
+                "status": "error",
+                "message": str(e)
+            }), e.http_status
+
+        # Features au palier permis par la charge (mode éco) puis classification
+        advanced_features, result = eco_mode.classify(image_features)
+
+        return jsonify({
+            "status": "success",
+            "prediction": result['prediction'],
+            "confidence": round(result['confidence'], 3),
+            "score": round(result['score'], 3),
+            "active_rules": result['details']['active_rules'],
+            "rules_count": len(result['details']['active_rules']),
+            "advanced_rules": result.get('advanced_rules', []),
+            "features_extracted": len(advanced_features),
+            "tier": result['tier'],
+            "message": f"Classification réussie: {result['prediction']} (confiance: {result['confidence']:.1%})"
+        })
+
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         current_app.logger.error(f"Error in classify_image: {str(e)}")
         return jsonify({
@@ -285,6 +404,10 @@ def test_classifier():
     Route API pour tester le moteur de règles avec des paramètres personnalisés
     """
     try:
+        from backend.services.feature_extractor import ImageFeatures
+        from backend.services.classifier import BinClassifier
+        from backend.services.rules_engine import RulesEngine
+
         # Récupérer les features de test depuis la requête JSON
         data = request.get_json() or {}
         
@@ -1,12 +1,11 @@
 from flask import Blueprint, render_template
-from backend.config import supabase
+from backend.services.user_service import get_all_users
 
 user_bp = Blueprint("user", __name__)
 
 @user_bp.route('/')
 def users():
     try:
-        result = supabase.table("User").select("*").execute()
-        return render_template("users.html", users=result.data)
+        return render_template("users.html", users=get_all_users())
     except Exception as e:
         return f"Erreur lors de la récupération des utilisateurs : {e}"
@@ -0,0 +1,197 @@
+# backend/services/admission.py
+
+"""
+Admission des images avant décodage
+
+LOGIQUE GÉNÉRALE :
+- Seul l'en-tête est lu (Image.open est paresseux) : dimensions, mode,
+  format, JPEG progressif
+- Décision prise avant tout travail sur les pixels :
+    * "reject"    : fichier trop lourd ou trop de pixels (decompression bomb)
+    * "downscale" : image acceptée mais décodée à résolution réduite
+    * "accept"    : décodage normal
+- Chaque décision est comptabilisée (get_admission_stats) et chronométrée
+  (étapes "admission" et "decode" de utils/metrics.py)
+"""
+
+import io
+import os
+import math
+import threading
+from collections import Counter
+
+from PIL import Image
+
+from backend.config import MAX_UPLOAD_BYTES, MAX_IMAGE_PIXELS, DOWNSCALE_PIXELS
+from backend.utils.metrics import span
+
+# Garde-fou Pillow : au-delà de 2x cette limite, Image.open lève DecompressionBombError
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+class ImageRejected(ValueError):
+    """Image refusée à l'admission (trop lourde, trop grande ou illisible)"""
+    def __init__(self, message, decision=None):
+        super().__init__(message)
+        self.decision = decision
+
+    @property
+    def http_status(self):
+        """400 pour un fichier illisible, 413 pour une image trop lourde ou trop grande"""
+        reason = (self.decision or {}).get("reason")
+        return 400 if reason == "unreadable" else 413
+
+
+def _open(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(source))
+    return Image.open(source)
+
+
+def _byte_size(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    return os.path.getsize(source)
+
+
+def read_header(source):
+    """
+    Lit uniquement l'en-tête d'une image (aucun pixel n'est décodé).
+
+    Args:
+        source: chemin (str) ou contenu brut (bytes)
+
+    Returns:
+        dict: {width, height, pixels, mode, format, progressive, bytes}
+    """
+    with _open(source) as img:
+        width, height = img.size
+        return {
+            "width": width,
+            "height": height,
+            "pixels": width * height,
+            "mode": img.mode,
+            "format": img.format,
+            "progressive": bool(img.info.get("progressive") or img.info.get("progression")),
+            "bytes": _byte_size(source),
+        }
+
+
+def evaluate(header, max_bytes=MAX_UPLOAD_BYTES, max_pixels=MAX_IMAGE_PIXELS,
+             downscale_pixels=DOWNSCALE_PIXELS):
+    """
+    Décide du sort d'une image à partir de son en-tête.
+
+    Args:
+        header (dict): Résultat de read_header
+        max_bytes (int): Taille maximale acceptée
+        max_pixels (int): Nombre de pixels maximal accepté
+        downscale_pixels (int): Nombre de pixels au-delà duquel on décode en réduit
+
+    Returns:
+        dict: {"decision": "accept"|"downscale"|"reject", "reason": str,
+               "target_size": (w, h) ou None, **header}
+    """
+    decision = {**header, "decision": "accept", "reason": "ok", "target_size": None}
+
+    if header["bytes"] > max_bytes:
+        decision.update(decision="reject", reason="bytes")
+    elif header["pixels"] > max_pixels:
+        decision.update(decision="reject", reason="pixels")
+    elif header["pixels"] > downscale_pixels:
+        scale = math.sqrt(downscale_pixels / header["pixels"])
+        target = (max(1, int(header["width"] * scale)), max(1, int(header["height"] * scale)))
+        decision.update(decision="downscale", reason="pixels", target_size=target)
+
+    return decision
+
+
+def record(decision):
+    """Comptabilise une décision d'admission"""
+    with _stats_lock:
+        _stats[decision["decision"]] += 1
+        _stats[f"{decision['decision']}:{decision['reason']}"] += 1
+        if decision.get("progressive"):
+            _stats["progressive"] += 1
+
+
+def get_admission_stats():
+    """
+    Returns:
+        dict: Compteurs des décisions ({"accept": n, "reject:bytes": n, ...})
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+@span("admission")
+def admit(source):
+    """
+    Étape d'admission complète : en-tête, décision, comptabilisation.
+
+    Args:
+        source: chemin (str) ou contenu brut (bytes)
+
+    Returns:
+        dict: décision (voir evaluate)
+
+    Raises:
+        ImageRejected: si l'image est refusée ou illisible
+    """
+    try:
+        header = read_header(source)
+    except Image.DecompressionBombError as e:
+        # Dimensions de l'en-tête au-delà de la limite de Pillow : decompression bomb
+        decision = {"decision": "reject", "reason": "pixels"}
+        record(decision)
+        raise ImageRejected(f"Image trop grande : {e}", decision) from e
+    except (Image.UnidentifiedImageError, OSError) as e:
+        decision = {"decision": "reject", "reason": "unreadable"}
+        record(decision)
+        raise ImageRejected(f"Image illisible : {e}", decision) from e
+
+    decision = evaluate(header)
+    record(decision)
+
+    if decision["decision"] == "reject":
+        if decision["reason"] == "bytes":
+            message = f"Fichier trop volumineux ({header['bytes'] / 1024 / 1024:.1f} Mo, max {MAX_UPLOAD_BYTES / 1024 / 1024:.0f} Mo)"
+        else:
+            message = f"Image trop grande ({header['width']} x {header['height']} pixels)"
+        raise ImageRejected(message, decision)
+
+    return decision
+
+
+@span("decode")
+def open_admitted(source, decision):
+    """
+    Décode une image admise en RGB, en réduisant pendant le décodage si besoin.
+
+    LOGIQUE DU DÉCODAGE RÉDUIT :
+    - JPEG : Image.draft() demande au décodeur une mise à l'échelle DCT
+      (1/2, 1/4, 1/8) : les pixels pleine résolution ne sont jamais produits
+    - Autres formats : décodage puis réduction à la taille cible
+
+    Args:
+        source: chemin (str) ou contenu brut (bytes)
+        decision (dict): Résultat de admit / evaluate
+
+    Returns:
+        PIL.Image: image RGB ; info["original_size"] garde les dimensions d'origine
+    """
+    img = _open(source)
+    target = decision.get("target_size")
+    if decision["decision"] == "downscale" and target:
+        img.draft("RGB", target)
+        img = img.convert("RGB")
+        if img.width * img.height > DOWNSCALE_PIXELS:
+            img = img.resize(target, Image.BILINEAR)
+    else:
+        img = img.convert("RGB")
+
+    img.info["original_size"] = (decision["width"], decision["height"])
+    return img
@@ -0,0 +1,315 @@
+# backend/services/bulk_ingest.py
+
+"""
+Ingestion en masse d'images (plusieurs fichiers ou archive ZIP)
+
+LOGIQUE GÉNÉRALE :
+- Les entrées sont lues une par une (les ZIP sont parcourus entrée par entrée,
+  sans extraction complète sur disque)
+- Le décodage et l'extraction des features tournent sur un pool de processus
+  (le travail est CPU-bound, un processus par cœur)
+- Les insertions image / annotation / features sont regroupées par lots
+- Chaque fichier traité produit un événement de progression
+"""
+
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from backend.config import supabase, MAX_UPLOAD_BYTES, MAX_ZIP_RATIO
+from backend.services.feature_extractor import ImageFeatures, FEATURE_EXTRACTOR_VERSION
+from backend.services.image_service import invalidate_image
+from backend.services.storage import store_bytes, db_file_path, generate_derivatives, remove_stored
+from backend.utils.helpers import allowed_file
+
+DEFAULT_BATCH_SIZE = 50
+MAX_WORKERS = os.cpu_count() or 1
+
+_executor = None
+
+
+def get_executor():
+    """
+    Retourne le pool de processus partagé (créé au premier appel).
+    Un processus par cœur pour que le débit suive le nombre de cœurs.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+    return _executor
+
+
+def _read_bounded(stream):
+    """Lit au plus MAX_UPLOAD_BYTES octets ; None si le contenu est plus grand"""
+    data = stream.read(MAX_UPLOAD_BYTES + 1)
+    return data if len(data) <= MAX_UPLOAD_BYTES else None
+
+
+def _check_zip_entry(info):
+    """
+    Contrôle d'une entrée ZIP d'après son en-tête, avant toute décompression.
+
+    Returns:
+        str: motif du refus, ou None si l'entrée peut être lue
+    """
+    if info.file_size > MAX_UPLOAD_BYTES:
+        return f"Fichier trop volumineux ({info.file_size / 1024 / 1024:.1f} Mo, max {MAX_UPLOAD_BYTES / 1024 / 1024:.0f} Mo)"
+    if info.file_size > max(info.compress_size, 1) * MAX_ZIP_RATIO:
+        return "Taux de compression suspect (archive piégée ?)"
+    return None
+
+
+def iter_upload_entries(files):
+    """
+    Parcourt les fichiers envoyés et produit les entrées image une par une.
+
+    Les archives ZIP sont lues entrée par entrée : seule l'entrée courante
+    est en mémoire. Taille et taux de compression d'une entrée sont contrôlés
+    sur l'en-tête avant décompression, et la lecture est bornée à
+    MAX_UPLOAD_BYTES (l'en-tête d'une archive peut mentir).
+
+    Args:
+        files (list): Liste de FileStorage (werkzeug) ou d'objets fichier avec `filename`
+
+    Yields:
+        tuple: (nom_original, bytes, None) ou (nom_original, None, motif) si l'entrée est refusée
+    """
+    for file in files:
+        name = file.filename or ""
+        if name.lower().endswith(".zip"):
+            try:
+                archive = zipfile.ZipFile(file.stream)
+            except zipfile.BadZipFile:
+                yield name, None, "Archive ZIP illisible"
+                continue
+            with archive:
+                for info in archive.infolist():
+                    if info.is_dir():
+                        continue
+                    entry_name = os.path.basename(info.filename)
+                    # Ignore les fichiers cachés macOS (__MACOSX/._xxx)
+                    if not entry_name or entry_name.startswith("."):
+                        continue
+                    if not allowed_file(entry_name):
+                        yield entry_name, None, "Type de fichier non autorisé"
+                        continue
+                    reason = _check_zip_entry(info)
+                    if reason:
+                        yield entry_name, None, reason
+                        continue
+                    try:
+                        with archive.open(info) as entry:
+                            data = _read_bounded(entry)
+                    except (zipfile.BadZipFile, OSError) as e:
+                        yield entry_name, None, f"Entrée illisible : {e}"
+                        continue
+                    if data is None:
+                        yield entry_name, None, "Fichier trop volumineux"
+                    else:
+                        yield entry_name, data, None
+        elif allowed_file(name):
+            data = _read_bounded(file)
+            if data is None:
+                yield name, None, "Fichier trop volumineux"
+            else:
+                yield name, data, None
+        else:
+            yield name, None, "Type de fichier non autorisé"
+
+
+def image_record(image_features):
+    """
+    Colonnes de la table image calculées à partir des features d'une image
+    (types Python natifs, prêts pour l'insertion).
+    """
+    props = image_features.image_data
+    return {
+        "size": float(props["size"]),
+        "width": int(props["width"]),
+        "height": int(props["height"]),
+        "avg_red": float(props["avg_red"]),
+        "avg_green": float(props["avg_green"]),
+        "avg_blue": float(props["avg_blue"]),
+        "contrast": float(props["contrast"]),
+        "edges_detected": bool(props["edges_detected"]),
+    }
+
+
+def extract_image_record(filepath, classify=False):
+    """
+    Calcule les métadonnées et le vecteur complet des features d'une image
+    (et sa classification si demandée) et génère ses variantes réduites.
+    Exécuté dans un processus du pool : ne touche pas à la base.
+
+    Args:
+        filepath (str): Chemin de l'image sauvegardée
+        classify (bool): Lancer le moteur de règles sur l'image
+
+    Returns:
+        tuple: (dict des métadonnées, label ou None, dict des features)
+    """
+    # Admission + un seul décodage de l'image pour les propriétés et la classification
+    with open(filepath, "rb") as f:
+        image_features = ImageFeatures.from_bytes(f.read(), file_path=filepath)
+    generate_derivatives(filepath)
+    record = image_record(image_features)
+    features = image_features.extract_all_features()
+
+    label = None
+    if classify:
+        # Import local : évite de charger le moteur de règles quand on ne classe pas
+        from backend.services.classifier import BinClassifier
+        from backend.services.rules_engine import RulesEngine
+
+        label = BinClassifier(rules_engine=RulesEngine()).classify(features)["prediction"]
+
+    return record, label, {name: float(value) for name, value in features.items()}
+
+
+def flush_batch(pending):
+    """
+    Insère un lot d'images avec leurs annotations et leurs features en un seul
+    appel (fonction creation_images_batch de Data/schema.sql, une transaction) :
+    si l'appel échoue, aucune ligne du lot n'est enregistrée.
+
+    Args:
+        pending (list): Liste de tuples (ligne image, label, source) ou
+            (ligne image, label, source, features) ; features : dict calculé en
+            palier "full" par la version courante de l'extracteur, ou None
+
+    Returns:
+        list: image_id des images insérées, dans l'ordre du lot (un par entrée)
+
+    Raises:
+        RuntimeError: si la base ne renvoie pas un identifiant par image
+    """
+    if not pending:
+        return []
+
+    images = [
+        {**entry[0], "label": entry[1], "source": entry[2],
+         "features": entry[3] if len(entry) > 3 else None, "tier": "full"}
+        for entry in pending
+    ]
+    response = supabase.rpc("creation_images_batch", {
+        "p_images": images,
+        "p_extractor_version": FEATURE_EXTRACTOR_VERSION,
+    }).execute()
+    # Un même contenu (même name_image) peut apparaître plusieurs fois dans le lot :
+    # les identifiants sont renvoyés dans l'ordre du lot
+    ids = list(response.data or [])
+    if len(ids) != len(pending):
+        # Sans correspondance complète ligne -> image_id, le lot est traité
+        # comme un échec (fichiers nettoyés, aucune image signalée "ok")
+        raise RuntimeError(f"{len(ids)} identifiant(s) renvoyé(s) pour {len(pending)} image(s)")
+
+    for entry in pending:
+        invalidate_image(filename=entry[0]["name_image"])
+    return ids
+
+
+def ingest_entries(entries, upload_folder, user_id, location=None, choice=None,
+                   batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Traite un flux d'entrées image et produit un événement par fichier.
+
+    LOGIQUE :
+    1. Chaque entrée acceptée est sauvegardée dans le stockage adressé par contenu
+    2. Son extraction est soumise au pool (nombre de tâches en vol borné)
+    3. Les résultats sont regroupés et insérés par lots de `batch_size`
+    4. Un fichier n'est signalé "ok" qu'après l'insertion de son lot ; si le lot
+       échoue, ses fichiers nouvellement stockés (et leurs variantes) sont supprimés
+
+    Args:
+        entries (iterable): Entrées (nom_original, bytes, motif) de iter_upload_entries
+        upload_folder (str): Dossier d'upload
+        user_id (int): Utilisateur propriétaire des images
+        location (str): Ville associée à toutes les images
+        choice (str): "IA", "vide", "plein" ou None (pas d'annotation)
+        batch_size (int): Taille des lots d'insertion
+
+    Yields:
+        dict: Événement de progression ({"status": "ok"|"error"|"skipped", ...})
+              puis un résumé final ({"status": "done", ...})
+    """
+    executor = get_executor()
+    max_in_flight = 2 * MAX_WORKERS
+    classify = choice == "IA"
+    manual_label = choice if choice in ("vide", "plein") else None
+
+    in_flight = {}
+    pending = []
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+
+    def collect(done):
+        for future in done:
+            original, filename, filepath, created = in_flight.pop(future)
+            try:
+                record, label, features = future.result()
+            except Exception as e:
+                counts["error"] += 1
+                # Ne supprimer que si le fichier n'existait pas avant (dédoublonnage)
+                if created:
+                    remove_stored(filepath)
+                yield {"status": "error", "file": original, "message": str(e)}
+                continue
+
+            row = {
+                **record,
+                "user_id": user_id,
+                "file_path": db_file_path(filename),
+                "name_image": filename,
+                "localisation": location,
+            }
+            source = "auto" if classify else "manuel"
+            pending.append((row, label or manual_label, source, features, original, filepath, created))
+
+    def drain_pending():
+        # Un fichier n'est compté "ok" qu'une fois sa ligne insérée en base
+        if not pending:
+            return
+        try:
+            ids = flush_batch([entry[:4] for entry in pending])
+        except Exception as e:
+            counts["error"] += len(pending)
+            # Les fichiers créés pour ce lot n'ont pas de ligne en base : suppression,
+            # sauf s'ils sont encore attendus par une extraction en cours
+            still_used = {entry[2] for entry in in_flight.values()}
+            for *_, filepath, created in pending:
+                if created and filepath not in still_used:
+                    remove_stored(filepath)
+            names = [entry[4] for entry in pending]
+            yield {"status": "error", "message": f"Insertion du lot échouée: {e}", "files": names}
+        else:
+            for image_id, (row, label, _, _, original, _, _) in zip(ids, pending):
+                counts["ok"] += 1
+                yield {"status": "ok", "file": original, "filename": row["name_image"],
+                       "image_id": image_id, "label": label}
+        pending.clear()
+
+    os.makedirs(upload_folder, exist_ok=True)
+    for original, data, reason in entries:
+        if data is None:
+            counts["skipped"] += 1
+            yield {"status": "skipped", "file": original, "message": reason}
+            continue
+
+        ext = original.rsplit(".", 1)[1].lower()
+        filename, filepath, created = store_bytes(upload_folder, data, ext)
+
+        in_flight[executor.submit(extract_image_record, filepath, classify)] = (original, filename, filepath, created)
+
+        if len(in_flight) >= max_in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            yield from collect(done)
+        if len(pending) >= batch_size:
+            yield from drain_pending()
+
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        yield from collect(done)
+        if len(pending) >= batch_size:
+            yield from drain_pending()
+    yield from drain_pending()
+
+    yield {"status": "done", **counts}
@@ -1,18 +1,212 @@
 # backend/services/cache_manager.py
 
+"""
+Cache JSON local des métadonnées d'images (avec leurs annotations)
+
+LOGIQUE GÉNÉRALE :
+- Synchronisation incrémentale : seules les nouvelles images (image_id au-delà
+  du dernier synchronisé) et les nouvelles annotations (annotation_id au-delà
+  de la dernière) sont téléchargées, puis fusionnées dans le cache existant
+- Pagination par clé (keyset) : chaque page est une requête bornée
+  (« image_id > curseur ORDER BY image_id LIMIT n »), jamais tronquée par la
+  limite de lignes de PostgREST
+- Écriture atomique (fichier temporaire puis rename) : un lecteur voit
+  toujours l'ancien ou le nouveau cache complet, jamais un fichier vide
+- L'état de synchronisation (curseurs) est gardé à côté du cache :
+  <cache>.sync.json
+- Un index binaire (<cache>.idx, voir metadata_index.py) est régénéré à
+  chaque synchronisation : open_index() donne un accès O(1) par image_id ou
+  name_image sans parser le JSON
+
+LIMITES :
+- Les suppressions et modifications d'images existantes ne sont pas suivies :
+  sync_cache(full=True) (ou initialize_cache) reconstruit le cache entier
+"""
+
 import os
 import json
+import logging
+import tempfile
+import threading
+from datetime import datetime
 from backend.config import IMAGE_TABLE, CACHE_PATH, supabase
 
-IMAGE_TABLE = IMAGE_TABLE    
+IMAGE_TABLE = IMAGE_TABLE
 CACHE_PATH  = CACHE_PATH
 supabase = supabase
 
+logger = logging.getLogger(__name__)
+
+# Nombre de lignes par page lors de la synchronisation
+SYNC_PAGE_SIZE = 1000
+
+# Sélection des images selon le filtre (jointure sur les annotations)
+FILTER_SELECTS = {
+    "all": "*, annotation(*)",        # Toutes les images (jointure externe)
+    "labeled": "*, annotation!inner(*)",  # Images avec au moins une annotation
+    "unlabeled": "*, annotation(*)",  # Images sans annotation (filtrées sur NULL)
+}
+
+
+def _state_path(output_path):
+    return f"{output_path}.sync.json"
+
+
+def index_path(json_path):
+    """Chemin de l'index binaire associé à un cache JSON"""
+    return os.path.splitext(json_path)[0] + ".idx"
+
+
+def _write_json_atomic(path, data):
+    """Écrit `data` en JSON compact via un fichier temporaire puis un rename"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"), ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _image_query(filter_type):
+    query = supabase.table(IMAGE_TABLE).select(FILTER_SELECTS.get(filter_type, FILTER_SELECTS["all"]))
+    if filter_type == "unlabeled":
+        query = query.is_("annotation", "null")
+    return query
+
+
+def _fetch_new_images(filter_type, after_id, page_size):
+    """Parcourt les images d'image_id > after_id, page par page"""
+    cursor = after_id
+    while True:
+        rows = _image_query(filter_type).gt("image_id", cursor).order("image_id").limit(page_size).execute().data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        cursor = rows[-1]["image_id"]
+
+
+def _fetch_new_annotations(after_id, page_size):
+    """Parcourt les annotations d'annotation_id > after_id, page par page"""
+    cursor = after_id
+    while True:
+        rows = supabase.table("annotation").select("*").gt("annotation_id", cursor) \
+            .order("annotation_id").limit(page_size).execute().data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        cursor = rows[-1]["annotation_id"]
+
+
+def _latest_annotation_id():
+    rows = supabase.table("annotation").select("annotation_id").order("annotation_id", desc=True).limit(1).execute().data
+    return rows[0]["annotation_id"] if rows else 0
+
+
+def _merge_annotation(record, annotation):
+    """Ajoute une annotation à une image du cache (sans doublon, triées par date_a)"""
+    annotations = record.setdefault("annotation", [])
+    if any(a.get("annotation_id") == annotation["annotation_id"] for a in annotations):
+        return
+    annotations.append(annotation)
+    annotations.sort(key=lambda a: (a.get("date_a") or "", a.get("annotation_id") or 0))
+
+
+def _load_state(output_path, records, filter_type):
+    """Curseurs de la dernière synchronisation (déduits du cache si absents)"""
+    try:
+        with open(_state_path(output_path), "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("filter_type") == filter_type:
+            return state
+    except (OSError, ValueError):
+        pass
+    return {
+        "filter_type": filter_type,
+        "last_image_id": max(records, default=0),
+        "last_annotation_id": max(
+            (a.get("annotation_id") or 0 for r in records.values() for a in r.get("annotation") or []),
+            default=0,
+        ),
+    }
+
+
+def sync_cache(output_path=CACHE_PATH, filter_type="all", full=False, page_size=SYNC_PAGE_SIZE):
+    """
+    Met à jour le cache avec les images et annotations ajoutées depuis la
+    dernière synchronisation.
+
+    Args:
+        output_path (str): Chemin du fichier cache JSON
+        filter_type (str): "all", "labeled" ou "unlabeled" (voir initialize_cache)
+        full (bool): Tout retélécharger (reconstruction complète, paginée)
+        page_size (int): Lignes par requête
+
+    Returns:
+        dict: {"images": n nouvelles, "annotations": n fusionnées, "total": taille du cache}
+    """
+    records = {}
+    if not full and os.path.exists(output_path):
+        records = {r["image_id"]: r for r in load_cache(input_path=output_path)}
+    state = _load_state(output_path, records, filter_type) if records else {
+        "filter_type": filter_type,
+        "last_image_id": 0,
+        # Les annotations ajoutées pendant le téléchargement des images seront reprises au prochain passage
+        "last_annotation_id": _latest_annotation_id(),
+    }
+
+    # 1. Nouvelles images (avec leurs annotations)
+    new_images = 0
+    for row in _fetch_new_images(filter_type, state["last_image_id"], page_size):
+        row["annotation"] = sorted(row.get("annotation") or [],
+                                   key=lambda a: (a.get("date_a") or "", a.get("annotation_id") or 0))
+        new_images += row["image_id"] not in records
+        records[row["image_id"]] = row
+        state["last_image_id"] = max(state["last_image_id"], row["image_id"])
+
+    # 2. Nouvelles annotations, fusionnées dans les images déjà en cache
+    merged = 0
+    missing = set()
+    for annotation in _fetch_new_annotations(state["last_annotation_id"], page_size):
+        state["last_annotation_id"] = max(state["last_annotation_id"], annotation["annotation_id"])
+        image_id = annotation.get("image_id")
+        if filter_type == "unlabeled":
+            # L'image n'est plus « non labélisée »
+            records.pop(image_id, None)
+        elif image_id in records:
+            _merge_annotation(records[image_id], annotation)
+            merged += 1
+        else:
+            missing.add(image_id)
+
+    # Images plus anciennes qui viennent d'être annotées (filtre "labeled")
+    missing = sorted(i for i in missing if i is not None and i <= state["last_image_id"])
+    for start in range(0, len(missing), page_size):
+        chunk = missing[start:start + page_size]
+        rows = _image_query(filter_type).in_("image_id", chunk).execute().data or []
+        for row in rows:
+            records[row["image_id"]] = row
+            new_images += 1
+
+    data = [records[i] for i in sorted(records)]
+    _write_json_atomic(output_path, data)
+
+    from backend.services.metadata_index import build_index
+    build_index(data, index_path(output_path))
+    state["synced_at"] = datetime.now().isoformat()
+    _write_json_atomic(_state_path(output_path), state)
+
+    return {"images": new_images, "annotations": merged, "total": len(data)}
+
+
 def initialize_cache(output_path=CACHE_PATH, filter_type="all"):
     """
-    Appelle un SELECT sur la table image et dump le résultat dans un JSON.
-    À lancer UNE SEULE FOIS pour créer ou recréer le cache.
-    
+    Crée ou recrée entièrement le cache (téléchargement paginé, écriture atomique).
+
     Args:
         output_path (str): Chemin de sortie du fichier cache JSON
         filter_type (str): Type de filtrage des images:
@@ -20,31 +214,39 @@ def initialize_cache(output_path=CACHE_PATH, filter_type="all"):
             - "labeled": Uniquement les images avec un label ('plein' ou 'vide')
             - "unlabeled": Uniquement les images sans label
     """
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    
-    if filter_type == "labeled":
-        # Images qui ont au moins une annotation (jointure interne)
-        resp = supabase.table(IMAGE_TABLE).select("*, annotation!inner(*)").execute()
-    
-    elif filter_type == "unlabeled":
-        # Images qui n'ont AUCUNE annotation (LEFT JOIN puis filtrer sur NULL)
-        resp = supabase.table(IMAGE_TABLE).select("*, annotation(*)").is_("annotation", "null").execute()
-    
-    else:  # filter_type == "all" ou autre valeur
-        # Toutes les images avec leurs annotations éventuelles (jointure externe complète)
-        resp = supabase.table(IMAGE_TABLE).select("*, annotation(*)").execute()
-    
-    data = resp.data
-    with open(output_path, "w") as f:
-        json.dump(data, f, indent=2)
-    
+    result = sync_cache(output_path, filter_type, full=True)
+
     filter_msg = {
         "labeled": "images labélisées (avec annotation 'plein'/'vide')",
-        "unlabeled": "images non labélisées (sans annotation de label)", 
+        "unlabeled": "images non labélisées (sans annotation de label)",
         "all": "toutes les images"
     }.get(filter_type, "toutes les images")
-    
-    print(f"✅ Cache généré ({len(data)} entrées - {filter_msg}) dans : {output_path}")
+
+    print(f"✅ Cache généré ({result['total']} entrées - {filter_msg}) dans : {output_path}")
+
+
+def start_background_refresh(interval, output_path=CACHE_PATH, filter_type="all"):
+    """
+    Lance une synchronisation incrémentale périodique dans un thread.
+
+    Args:
+        interval (float): Secondes entre deux synchronisations
+
+    Returns:
+        threading.Event: À déclencher (.set()) pour arrêter le rafraîchissement
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                sync_cache(output_path, filter_type)
+            except Exception:
+                logger.exception("Synchronisation du cache échouée")
+
+    threading.Thread(target=run, name="cache-refresh", daemon=True).start()
+    return stop
+
 
 def load_cache(dataset_name=None, input_path=CACHE_PATH):
     """
@@ -60,16 +262,46 @@ def load_cache(dataset_name=None, input_path=CACHE_PATH):
 
     with open(input_path, "r", encoding="utf-8") as f:
         return json.load(f)
-    
+
+
+def open_index(dataset_name=None, input_path=CACHE_PATH):
+    """
+    Ouvre l'index binaire d'un cache (mêmes arguments que load_cache).
+    L'index est (re)construit depuis le JSON s'il est absent ou plus ancien.
+
+    Returns:
+        MetadataIndex: À fermer après usage (utilisable avec `with`)
+    """
+    from backend.services.metadata_index import MetadataIndex, json_to_index
+
+    if dataset_name:
+        input_path = os.path.join(os.path.dirname(input_path), f"{dataset_name}.json")
+
+    path = index_path(input_path)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(input_path):
+        json_to_index(input_path, path)
+    return MetadataIndex(path)
+
 
 if __name__ == "__main__":
     """
-    Si le script est exécuté directement, initialise le cache.
+    Synchronise le cache : python -m backend.services.cache_manager [--full] [--watch SECONDES]
     """
-    
-    # supprime le cache précédent s'il existe
-    if os.path.exists(CACHE_PATH):
-        os.remove(CACHE_PATH)
-        print("Cache précédent supprimé.")
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Synchronisation du cache des métadonnées d'images")
+    parser.add_argument("--output", default=CACHE_PATH, help="Fichier cache JSON")
+    parser.add_argument("--filter", default="all", choices=sorted(FILTER_SELECTS), help="Images à inclure")
+    parser.add_argument("--full", action="store_true", help="Reconstruire entièrement le cache")
+    parser.add_argument("--watch", type=float, default=None, help="Resynchroniser toutes les N secondes")
+    args = parser.parse_args()
 
-    initialize_cache()
\ No newline at end of file
+    while True:
+        result = sync_cache(args.output, args.filter, full=args.full)
+        print(f"✅ Cache synchronisé : +{result['images']} images, +{result['annotations']} annotations "
+              f"({result['total']} entrées) dans : {args.output}")
+        if args.watch is None:
+            break
+        args.full = False
+        time.sleep(args.watch)
@@ -0,0 +1,145 @@
+# backend/services/chart_cache.py
+
+"""
+Cache des graphiques matplotlib du tableau de bord
+
+LOGIQUE GÉNÉRALE :
+- Le nom du fichier PNG est dérivé d'un hash des données agrégées :
+  static/plots/distribution_<hash>.png
+- Tant que les comptes ne changent pas, le fichier existe déjà et
+  matplotlib n'est même pas importé
+- Quand les comptes changent, le graphique est rendu une fois, écrit de façon
+  atomique (fichier temporaire puis rename), puis les anciens PNG sont supprimés
+- En mode arrière-plan (CHART_BACKGROUND), le rendu se fait dans un thread
+  dédié : la requête affiche le dernier graphique disponible en attendant
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.config import CHART_BACKGROUND
+
+PLOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "static", "plots"))
+PLOT_PREFIX = "distribution_"
+
+_lock = threading.Lock()
+_rendering = set()
+_latest = None
+_executor = None
+
+
+def chart_filename(counts):
+    """
+    Nom stable du graphique pour des comptes donnés.
+
+    Args:
+        counts (list): [(label, nombre)] dans l'ordre d'affichage
+
+    Returns:
+        str: "distribution_<hash>.png"
+    """
+    payload = json.dumps([[str(label), int(n)] for label, n in counts], separators=(",", ":"))
+    return f"{PLOT_PREFIX}{hashlib.sha256(payload.encode()).hexdigest()[:16]}.png"
+
+
+def render_distribution_chart(counts, filepath):
+    """
+    Dessine le graphique de répartition des annotations et l'écrit de façon atomique.
+    Utilise l'API objet de matplotlib (Figure), sans l'état global de pyplot.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    labels = [label for label, _ in counts]
+    ax.bar(labels, [n for _, n in counts], color=['red', 'green'][:len(labels)] or None, width=0.5)
+    ax.set_title("Répartition des annotations")
+    ax.set_xlabel("État")
+    ax.set_ylabel("Nombre d'images")
+    fig.tight_layout()
+
+    os.makedirs(PLOT_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=PLOT_DIR, prefix=".tmp-", suffix=".png")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            fig.savefig(f, format="png")
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def collect_old_charts(keep):
+    """Supprime les graphiques de répartition autres que `keep`"""
+    if not os.path.isdir(PLOT_DIR):
+        return
+    for name in os.listdir(PLOT_DIR):
+        if name.startswith(PLOT_PREFIX) and name.endswith(".png") and name != keep:
+            try:
+                os.remove(os.path.join(PLOT_DIR, name))
+            except OSError:
+                pass
+
+
+def _newest_chart():
+    """Dernier graphique présent sur disque (après un redémarrage)"""
+    if not os.path.isdir(PLOT_DIR):
+        return None
+    charts = [n for n in os.listdir(PLOT_DIR) if n.startswith(PLOT_PREFIX) and n.endswith(".png")]
+    return max(charts, key=lambda n: os.path.getmtime(os.path.join(PLOT_DIR, n)), default=None)
+
+
+def _render(counts, filename):
+    global _latest
+    try:
+        render_distribution_chart(counts, os.path.join(PLOT_DIR, filename))
+        with _lock:
+            _latest = filename
+        collect_old_charts(keep=filename)
+    finally:
+        with _lock:
+            _rendering.discard(filename)
+
+
+def get_distribution_chart(counts, background=None):
+    """
+    Retourne le graphique de répartition pour ces comptes, en le rendant si besoin.
+
+    Args:
+        counts (list): [(label, nombre)] dans l'ordre d'affichage
+        background (bool): Rendre hors du thread de la requête
+                           (par défaut : CHART_BACKGROUND)
+
+    Returns:
+        str: Chemin relatif à static/ ("plots/distribution_<hash>.png"),
+             ou None si aucun graphique n'est encore disponible
+    """
+    global _latest, _executor
+    if background is None:
+        background = CHART_BACKGROUND
+
+    filename = chart_filename(counts)
+    if os.path.exists(os.path.join(PLOT_DIR, filename)):
+        _latest = filename
+        return f"plots/{filename}"
+
+    if not background:
+        with _lock:
+            _rendering.add(filename)
+        _render(counts, filename)
+        return f"plots/{filename}"
+
+    with _lock:
+        if filename not in _rendering:
+            _rendering.add(filename)
+            if _executor is None:
+                # Un seul thread : matplotlib n'est pas prévu pour des rendus concurrents
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chart")
+            _executor.submit(_render, counts, filename)
+        latest = _latest or _newest_chart()
+    return f"plots/{latest}" if latest else None
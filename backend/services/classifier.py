@@ -291,7 +291,7 @@ class BinClassifier:
             )
 
 
-def test_classifier(cache_path=CACHE_PATH, show_details=False, high_precision=False):
+def test_classifier(cache_path=CACHE_PATH, show_details=False, high_precision=False, tensor_dir=None):
     """
     Fonction de test et d'évaluation du classifier sur un dataset labellisé
     
@@ -313,6 +313,8 @@ def test_classifier(cache_path=CACHE_PATH, show_details=False, high_precision=Fa
         cache_path (str): Chemin vers le fichier JSON des images labellisées
         show_details (bool): Afficher les détails des règles pour debug
         high_precision (bool): Utiliser le mode haute précision
+        tensor_dir (str): Dossier d'un cache de pixels (tensor_cache.py) à utiliser
+                          à la place de cache_path : aucun décodage JPEG
         
     Returns:
         tuple: (classifier, accuracy) pour usage programmatique
@@ -320,9 +322,17 @@ def test_classifier(cache_path=CACHE_PATH, show_details=False, high_precision=Fa
     # Initialisation du classifier avec paramètres recalibrés
     classifier = BinClassifier(high_precision=high_precision)
     
-    # Chargement du dataset labellisé depuis le cache JSON
-    with open(cache_path, "r", encoding="utf-8") as f:
-        images = json.load(f)
+    if tensor_dir:
+        # Pixels pré-décodés en mémoire mappée : seules les lignes labellisées sont testées
+        from backend.services.tensor_cache import TensorCache
+        tensors = TensorCache(tensor_dir)
+        rows = [i for i, entry in enumerate(tensors.entries) if entry.get("label")]
+        images = [tensors.image_data(i) for i in rows]
+    else:
+        tensors = None
+        # Chargement du dataset labellisé depuis le cache JSON
+        with open(cache_path, "r", encoding="utf-8") as f:
+            images = json.load(f)
 
     # Initialisation des métriques de performance
     total = len(images)                                          # Nombre total d'images
@@ -348,7 +358,8 @@ def test_classifier(cache_path=CACHE_PATH, show_details=False, high_precision=Fa
         true_label = annotation.get("label", "inconnu")
 
         # Extraction des features visuelles de l'image
-        feats = ImageFeatures(img).extract_all_features()
+        image_features = tensors.features(rows[i]) if tensors is not None else ImageFeatures(img)
+        feats = image_features.extract_all_features()
         
         # Classification avec notre système
         result = classifier.classify(feats)
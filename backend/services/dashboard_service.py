@@ -0,0 +1,93 @@
+from backend.config import supabase, DASHBOARD_SUMMARY_TTL
+from backend.utils.ttl_cache import ttl_cache
+
+# Nombre de barres de l'histogramme des tailles
+SIZE_HISTOGRAM_BUCKETS = 20
+
+# Pagination de la liste des images annotées
+IMAGES_PAGE_SIZE = 12
+IMAGES_PAGE_MAX = 100
+
+
+@ttl_cache(DASHBOARD_SUMMARY_TTL)
+def get_dashboard_summary(buckets=SIZE_HISTOGRAM_BUCKETS):
+    """
+    Statistiques globales du tableau de bord, calculées par la base
+    (fonction dashboard_summary de Data/schema.sql) : le coût ne dépend pas
+    du nombre d'images.
+
+    Returns:
+        dict: total_images, full_count, empty_count, full_percentage,
+              empty_percentage, moyenne_taille, label_counts [(label, n)],
+              size_histogram [{"min", "max", "count"}]
+    """
+    summary = supabase.rpc("dashboard_summary", {"p_buckets": buckets}).execute().data or {}
+
+    total_images = int(summary.get("total") or 0)
+    label_counts = [(row["label"], int(row["count"])) for row in summary.get("labels") or []]
+    counts = dict(label_counts)
+    full_count = counts.get("plein", 0)
+    empty_count = counts.get("vide", 0)
+
+    # Bornes des intervalles de l'histogramme (mêmes que width_bucket côté SQL)
+    size_histogram = []
+    min_size, max_size = summary.get("min_size"), summary.get("max_size")
+    if total_images and min_size is not None:
+        width = (max_size + 1e-9 - min_size) / buckets
+        size_histogram = [
+            {
+                "min": round(min_size + (row["bucket"] - 1) * width, 2),
+                "max": round(min_size + row["bucket"] * width, 2),
+                "count": int(row["count"]),
+            }
+            for row in summary.get("size_histogram") or []
+        ]
+
+    return {
+        "total_images": total_images,
+        "full_count": full_count,
+        "empty_count": empty_count,
+        "full_percentage": round(full_count / total_images * 100, 2) if total_images else 0,
+        "empty_percentage": round(empty_count / total_images * 100, 2) if total_images else 0,
+        # Taille moyenne des fichiers (en Ko)
+        "moyenne_taille": round((summary.get("avg_size") or 0) / 1024, 2),
+        "label_counts": label_counts,
+        "size_histogram": size_histogram,
+    }
+
+
+def get_annotated_images_page(after=None, limit=IMAGES_PAGE_SIZE):
+    """
+    Page d'images annotées, des plus récentes aux plus anciennes.
+
+    Pagination par clé (keyset) sur annotation_id : chaque page est une requête
+    indexée « annotation_id < after », quel que soit le rang de la page.
+
+    Args:
+        after (int): annotation_id de la dernière ligne de la page précédente
+        limit (int): Nombre de lignes (borné à IMAGES_PAGE_MAX)
+
+    Returns:
+        tuple: (lignes {annotation_id, label, image_id, name_image}, curseur suivant ou None)
+    """
+    limit = max(1, min(int(limit), IMAGES_PAGE_MAX))
+    query = supabase.table("annotation") \
+        .select("annotation_id, label, image_id, image(name_image)") \
+        .order("annotation_id", desc=True) \
+        .limit(limit)
+    if after is not None:
+        query = query.lt("annotation_id", int(after))
+    rows = query.execute().data or []
+
+    items = [
+        {
+            "annotation_id": row["annotation_id"],
+            "label": row["label"],
+            "image_id": row["image_id"],
+            "name_image": row["image"]["name_image"],
+        }
+        for row in rows
+        if isinstance(row.get("image"), dict) and row["image"].get("name_image")
+    ]
+    next_cursor = rows[-1]["annotation_id"] if len(rows) == limit else None
+    return items, next_cursor
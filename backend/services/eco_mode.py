@@ -0,0 +1,382 @@
+"""
+Mode éco : qualité de la classification adaptée à la charge
+
+LOGIQUE GÉNÉRALE :
+- Trois paliers, du plus fidèle au plus économe :
+    * "full"     : toutes les features (FEATURES de feature_extractor.py)
+    * "reduced"  : sans les features à carte de contours (Canny + Hough pour
+                   perspective_strength, gradients pour irregular_shapes)
+    * "metadata" : score calculé sur les seules propriétés de base
+                   (couleurs moyennes, contraste, taille), comme pour une
+                   image du cache de métadonnées
+- Le gouverneur suit la charge du processus : classifications en cours
+  (hooks Flask, init_app) et part du CPU de la machine utilisée par le
+  processus (fenêtre de ECO_CPU_SAMPLE_SECONDS). Il descend de palier dès
+  qu'un seuil est dépassé et ne remonte que d'un palier par tranche de
+  ECO_RECOVERY_SECONDS de charge basse
+- Aucune requête n'est refusée ni mise en attente : seul le palier change
+- Chaque résultat porte son palier ("tier"). Une image enregistrée avec des
+  features hors palier "full" est ajoutée à la file de re-classification
+  (ECO_RESCORE_QUEUE, JSON lines) : features recalculées et enregistrées,
+  nouvelle annotation si la dernière était automatique. La file est vidée en
+  arrière-plan à la fin d'une classification qui laisse le processus au
+  repos et en palier "full", ou à la main :
+      python -m backend.services.eco_mode --rescore
+- WDP_ECO_MODE : "auto" (par défaut), "off" (toujours "full") ou un palier forcé
+
+LIMITES :
+- La charge est mesurée par processus : avec plusieurs workers, chacun
+  décide seul (la file, elle, est partagée sous verrou de fichier ; sans
+  fcntl, sous Windows, le verrou ne protège que les threads d'un processus)
+- Le palier n'est réévalué qu'à l'arrivée d'une classification : sans
+  trafic, la file attend la requête suivante (ou la commande ci-dessus)
+- Une annotation manuelle ajoutée entre-temps n'est jamais remplacée par la
+  re-classification
+"""
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows : verrou limité aux threads du processus
+    fcntl = None
+
+from backend.config import (
+    ECO_MODE, ECO_REDUCED_INFLIGHT, ECO_METADATA_INFLIGHT, ECO_REDUCED_CPU,
+    ECO_METADATA_CPU, ECO_CPU_SAMPLE_SECONDS, ECO_RECOVERY_SECONDS, ECO_RESCORE_QUEUE
+)
+from backend.services import footprint
+
+logger = logging.getLogger(__name__)
+
+FULL, REDUCED, METADATA = "full", "reduced", "metadata"
+TIERS = (FULL, REDUCED, METADATA)
+
+# Features non calculées en palier "reduced" (détection de contours)
+REDUCED_SKIP = frozenset({"perspective_strength", "irregular_shapes"})
+
+# Endpoints comptés comme classifications en cours (méthode POST)
+CLASSIFICATION_ENDPOINTS = {"upload.upload_file", "upload.classify_image"}
+
+
+class EcoGovernor:
+    """Choix du palier selon la charge (thread-safe)"""
+    def __init__(self, mode=ECO_MODE):
+        self.mode = mode
+        self.inflight = 0
+        self._tier = 0                 # Index dans TIERS
+        self._last_pressure = time.monotonic()
+        self._lock = threading.Lock()
+        self._cpu_sample = (time.monotonic(), time.process_time())
+        self._cpu = 0.0
+        self._changes = 0
+
+    def enter(self):
+        with self._lock:
+            self.inflight += 1
+
+    def leave(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def cpu_usage(self):
+        """Part du CPU de la machine utilisée par le processus sur la dernière fenêtre"""
+        now = time.monotonic()
+        with self._lock:
+            start_wall, start_cpu = self._cpu_sample
+            if now - start_wall >= ECO_CPU_SAMPLE_SECONDS:
+                cpu = time.process_time()
+                self._cpu = (cpu - start_cpu) / ((now - start_wall) * (os.cpu_count() or 1))
+                self._cpu_sample = (now, cpu)
+            return self._cpu
+
+    def _target(self, inflight, cpu):
+        # Le CPU ne compte que si des classifications se font concurrence :
+        # une classification seule peut occuper un cœur entier sans retarder personne
+        if inflight < 2:
+            cpu = 0.0
+        if inflight >= ECO_METADATA_INFLIGHT or cpu >= ECO_METADATA_CPU:
+            return 2
+        if inflight >= ECO_REDUCED_INFLIGHT or cpu >= ECO_REDUCED_CPU:
+            return 1
+        return 0
+
+    def tier(self):
+        """Palier à utiliser pour la classification qui commence"""
+        if self.mode == "off":
+            return FULL
+        if self.mode in TIERS:
+            return self.mode
+
+        cpu = self.cpu_usage()
+        now = time.monotonic()
+        with self._lock:
+            target = self._target(self.inflight, cpu)
+            previous = self._tier
+            if target >= self._tier:
+                # Charge maintenue ou en hausse : descente immédiate au palier demandé
+                self._tier = target
+                self._last_pressure = now
+            else:
+                # Remontée d'un palier par tranche de ECO_RECOVERY_SECONDS de charge basse
+                steps = int((now - self._last_pressure) / ECO_RECOVERY_SECONDS)
+                if steps:
+                    self._tier = max(target, self._tier - steps)
+                    self._last_pressure = now
+            if self._tier != previous:
+                self._changes += 1
+            tier = TIERS[self._tier]
+        if tier != TIERS[previous]:
+            logger.info("Changement de palier", extra={"tier": tier, "previous": TIERS[previous],
+                                                      "inflight": self.inflight, "cpu": round(cpu, 2)})
+        return tier
+
+    def current_tier(self):
+        """Palier en vigueur, sans réévaluer la charge (lecture seule)"""
+        if self.mode == "off":
+            return FULL
+        if self.mode in TIERS:
+            return self.mode
+        with self._lock:
+            return TIERS[self._tier]
+
+    def is_idle(self):
+        """Aucune classification en cours dans le processus"""
+        with self._lock:
+            return self.inflight == 0
+
+    def stats(self):
+        with self._lock:
+            return {"mode": self.mode, "tier": TIERS[self._tier], "inflight": self.inflight,
+                    "cpu": round(self._cpu, 3), "tier_changes": self._changes}
+
+
+governor = EcoGovernor()
+
+
+def extract_features(image_features, tier=FULL):
+    """Features d'une image (ImageFeatures) selon le palier"""
+    footprint.mark_classified()
+    if tier == FULL:
+        return image_features.extract_all_features()
+    if tier == REDUCED:
+        return image_features.extract_all_features(skip=REDUCED_SKIP)
+    # Sans pixels (ni chemin à relire), chaque compute_* se rabat sur les propriétés de base
+    from backend.services.feature_extractor import ImageFeatures
+    return ImageFeatures({**image_features.image_data, "file_path": ""}).extract_all_features()
+
+
+def classify(image_features, tier=None):
+    """
+    Extraction selon le palier puis classification.
+
+    Args:
+        image_features (ImageFeatures): Image décodée
+        tier (str): Palier imposé (par défaut : celui du gouverneur)
+
+    Returns:
+        tuple: (features, résultat de BinClassifier.classify avec la clé "tier")
+    """
+    from backend.services.classifier import BinClassifier
+    from backend.services.rules_engine import RulesEngine
+
+    tier = tier or governor.tier()
+    features = extract_features(image_features, tier)
+    result = BinClassifier(rules_engine=RulesEngine()).classify(features)
+    result["tier"] = tier
+    return features, result
+
+
+# === File de re-classification ===
+
+_queue_lock = threading.Lock()
+_drain_lock = threading.Lock()
+
+
+@contextmanager
+def _locked_queue(path):
+    """
+    Accès exclusif à la file : verrou des threads du processus, puis verrou
+    de fichier (<file>.lock) partagé par tous les workers qui utilisent la
+    même file
+    """
+    with _queue_lock:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def enqueue_rescore(image_id, filename, tier, label, path=ECO_RESCORE_QUEUE):
+    """Ajoute une image classée hors palier "full" à la file de re-classification"""
+    entry = {"image_id": image_id, "filename": filename, "tier": tier, "label": label,
+             "queued": datetime.now().isoformat(timespec="seconds")}
+    with _locked_queue(path):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def _read_queue(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except (OSError, ValueError):
+        return []
+
+
+def _write_queue(entries, path):
+    """Réécrit la file (atomique), à appeler sous _locked_queue"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".jsonl")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def pending_rescores(path=ECO_RESCORE_QUEUE):
+    return len(_read_queue(path))
+
+
+def rescore(entry, upload_folder):
+    """
+    Recalcule en palier "full" les features d'une image de la file, les
+    enregistre, puis re-classe l'image si sa dernière annotation est automatique.
+
+    Returns:
+        str: "updated", "unchanged" ou "skipped" (fichier ou image absents)
+    """
+    from backend.services.feature_extractor import ImageFeatures
+    from backend.services.image_service import get_image_with_annotation, insert_annotation, save_image_features
+    from backend.services.storage import resolve_path
+
+    filepath = resolve_path(upload_folder, entry["filename"])
+    if not os.path.exists(filepath):
+        return "skipped"
+    image, annotation = get_image_with_annotation(entry["filename"])
+    if image is None or image["image_id"] != entry["image_id"]:
+        return "skipped"
+
+    with open(filepath, "rb") as f:
+        image_features = ImageFeatures.from_bytes(f.read(), file_path=filepath)
+    features, result = classify(image_features, FULL)
+    # Le vecteur complet remplace celui du palier dégradé
+    save_image_features(entry["image_id"], features, FULL)
+
+    # Pas d'annotation (upload sans label) ou annotation manuelle : rien à re-classer
+    if annotation is None or annotation["source"] != "auto" or annotation["label"] == result["prediction"]:
+        return "unchanged"
+    insert_annotation(entry["image_id"], result["prediction"], "auto")
+    return "updated"
+
+
+def drain_rescore_queue(upload_folder, limit=None, only_when_idle=True, path=ECO_RESCORE_QUEUE):
+    """
+    Re-classe les images de la file, dans l'ordre d'arrivée.
+    S'arrête (en gardant le reste de la file) dès que la charge revient.
+
+    Les entrées traitées sont retirées de la file par leur contenu, pas par
+    leur position : un autre processus qui vide la même file en parallèle
+    peut traiter une image deux fois (sans effet la seconde fois) mais
+    aucune entrée n'est perdue.
+
+    Returns:
+        dict: {"updated": n, "unchanged": n, "skipped": n, "failed": n, "remaining": n}
+    """
+    counts = {"updated": 0, "unchanged": 0, "skipped": 0, "failed": 0}
+    with _locked_queue(path):
+        entries = _read_queue(path)
+    processed = []
+    for entry in entries:
+        if (limit is not None and len(processed) >= limit) or (only_when_idle and not governor.is_idle()):
+            break
+        try:
+            counts[rescore(entry, upload_folder)] += 1
+        except Exception:
+            logger.exception("Re-classification échouée", extra={"image_id": entry.get("image_id")})
+            counts["failed"] += 1
+        processed.append(entry)
+
+    done = len(processed)
+    if done:
+        with _locked_queue(path):
+            remaining = _read_queue(path)
+            for entry in processed:
+                if entry in remaining:
+                    remaining.remove(entry)
+            _write_queue(remaining, path)
+    counts["remaining"] = len(entries) - done
+    if done:
+        logger.info("File de re-classification traitée", extra=counts)
+    return counts
+
+
+def _drain_in_background(upload_folder):
+    # Un seul thread de re-classification par processus
+    if not _drain_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            drain_rescore_queue(upload_folder)
+        finally:
+            _drain_lock.release()
+    try:
+        threading.Thread(target=run, name="eco-rescore", daemon=True).start()
+    except RuntimeError:
+        _drain_lock.release()
+        raise
+
+
+# === Hooks Flask ===
+
+def init_app(app):
+    """Compte les classifications en cours et vide la file de re-classification au repos"""
+    from flask import request, g, current_app
+
+    @app.before_request
+    def _enter_classification():
+        if request.method == "POST" and request.endpoint in CLASSIFICATION_ENDPOINTS:
+            governor.enter()
+            g.eco_counted = True
+
+    @app.teardown_request
+    def _leave_classification(exc):
+        if not g.pop("eco_counted", False):
+            return
+        governor.leave()
+        # Au repos et revenu en palier "full" : re-classification des images en attente
+        if governor.is_idle() and governor.current_tier() == FULL and os.path.exists(ECO_RESCORE_QUEUE) and os.path.getsize(ECO_RESCORE_QUEUE):
+            _drain_in_background(current_app.config["UPLOAD_FOLDER"])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="File de re-classification du mode éco")
+    parser.add_argument("--rescore", action="store_true", help="Re-classer les images en attente")
+    parser.add_argument("--limit", type=int, default=None, help="Nombre maximal d'images à traiter")
+    parser.add_argument("--upload-folder", default=os.path.join("backend", "uploads"))
+    args = parser.parse_args()
+
+    if args.rescore:
+        print(drain_rescore_queue(args.upload_folder, limit=args.limit, only_when_idle=False))
+    else:
+        print(f"{pending_rescores()} image(s) en attente de re-classification")
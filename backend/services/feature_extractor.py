@@ -2,16 +2,43 @@ from PIL import Image, ImageStat, ImageFilter
 import numpy as np
 import cv2
 import os
+from backend.services.admission import admit, open_admitted
+from backend.utils.metrics import span
+from backend.services import footprint
 
-def calculate_image_properties(image_path):
-    img = Image.open(image_path).convert('RGB')
+def decode_image(source, decision=None):
+    """
+    Décode une image en mémoire ou sur disque en image PIL RGB.
+
+    Les chemins et contenus bruts passent d'abord par l'admission (lecture de
+    l'en-tête seulement) : une image trop lourde est refusée avant décodage,
+    une image très grande est décodée en résolution réduite.
+
+    Args:
+        source: chemin (str), contenu brut (bytes/bytearray/memoryview),
+                tableau numpy RGB (H, W, 3) ou image PIL
+        decision (dict): Décision d'admission déjà prise pour `source` (optionnel)
+
+    Returns:
+        PIL.Image: image RGB
+
+    Raises:
+        ImageRejected: si l'image est refusée à l'admission
+    """
+    if isinstance(source, np.ndarray):
+        return Image.fromarray(source)
+    if isinstance(source, Image.Image):
+        return source if source.mode == 'RGB' else source.convert('RGB')
+    if decision is None:
+        decision = admit(source)
+    return open_admitted(source, decision)
+
+def _compute_properties(img, size):
     stat = ImageStat.Stat(img)
 
     avg_red, avg_green, avg_blue = stat.mean
-    width, height = img.size
-
-    # Taille fichier en kilo-octets (ou octets)
-    size = os.path.getsize(image_path) / 1024  # en ko
+    # Dimensions d'origine, même si l'image a été décodée en réduit
+    width, height = img.info.get('original_size', img.size)
 
     # Calcul du contraste (écart-type des pixels)
     contrast = np.std(np.array(img))
@@ -24,28 +51,128 @@ def calculate_image_properties(image_path):
 
     return size, width, height, avg_red, avg_green, avg_blue, contrast, edges_detected
 
+def calculate_image_properties(image_path):
+    """
+    Args:
+        image_path: chemin de l'image, ou son contenu brut (bytes) pour
+                    un traitement entièrement en mémoire
+    """
+    img = decode_image(image_path)
+
+    # Taille fichier en kilo-octets (ou octets)
+    if isinstance(image_path, (bytes, bytearray, memoryview)):
+        size = len(image_path) / 1024  # en ko
+    else:
+        size = os.path.getsize(image_path) / 1024  # en ko
+
+    return _compute_properties(img, size)
+
+
+# Version de l'extracteur, enregistrée avec chaque vecteur de features en base
+# (table image_features) : à incrémenter dès qu'une feature change de calcul,
+# est ajoutée ou retirée
+FEATURE_EXTRACTOR_VERSION = 1
+
+# Features passées au moteur de règles, dans l'ordre : (clé, méthode compute_*)
+# Méthode None : valeur lue dans image_data (128 par défaut)
+FEATURES = (
+    # Features existantes (rapides)
+    ("mean_brightness", "compute_mean_brightness"),
+    ("edge_density", "compute_edge_density"),
+    ("area_ratio", "compute_area_ratio"),
+    ("contrast_iqr", "compute_contrast_iqr"),
+    ("file_size_mb", "compute_file_size_mb"),
+    ("hue_std", "compute_hue_std"),
+    ("avg_red", None),
+    ("avg_green", None),
+    ("avg_blue", None),
+
+    # Features avancées existantes
+    ("texture_entropy", "compute_texture_entropy"),
+    ("color_complexity", "compute_color_complexity"),
+    ("brightness_variance", "compute_brightness_variance"),
+    ("spatial_frequency", "compute_spatial_frequency"),
+    ("fill_ratio_advanced", "compute_fill_ratio_advanced"),
+
+    # Feature lente désactivée temporairement
+    # ("edge_coherence", "compute_edge_coherence"),  # TROP LENTE
+
+    # Nouvelles features pour règles avancées
+    ("saturation_mean", "compute_saturation_mean"),
+    ("corner_variance", "compute_corner_variance"),
+    ("vertical_fill_ratio", "compute_vertical_fill_ratio"),
+    ("irregular_shapes", "compute_irregular_shapes"),
+    ("symmetry", "compute_symmetry"),
+    ("background_uniformity", "compute_background_uniformity"),
+    ("center_emptiness", "compute_center_emptiness"),
+    ("perspective_strength", "compute_perspective_strength"),
+)
+
+
 class ImageFeatures:
     """
     Classe pour extraire toutes les features nécessaires au rules engine.
     """
-    def __init__(self, image_data):
+    def __init__(self, image_data, image=None):
         """
         Args:
             image_data (dict): Données de l'image depuis le cache JSON contenant:
                 - file_path: chemin vers l'image
                 - size, width, height, avg_red, avg_green, avg_blue, contrast, edges_detected
+            image: Image déjà en mémoire (bytes, tableau numpy RGB ou image PIL).
+                Si fournie, file_path est ignoré et aucun accès disque n'a lieu.
         """
         self.image_data = image_data
         self.file_path = image_data.get('file_path', '')
+        # Taille réelle en octets quand l'image est fournie en mémoire
+        self.byte_size = len(image) if isinstance(image, (bytes, bytearray, memoryview)) else None
         
+        if image is not None:
+            self.img = decode_image(image)
+            # Un tableau numpy fourni est réutilisé tel quel (pas de copie)
+            self.pixels = image if isinstance(image, np.ndarray) else np.array(self.img)
         # Charger l'image si le fichier existe
-        if os.path.exists(self.file_path):
-            self.img = Image.open(self.file_path).convert('RGB')
+        elif self.file_path and os.path.exists(self.file_path):
+            self.img = decode_image(self.file_path)
             self.pixels = np.array(self.img)
         else:
             self.img = None
             self.pixels = None
 
+    @classmethod
+    def from_bytes(cls, data, decision=None, **extra):
+        """
+        Construit les features à partir du contenu brut d'une image,
+        sans fichier temporaire : l'image n'est décodée qu'une seule fois.
+
+        Args:
+            data (bytes): Contenu du fichier image
+            decision (dict): Décision d'admission déjà prise pour `data` (optionnel)
+            **extra: Données supplémentaires à ajouter à image_data
+
+        Returns:
+            ImageFeatures: instance dont image_data contient aussi les propriétés
+            de base (size, width, height, avg_red, ..., edges_detected)
+        """
+        img = decode_image(data, decision)
+        size, width, height, avg_r, avg_g, avg_b, contrast, edges_detected = _compute_properties(img, len(data) / 1024)
+        image_data = {
+            'avg_red': avg_r,
+            'avg_green': avg_g,
+            'avg_blue': avg_b,
+            'size': size,
+            'width': width,
+            'height': height,
+            'contrast': contrast,
+            'edges_detected': edges_detected,
+            'file_path': '',
+            **extra,
+        }
+        features = cls(image_data, image=img)
+        features.byte_size = len(data)
+        footprint.add_bytes_read(len(data))
+        return features
+
     def compute_mean_brightness(self):
         """Calculer la luminosité moyenne (R+G+B)/3"""
         if self.pixels is not None:
@@ -87,6 +214,8 @@ class ImageFeatures:
 
     def compute_file_size_mb(self):
         """Calculer la taille du fichier en MB"""
+        if self.byte_size is not None:
+            return float(self.byte_size / (1024.0 * 1024.0))
         size_kb = self.image_data.get('size', 0)
         return float(size_kb / 1024.0)  # Convertir KB en MB
 
@@ -442,44 +571,23 @@ class ImageFeatures:
                 return 0.2  # Valeur par défaut
         return 0.2
     
-    def extract_all_features(self):
-        """Extraire toutes les features nécessaires pour le rules engine"""
-        # Récupérer les features de base
-        base_features = {
-            # Features existantes (rapides)
-            "mean_brightness": self.compute_mean_brightness(),
-            "edge_density": self.compute_edge_density(),
-            "area_ratio": self.compute_area_ratio(),
-            "contrast_iqr": self.compute_contrast_iqr(),
-            "file_size_mb": self.compute_file_size_mb(),
-            "hue_std": self.compute_hue_std(),
-            "avg_red": self.image_data.get('avg_red', 128),
-            "avg_green": self.image_data.get('avg_green', 128),
-            "avg_blue": self.image_data.get('avg_blue', 128),
-            
-            # Features avancées existantes
-            "texture_entropy": self.compute_texture_entropy(),
-            "color_complexity": self.compute_color_complexity(),
-            "brightness_variance": self.compute_brightness_variance(),
-            "spatial_frequency": self.compute_spatial_frequency(),
-            "fill_ratio_advanced": self.compute_fill_ratio_advanced(),
-            
-            # Feature lente désactivée temporairement
-            # "edge_coherence": self.compute_edge_coherence(),  # TROP LENTE
-        }
-        
-        # Ajouter les nouvelles features avancées
-        new_features = {
-            # Nouvelles features pour règles avancées
-            "saturation_mean": self.compute_saturation_mean(),
-            "corner_variance": self.compute_corner_variance(),
-            "vertical_fill_ratio": self.compute_vertical_fill_ratio(),
-            "irregular_shapes": self.compute_irregular_shapes(),
-            "symmetry": self.compute_symmetry(),
-            "background_uniformity": self.compute_background_uniformity(),
-            "center_emptiness": self.compute_center_emptiness(),
-            "perspective_strength": self.compute_perspective_strength(),
-        }
-        
-        # Fusionner et retourner toutes les features
-        return {**base_features, **new_features}
\ No newline at end of file
+    @span("extraction")
+    def extract_all_features(self, skip=()):
+        """
+        Extraire toutes les features nécessaires pour le rules engine
+
+        Args:
+            skip (set): Features à ne pas calculer (absentes du résultat : les
+                règles qui en dépendent ne s'activent pas, voir services/eco_mode.py)
+        """
+        features = {}
+        for name, method in FEATURES:
+            if name in skip:
+                continue
+            if method is None:
+                features[name] = self.image_data.get(name, 128)
+                continue
+            # Temps CPU de chaque feature (page Green IT, voir services/footprint.py)
+            with footprint.feature(name):
+                features[name] = getattr(self, method)()
+        return features
@@ -0,0 +1,325 @@
+"""
+Empreinte énergétique et carbone des classifications (page Green IT)
+
+LOGIQUE GÉNÉRALE :
+- Les requêtes de classification (POST /upload, /upload/classify_image) sont
+  instrumentées par des hooks Flask (init_app) : temps CPU du thread
+  (time.thread_time), octets d'image lus, octets reçus et envoyés
+- Une requête n'est comptée que si une extraction de features a réellement
+  eu lieu (mark_classified, appelé par eco_mode.extract_features) : mise à
+  jour d'un seuil, fichier refusé à l'admission ou ville invalide ne
+  diluent pas le coût par classification
+- Pendant la requête, extract_all_features mesure le temps CPU de chaque
+  feature (feature("nom")) ; hors requête instrumentée, la mesure est un
+  simple test de contexte
+- Les mesures sont agrégées par jour en mémoire, puis fusionnées dans
+  FOOTPRINT_PATH (JSON, écriture atomique) au plus toutes les
+  FOOTPRINT_FLUSH_SECONDS secondes
+- Conversion en énergie et CO₂e au moment de la lecture, avec les
+  coefficients de config.py : changer un coefficient recalcule tout
+  l'historique
+
+    énergie (Wh) = CPU (s) × FOOTPRINT_CPU_WATTS / 3600
+                 + Go transférés × FOOTPRINT_NETWORK_KWH_PER_GB × 1000
+                 + Go lus × FOOTPRINT_STORAGE_KWH_PER_GB × 1000
+    CO₂e (g)     = énergie (kWh) × FOOTPRINT_GRID_GCO2_PER_KWH
+
+LIMITES :
+- Estimation d'ordre de grandeur : ni la mémoire, ni l'écran du client, ni
+  la fabrication du matériel ne sont comptés
+- Le travail des processus du pool (ingestion en masse) n'est pas mesuré
+- Plusieurs processus serveurs fusionnent leurs agrégats dans le même
+  fichier sans verrou : une écriture concurrente peut perdre quelques
+  mesures
+"""
+
+import os
+import json
+import time
+import atexit
+import logging
+import tempfile
+import threading
+from contextlib import nullcontext
+from contextvars import ContextVar
+from datetime import date, timedelta
+
+from backend.config import (
+    FOOTPRINT_PATH, FOOTPRINT_CPU_WATTS, FOOTPRINT_NETWORK_KWH_PER_GB,
+    FOOTPRINT_STORAGE_KWH_PER_GB, FOOTPRINT_GRID_GCO2_PER_KWH,
+    FOOTPRINT_FLUSH_SECONDS, FOOTPRINT_KEEP_DAYS
+)
+
+logger = logging.getLogger(__name__)
+
+# Endpoints du chemin de classification (méthode POST)
+CLASSIFICATION_ENDPOINTS = {"upload.upload_file", "upload.classify_image"}
+
+REQUEST_FIELDS = ("count", "cpu_s", "bytes_read", "bytes_in", "bytes_out")
+FEATURE_FIELDS = ("count", "cpu_s")
+
+# Mesures de la requête en cours, None hors requête instrumentée
+_current = ContextVar("footprint", default=None)
+
+# Agrégats pas encore écrits : {jour: {"requests": {endpoint: {...}}, "features": {nom: {...}}}}
+_pending = {}
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+class _FeatureTimer:
+    """Temps CPU d'une feature, ajouté aux mesures de la requête en cours"""
+    __slots__ = ("record", "name", "start")
+
+    def __init__(self, record, name):
+        self.record = record
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        features = self.record["features"]
+        features[self.name] = features.get(self.name, 0.0) + time.thread_time() - self.start
+        return False
+
+
+def feature(name):
+    """
+    Mesure le temps CPU d'une feature si une requête instrumentée est en cours.
+
+    Usage:
+        with footprint.feature("hue_std"):
+            value = self.compute_hue_std()
+    """
+    record = _current.get()
+    return _FeatureTimer(record, name) if record is not None else nullcontext()
+
+
+def mark_classified():
+    """Signale qu'une classification (extraction de features) a eu lieu pendant la requête en cours"""
+    record = _current.get()
+    if record is not None:
+        record["classified"] = True
+
+
+def add_bytes_read(n):
+    """Octets d'image lus (décodés) pendant la requête en cours"""
+    record = _current.get()
+    if record is not None:
+        record["bytes_read"] += n
+
+
+# === Estimation ===
+
+def energy_wh(cpu_s=0.0, bytes_read=0, bytes_in=0, bytes_out=0, **_):
+    """Énergie estimée (Wh) d'un ensemble de mesures"""
+    gigabytes = 1024 ** 3
+    return (
+        cpu_s * FOOTPRINT_CPU_WATTS / 3600
+        + (bytes_in + bytes_out) / gigabytes * FOOTPRINT_NETWORK_KWH_PER_GB * 1000
+        + bytes_read / gigabytes * FOOTPRINT_STORAGE_KWH_PER_GB * 1000
+    )
+
+
+def co2e_g(wh):
+    """CO₂ équivalent (g) d'une énergie en Wh"""
+    return wh / 1000 * FOOTPRINT_GRID_GCO2_PER_KWH
+
+
+def coefficients():
+    return {
+        "cpu_watts": FOOTPRINT_CPU_WATTS,
+        "network_kwh_per_gb": FOOTPRINT_NETWORK_KWH_PER_GB,
+        "storage_kwh_per_gb": FOOTPRINT_STORAGE_KWH_PER_GB,
+        "grid_gco2_per_kwh": FOOTPRINT_GRID_GCO2_PER_KWH,
+    }
+
+
+# === Agrégation ===
+
+def _add(target, values, fields):
+    for field in fields:
+        target[field] = target.get(field, 0) + values.get(field, 0)
+
+
+def _merge(days, other):
+    """Ajoute les agrégats `other` à `days` (mêmes structures)"""
+    for day, sections in other.items():
+        target = days.setdefault(day, {"requests": {}, "features": {}})
+        for endpoint, values in sections.get("requests", {}).items():
+            _add(target["requests"].setdefault(endpoint, {}), values, REQUEST_FIELDS)
+        for name, values in sections.get("features", {}).items():
+            _add(target["features"].setdefault(name, {}), values, FEATURE_FIELDS)
+    return days
+
+
+def record(endpoint, measures, day=None):
+    """
+    Ajoute les mesures d'une requête aux agrégats du jour.
+
+    Args:
+        endpoint (str): Endpoint Flask de la requête
+        measures (dict): cpu_s, bytes_read, bytes_in, bytes_out, features {nom: cpu_s}
+        day (str): Jour ISO (par défaut : aujourd'hui)
+    """
+    day = day or date.today().isoformat()
+    values = {field: measures.get(field, 0) for field in REQUEST_FIELDS}
+    values["count"] = 1
+    features = {name: {"count": 1, "cpu_s": cpu_s} for name, cpu_s in measures.get("features", {}).items()}
+    with _lock:
+        _merge(_pending, {day: {"requests": {endpoint: values}, "features": features}})
+    if time.monotonic() - _last_flush >= FOOTPRINT_FLUSH_SECONDS:
+        flush()
+
+
+def _load(path=FOOTPRINT_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("days", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def flush(path=FOOTPRINT_PATH):
+    """Fusionne les agrégats en mémoire dans le fichier JSON (écriture atomique)"""
+    global _last_flush
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not pending:
+        return
+
+    days = _merge(_load(path), pending)
+    oldest = (date.today() - timedelta(days=FOOTPRINT_KEEP_DAYS)).isoformat()
+    days = {day: sections for day, sections in days.items() if day >= oldest}
+
+    directory = os.path.dirname(path) or "."
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "days": days}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    except OSError:
+        # Les mesures sont remises en attente pour la prochaine écriture
+        logger.exception("Écriture des agrégats d'empreinte échouée")
+        with _lock:
+            _merge(_pending, pending)
+
+
+atexit.register(flush)
+
+
+def load_days(path=FOOTPRINT_PATH):
+    """Agrégats par jour : fichier + mesures encore en mémoire"""
+    with _lock:
+        pending = json.loads(json.dumps(_pending))
+    return _merge(_load(path), pending)
+
+
+def daily_summary(days=14, path=FOOTPRINT_PATH):
+    """
+    Résumé des derniers jours, du plus récent au plus ancien.
+
+    Returns:
+        list: dicts {day, classifications, cpu_s, bytes_read, bytes_transferred,
+              energy_wh, co2e_g, wh_per_classification, co2e_mg_per_classification}
+    """
+    rows = []
+    for day, sections in sorted(load_days(path).items(), reverse=True)[:days]:
+        totals = {}
+        for values in sections["requests"].values():
+            _add(totals, values, REQUEST_FIELDS)
+        wh = energy_wh(**totals)
+        count = totals.get("count", 0)
+        rows.append({
+            "day": day,
+            "classifications": count,
+            "cpu_s": totals.get("cpu_s", 0.0),
+            "bytes_read": totals.get("bytes_read", 0),
+            "bytes_transferred": totals.get("bytes_in", 0) + totals.get("bytes_out", 0),
+            "energy_wh": wh,
+            "co2e_g": co2e_g(wh),
+            "wh_per_classification": wh / count if count else 0.0,
+            "co2e_mg_per_classification": co2e_g(wh) * 1000 / count if count else 0.0,
+        })
+    return rows
+
+
+def feature_costs(days=7, path=FOOTPRINT_PATH):
+    """
+    Coût CPU de chaque feature sur les derniers jours, de la plus chère à la moins chère.
+
+    Returns:
+        list: dicts {name, calls, cpu_ms_mean, share, wh_per_1000, co2e_mg_per_1000}
+    """
+    totals = {}
+    for _, sections in sorted(load_days(path).items(), reverse=True)[:days]:
+        for name, values in sections["features"].items():
+            _add(totals.setdefault(name, {}), values, FEATURE_FIELDS)
+
+    all_cpu = sum(values["cpu_s"] for values in totals.values()) or 1.0
+    rows = []
+    for name, values in totals.items():
+        mean_s = values["cpu_s"] / values["count"] if values["count"] else 0.0
+        wh = energy_wh(cpu_s=mean_s * 1000)
+        rows.append({
+            "name": name,
+            "calls": values["count"],
+            "cpu_ms_mean": mean_s * 1000,
+            "share": values["cpu_s"] / all_cpu,
+            "wh_per_1000": wh,
+            "co2e_mg_per_1000": co2e_g(wh) * 1000,
+        })
+    return sorted(rows, key=lambda row: row["cpu_ms_mean"], reverse=True)
+
+
+# === Hooks Flask ===
+
+def init_app(app):
+    """Installe la mesure des requêtes de classification sur l'application"""
+    from flask import request, g
+
+    @app.before_request
+    def _start_footprint():
+        if request.method != "POST" or request.endpoint not in CLASSIFICATION_ENDPOINTS:
+            return
+        g.footprint_start = time.thread_time()
+        g.footprint_token = _current.set({"bytes_read": 0, "features": {}, "classified": False})
+
+    @app.after_request
+    def _record_footprint(response):
+        token = g.pop("footprint_token", None)
+        if token is None:
+            return response
+        measures = _current.get()
+        _current.reset(token)
+        if not measures.pop("classified"):
+            return response
+        measures["cpu_s"] = time.thread_time() - g.pop("footprint_start")
+        measures["bytes_in"] = request.content_length or 0
+        measures["bytes_out"] = response.calculate_content_length() or 0
+        record(request.endpoint, measures)
+
+        wh = energy_wh(**measures)
+        logger.debug("Empreinte de la classification", extra={
+            "endpoint": request.endpoint,
+            "cpu_ms": round(measures["cpu_s"] * 1000, 1),
+            "bytes_in": measures["bytes_in"],
+            "energy_mwh": round(wh * 1000, 3),
+            "co2e_mg": round(co2e_g(wh) * 1000, 3),
+        })
+        return response
+
+    @app.teardown_request
+    def _discard_footprint(exc):
+        token = g.pop("footprint_token", None)
+        if token is not None:
+            _current.reset(token)
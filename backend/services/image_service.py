@@ -1,15 +1,79 @@
+import threading
+from collections import OrderedDict
+
 from backend.config import supabase
+from backend.services.storage import db_file_path
+
+# Cache LRU de la page d'annotation : name_image -> (image, dernière annotation)
+IMAGE_CACHE_SIZE = 256
+_image_cache = OrderedDict()
+_image_cache_lock = threading.Lock()
+
+def features_payload(features, tier="full"):
+    """
+    Paramètres p_features / p_extractor_version / p_tier des fonctions d'insertion.
+
+    Args:
+        features (dict): Résultat de ImageFeatures.extract_all_features (ou None)
+        tier (str): Palier du mode éco utilisé pour les calculer
+
+    Returns:
+        dict: Paramètres RPC (vides si `features` est None)
+    """
+    if features is None:
+        return {}
+    # Import local : la version vit avec l'extracteur (cv2, numpy)
+    from backend.services.feature_extractor import FEATURE_EXTRACTOR_VERSION
+    return {
+        "p_features": {name: float(value) for name, value in features.items()},
+        "p_extractor_version": FEATURE_EXTRACTOR_VERSION,
+        "p_tier": tier or "full",
+    }
 
 def insert_image_metadata(
     filename, user_id,
     location=None,
     size=None, width=None, height=None,
     avg_red=None, avg_green=None, avg_blue=None, contrast=None,
-    edges_detected=None
+    edges_detected=None,
+    features=None, tier="full"
 ):
     return supabase.rpc("creation_image", {
         "p_user_id": user_id,
-        "p_file_path": f"/uploads/{filename}",
+        "p_file_path": db_file_path(filename),
+        "p_name_image": filename,
+        "p_size": size,
+        "p_width": width,
+        "p_height": height,
+        "p_avg_red": avg_red,
+        "p_avg_green": avg_green,
+        "p_avg_blue": avg_blue,
+        "p_contrast": contrast,
+        "p_edges_detected": bool(edges_detected),
+        "p_localisation": location,
+        **features_payload(features, tier)
+    }).execute()
+
+def create_image_with_annotation(
+    filename, user_id,
+    location=None,
+    size=None, width=None, height=None,
+    avg_red=None, avg_green=None, avg_blue=None, contrast=None,
+    edges_detected=None,
+    label=None, source='manuel',
+    features=None, tier="full"
+):
+    """
+    Insère l'image et, si `label` est fourni, son annotation dans la même
+    transaction (un seul appel à la base). Si `features` est fourni, le
+    vecteur complet est enregistré dans image_features (même transaction).
+
+    Returns:
+        int: image_id de l'image créée
+    """
+    result = supabase.rpc("creation_image_with_annotation", {
+        "p_user_id": user_id,
+        "p_file_path": db_file_path(filename),
         "p_name_image": filename,
         "p_size": size,
         "p_width": width,
@@ -19,18 +83,112 @@ def insert_image_metadata(
         "p_avg_blue": avg_blue,
         "p_contrast": contrast,
         "p_edges_detected": bool(edges_detected),
-        "p_localisation": location
+        "p_localisation": location,
+        "p_label": label,
+        "p_source": source,
+        **features_payload(features, tier)
     }).execute()
+    # Même contenu déjà uploadé : la ligne la plus récente change
+    invalidate_image(filename=filename)
+    return result.data
 
 def insert_annotation(image_id, label, source='manuel'):
-    return supabase.rpc("creation_annotation", {
+    result = supabase.rpc("creation_annotation", {
         "p_image_id": image_id,
         "p_label": label,
         "p_source": source
     }).execute()
+    invalidate_image(image_id=image_id)
+    return result
+
+def save_image_features(image_id, features, tier="full"):
+    """Enregistre (ou remplace) le vecteur de features d'une image pour la version courante de l'extracteur"""
+    return supabase.rpc("creation_image_features", {
+        "p_image_id": image_id,
+        **features_payload(features, tier)
+    }).execute()
+
+def get_features(image_ids, extractor_version=None):
+    """
+    Vecteurs de features enregistrés, sans relire les pixels.
+
+    Args:
+        image_ids (int | list): Une image ou plusieurs
+        extractor_version (int): Version voulue (par défaut : FEATURE_EXTRACTOR_VERSION).
+            Les vecteurs d'une autre version sont ignorés : ils ne sont plus comparables
+
+    Returns:
+        dict | None: Pour une image : {"features", "tier", "extractor_version", "computed_at"} ou None.
+        Pour une liste : {image_id: même dict}, sans les images non calculées
+    """
+    if extractor_version is None:
+        from backend.services.feature_extractor import FEATURE_EXTRACTOR_VERSION
+        extractor_version = FEATURE_EXTRACTOR_VERSION
+
+    single = not isinstance(image_ids, (list, tuple, set))
+    ids = [image_ids] if single else list(image_ids)
+    rows = {}
+    # Requêtes par paquets : la liste d'identifiants passe dans l'URL PostgREST
+    for i in range(0, len(ids), 500):
+        result = supabase.table("image_features") \
+            .select("image_id, extractor_version, features, tier, computed_at") \
+            .in_("image_id", ids[i:i + 500]) \
+            .eq("extractor_version", extractor_version) \
+            .execute()
+        for row in result.data or []:
+            rows[row["image_id"]] = {k: v for k, v in row.items() if k != "image_id"}
+
+    if single:
+        return rows.get(image_ids)
+    return rows
 
 def get_image_id_by_filename(filename):
     result = supabase.table("image").select("image_id").eq("name_image", filename).order("upload_date", desc=True).limit(1).execute()
     if result.data and len(result.data) > 0:
         return result.data[0]['image_id']
     return None
+
+def get_image_with_annotation(filename):
+    """
+    Image la plus récente portant ce nom et sa dernière annotation,
+    en une seule requête (jointure), avec un cache LRU par nom de fichier.
+
+    Returns:
+        tuple: (ligne image, ligne annotation ou None), ou (None, None) si absente
+    """
+    with _image_cache_lock:
+        if filename in _image_cache:
+            _image_cache.move_to_end(filename)
+            return _image_cache[filename]
+
+    result = supabase.table("image") \
+        .select("*, annotation(*)") \
+        .eq("name_image", filename) \
+        .order("upload_date", desc=True) \
+        .limit(1) \
+        .execute()
+    if not result.data:
+        # Pas de mise en cache : l'image peut être insérée juste après
+        return None, None
+
+    image_data = dict(result.data[0])
+    annotations = image_data.pop("annotation", None) or []
+    annotation_data = max(annotations, key=lambda a: a["annotation_id"]) if annotations else None
+
+    entry = (image_data, annotation_data)
+    with _image_cache_lock:
+        _image_cache[filename] = entry
+        _image_cache.move_to_end(filename)
+        while len(_image_cache) > IMAGE_CACHE_SIZE:
+            _image_cache.popitem(last=False)
+    return entry
+
+def invalidate_image(filename=None, image_id=None):
+    """Retire du cache l'entrée d'une image (par nom ou par identifiant)"""
+    with _image_cache_lock:
+        if filename is not None:
+            _image_cache.pop(filename, None)
+        if image_id is not None:
+            for name, (image_data, _) in list(_image_cache.items()):
+                if image_data.get("image_id") == image_id:
+                    del _image_cache[name]
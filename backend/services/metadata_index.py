@@ -0,0 +1,428 @@
+# backend/services/metadata_index.py
+
+"""
+Index binaire du cache de métadonnées (alternative à json.load)
+
+LOGIQUE GÉNÉRALE :
+- Un seul fichier, ouvert en mmap (lecture seule) : plusieurs processus
+  partagent les mêmes pages en mémoire, rien n'est parsé à l'ouverture
+- Les colonnes numériques sont dans un tableau de records à largeur fixe
+  (tableau structuré numpy), les chaînes dans une table de chaînes UTF-8
+  référencées par (offset, longueur)
+- Les annotations sont dans un second tableau de records ; chaque image
+  pointe vers sa plage d'annotations
+- Deux tables de hachage (adressage ouvert, sondage linéaire) donnent la
+  position d'une image par image_id ou par name_image en O(1)
+
+FORMAT :
+  [magic 8 octets][longueur de l'en-tête u32][en-tête JSON]
+  puis les sections (alignées sur 8 octets) : images, annotations, chaînes,
+  index image_id, index name_image. L'en-tête donne leurs offsets (relatifs
+  à la fin de l'en-tête).
+
+Le JSON du cache se convertit dans les deux sens : json_to_index / index_to_json.
+"""
+
+import os
+import json
+import mmap
+import zlib
+import tempfile
+
+import numpy as np
+
+MAGIC = b"WDPIDX1\0"
+VERSION = 1
+
+# Valeurs NULL des colonnes entières (les flottants utilisent NaN)
+INT_NULL = np.iinfo(np.int64).min
+STR_NULL = np.iinfo(np.uint32).max
+BOOL_NULL = -1
+EMPTY_SLOT = -1
+
+STRING_REF = [("off", "<u4"), ("len", "<u4")]
+
+# Colonnes d'une image : nom -> type ("int", "float", "bool", "str")
+IMAGE_COLUMNS = {
+    "image_id": "int",
+    "file_path": "str",
+    "name_image": "str",
+    "upload_date": "str",
+    "user_id": "int",
+    "size": "float",
+    "width": "int",
+    "height": "int",
+    "avg_red": "float",
+    "avg_green": "float",
+    "avg_blue": "float",
+    "contrast": "float",
+    "edges_detected": "bool",
+    "localisation": "str",
+    "date_i": "str",
+}
+
+ANNOTATION_COLUMNS = {
+    "annotation_id": "int",
+    "label": "str",
+    "source": "str",
+    "date_a": "str",
+    "image_id": "int",
+}
+
+_NUMPY_TYPES = {"int": "<i8", "float": "<f8", "bool": "i1", "str": STRING_REF}
+
+
+def _record_dtype(columns, extra=()):
+    return np.dtype([(name, _NUMPY_TYPES[kind]) for name, kind in columns.items()] + list(extra))
+
+
+IMAGE_DTYPE = _record_dtype(IMAGE_COLUMNS, [("ann_start", "<u4"), ("ann_count", "<u4")])
+ANNOTATION_DTYPE = _record_dtype(ANNOTATION_COLUMNS)
+
+
+def _hash_id(value):
+    return zlib.crc32(int(value).to_bytes(8, "little", signed=True))
+
+
+def _hash_name(value):
+    return zlib.crc32(value.encode("utf-8"))
+
+
+def _table_capacity(count):
+    """Puissance de 2 au moins égale au double du nombre d'entrées (taux de remplissage <= 50 %)"""
+    capacity = 8
+    while capacity < 2 * count:
+        capacity *= 2
+    return capacity
+
+
+class _StringTable:
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+        self.seen = {}
+
+    def add(self, value):
+        if value is None:
+            return (0, STR_NULL)
+        if value in self.seen:
+            return self.seen[value]
+        data = str(value).encode("utf-8")
+        ref = (self.size, len(data))
+        self.chunks.append(data)
+        self.size += len(data)
+        self.seen[value] = ref
+        return ref
+
+    def tobytes(self):
+        return b"".join(self.chunks)
+
+
+def _encode(value, kind, strings):
+    if kind == "str":
+        return strings.add(value)
+    if value is None:
+        return {"int": INT_NULL, "float": np.nan, "bool": BOOL_NULL}[kind]
+    if kind == "bool":
+        return int(bool(value))
+    return value
+
+
+def _fill_records(rows, columns, dtype, strings):
+    array = np.zeros(len(rows), dtype=dtype)
+    for name, kind in columns.items():
+        array[name] = [_encode(row.get(name), kind, strings) for row in rows]
+    return array
+
+
+def _build_hash_table(keys, hash_fn):
+    slots = np.full(_table_capacity(len(keys)), EMPTY_SLOT, dtype="<i4")
+    mask = len(slots) - 1
+    for position, key in enumerate(keys):
+        if key is None:
+            continue
+        slot = hash_fn(key) & mask
+        while slots[slot] != EMPTY_SLOT:
+            slot = (slot + 1) & mask
+        slots[slot] = position
+    return slots
+
+
+def _padding(offset):
+    return (-offset) % 8
+
+
+def build_index(records, index_path):
+    """
+    Écrit l'index binaire d'une liste d'images (format du cache JSON).
+    Écriture atomique : fichier temporaire puis rename.
+
+    Args:
+        records (list): Images (dicts avec une liste "annotation")
+        index_path (str): Fichier de sortie
+
+    Returns:
+        int: Nombre d'images indexées
+    """
+    strings = _StringTable()
+
+    # Colonnes présentes dans la source, dans leur ordre (pour un aller-retour exact)
+    image_keys = list(dict.fromkeys(k for r in records for k in r))
+    annotations, starts = [], []
+    for record in records:
+        starts.append(len(annotations))
+        annotations.extend(record.get("annotation") or [])
+    annotation_keys = list(dict.fromkeys(k for a in annotations for k in a))
+
+    images = _fill_records(records, IMAGE_COLUMNS, IMAGE_DTYPE, strings)
+    images["ann_start"] = starts
+    images["ann_count"] = [len(r.get("annotation") or []) for r in records]
+    annotation_array = _fill_records(annotations, ANNOTATION_COLUMNS, ANNOTATION_DTYPE, strings)
+
+    id_table = _build_hash_table([r.get("image_id") for r in records], _hash_id)
+    name_table = _build_hash_table([r.get("name_image") for r in records], _hash_name)
+
+    sections = [
+        ("images", images.tobytes()),
+        ("annotations", annotation_array.tobytes()),
+        ("strings", strings.tobytes()),
+        ("id_index", id_table.tobytes()),
+        ("name_index", name_table.tobytes()),
+    ]
+    header = {
+        "version": VERSION,
+        "count": len(records),
+        "annotation_count": len(annotations),
+        "image_keys": image_keys,
+        "annotation_keys": annotation_keys,
+        "id_capacity": len(id_table),
+        "name_capacity": len(name_table),
+    }
+
+    # Offsets relatifs au début des données (fin de l'en-tête, alignée sur 8 octets)
+    offsets, offset = {}, 0
+    for name, blob in sections:
+        offsets[name] = offset
+        offset += len(blob) + _padding(len(blob))
+    header["offsets"] = offsets
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    data_start = len(MAGIC) + 4 + len(header_bytes)
+    header_bytes += b" " * _padding(data_start)
+
+    directory = os.path.dirname(index_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".idx")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(len(header_bytes).to_bytes(4, "little"))
+            f.write(header_bytes)
+            for _, blob in sections:
+                f.write(blob)
+                f.write(b"\0" * _padding(len(blob)))
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return len(records)
+
+
+class MetadataIndex:
+    """
+    Index binaire ouvert en mmap.
+
+    Usage:
+        with MetadataIndex("cache/images_metadata.idx") as index:
+            image = index.get_by_name("00204_00.jpg")
+            for image in index:      # parcours complet en flux
+                ...
+    """
+    def __init__(self, index_path):
+        self.path = index_path
+        with open(index_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{index_path} n'est pas un index de métadonnées")
+        header_len = int.from_bytes(self._mmap[len(MAGIC):len(MAGIC) + 4], "little")
+        start = len(MAGIC) + 4
+        self.header = json.loads(self._mmap[start:start + header_len].decode("utf-8"))
+        data_start = start + header_len
+        offsets = {name: data_start + offset for name, offset in self.header["offsets"].items()}
+
+        def view(name, dtype, count):
+            return np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offsets[name])
+
+        self._images = view("images", IMAGE_DTYPE, self.header["count"])
+        self._annotations = view("annotations", ANNOTATION_DTYPE, self.header["annotation_count"])
+        self._id_index = view("id_index", "<i4", self.header["id_capacity"])
+        self._name_index = view("name_index", "<i4", self.header["name_capacity"])
+        self._strings_offset = offsets["strings"]
+
+    def close(self):
+        # Les vues internes disparaissent avant la fermeture du mmap
+        self._images = self._annotations = self._id_index = self._name_index = None
+        mm, self._mmap = self._mmap, None
+        if mm is None:
+            return
+        try:
+            mm.close()
+        except BufferError:
+            # Une colonne (column()) est encore référencée par l'appelant : le
+            # mapping reste valide pour elle et sera libéré par le GC avec la
+            # dernière vue
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.header["count"]
+
+    def _string(self, ref):
+        off, length = int(ref["off"]), int(ref["len"])
+        if length == STR_NULL:
+            return None
+        start = self._strings_offset + off
+        return self._mmap[start:start + length].decode("utf-8")
+
+    def _decode(self, record, columns, keys):
+        row = {}
+        for name in keys:
+            kind = columns.get(name)
+            if kind is None:
+                continue
+            value = record[name]
+            if kind == "str":
+                row[name] = self._string(value)
+            elif kind == "float":
+                row[name] = None if np.isnan(value) else float(value)
+            elif kind == "bool":
+                row[name] = None if value == BOOL_NULL else bool(value)
+            else:
+                row[name] = None if value == INT_NULL else int(value)
+        return row
+
+    def _row(self, position):
+        record = self._images[position]
+        row = self._decode(record, IMAGE_COLUMNS, self.header["image_keys"])
+        if "annotation" in self.header["image_keys"]:
+            start, count = int(record["ann_start"]), int(record["ann_count"])
+            row["annotation"] = [
+                self._decode(self._annotations[i], ANNOTATION_COLUMNS, self.header["annotation_keys"])
+                for i in range(start, start + count)
+            ]
+        return row
+
+    def _lookup(self, table, hash_value, matches):
+        mask = len(table) - 1
+        slot = hash_value & mask
+        while True:
+            position = int(table[slot])
+            if position == EMPTY_SLOT:
+                return None
+            if matches(position):
+                return position
+            slot = (slot + 1) & mask
+
+    def get_by_id(self, image_id):
+        """Image par image_id (dict au format du cache JSON) ou None"""
+        position = self._lookup(self._id_index, _hash_id(image_id),
+                                lambda p: int(self._images[p]["image_id"]) == image_id)
+        return None if position is None else self._row(position)
+
+    def get_by_name(self, name_image):
+        """Image par name_image (dict au format du cache JSON) ou None"""
+        position = self._lookup(self._name_index, _hash_name(name_image),
+                                lambda p: self._string(self._images[p]["name_image"]) == name_image)
+        return None if position is None else self._row(position)
+
+    def __iter__(self):
+        """Parcours en flux : une image décodée à la fois"""
+        for position in range(len(self)):
+            yield self._row(position)
+
+    def column(self, name):
+        """
+        Colonne numérique complète (vue numpy, sans copie), ex : index.column("size").
+        La vue reste lisible après close() : le mapping est libéré avec elle.
+        """
+        if IMAGE_COLUMNS.get(name) == "str":
+            raise ValueError(f"'{name}' est une colonne texte")
+        return self._images[name]
+
+
+def json_to_index(json_path, index_path):
+    """Convertit un cache JSON en index binaire"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        return build_index(json.load(f), index_path)
+
+
+def index_to_json(index_path, json_path):
+    """Reconvertit un index binaire en cache JSON"""
+    with MetadataIndex(index_path) as index:
+        records = list(index)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(records, f, separators=(",", ":"), ensure_ascii=False)
+    return len(records)
+
+
+def check_index(json_path):
+    """
+    Vérifie la conversion d'un cache JSON : index construit dans un fichier
+    temporaire, relu, comparé au JSON (lignes, recherches par image_id et
+    name_image), puis colonne gardée après close().
+
+    Returns:
+        int: nombre d'images vérifiées
+
+    Raises:
+        AssertionError: à la première différence
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    fd, index_path = tempfile.mkstemp(suffix=".idx")
+    os.close(fd)
+    try:
+        build_index(records, index_path)
+        index = MetadataIndex(index_path)
+        try:
+            assert len(index) == len(records), "nombre d'images différent"
+            for expected, row in zip(records, index):
+                assert row == expected, f"image {expected.get('image_id')} différente après conversion"
+                if expected.get("image_id") is not None:
+                    assert index.get_by_id(expected["image_id"]) == expected, "recherche par image_id"
+                if expected.get("name_image"):
+                    assert index.get_by_name(expected["name_image"]) is not None, "recherche par name_image"
+            sizes = index.column("size")
+        finally:
+            # Vue column() encore référencée : close() ne doit pas échouer
+            index.close()
+        expected_sizes = [np.nan if r.get("size") is None else r["size"] for r in records]
+        assert np.allclose(sizes, expected_sizes, equal_nan=True), "colonne différente après close()"
+        del sizes
+    finally:
+        os.remove(index_path)
+    return len(records)
+
+
+if __name__ == "__main__":
+    """
+    Vérifie la conversion d'un cache : python -m backend.services.metadata_index --check cache/images_metadata.json
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Index binaire du cache de métadonnées")
+    parser.add_argument("--check", metavar="JSON", help="Vérifier la conversion JSON -> index -> JSON d'un cache")
+    args = parser.parse_args()
+
+    if args.check:
+        print(f"✅ {check_index(args.check)} images vérifiées")
+    else:
+        parser.print_help()
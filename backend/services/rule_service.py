@@ -1,6 +1,7 @@
-from backend.config import supabase
-from backend.services.rules_engine import default_rules_engine  
+from backend.config import supabase, RULES_CACHE_TTL, CACHE_STALE_TTL
+from backend.utils.ttl_cache import ttl_cache
 
+@ttl_cache(RULES_CACHE_TTL, stale=CACHE_STALE_TTL)
 def get_all_rules():
     response = supabase.table("classification_rules").select("*").order("id").execute()
     return response.data
@@ -10,14 +11,29 @@ def update_rule_threshold(rule_name, new_value):
         .update({"threshold_value": new_value}) \
         .eq("rule_name", rule_name) \
         .execute()
+    get_all_rules.cache_clear()
 
 
+def update_thresholds(thresholds):
+    """
+    Met à jour plusieurs seuils en un seul appel (une transaction).
+
+    Args:
+        thresholds (dict): {rule_name: threshold_value}
+
+    Returns:
+        int: Nombre de règles mises à jour
+    """
+    response = supabase.rpc("bulk_update_thresholds", {"p_thresholds": thresholds}).execute()
+    get_all_rules.cache_clear()
+    return response.data
+
 def reset_all_thresholds():
-    default_rules_engine.reset_thresholds()
-    defaults = default_rules_engine.get_thresholds()
+    # Import local : le moteur global n'est construit qu'au premier reset
+    from backend.services.rules_engine import default_rules_engine, DEFAULT_THRESHOLDS
 
-    # 1 requête par règle, mais pas d’erreur de NOT NULL
-    for name, value in defaults.items():
-        update_rule_threshold(name, value)
+    # Base d'abord : le moteur n'est modifié que si la transaction a réussi
+    update_thresholds(DEFAULT_THRESHOLDS)
+    default_rules_engine.load_thresholds(DEFAULT_THRESHOLDS, replace=True)
 
-    return defaults
\ No newline at end of file
+    return default_rules_engine.get_thresholds()
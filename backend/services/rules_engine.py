@@ -1,5 +1,62 @@
 # backend/services/rules_engine.py
 
+import logging
+
+from backend.utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Seuils par défaut (reset_thresholds, reset des règles en base)
+DEFAULT_THRESHOLDS = {
+    # Seuils pour règles "plein" (positives) - RECALIBRÉS PLUS STRICTS
+    'area_ratio_high': 0.60,
+    'hue_std_high': 60,
+    'contrast_iqr_high': 85,
+    'edge_density_low': 0.07,
+    'mean_brightness_low': 115,
+
+    # Seuils pour règles "vide" (négatives) - RECALIBRÉS PLUS PERMISSIFS
+    'area_ratio_low': 0.50,
+    'hue_std_low': 55,
+    'contrast_iqr_low': 75,
+    'edge_density_high': 0.09,
+    'mean_brightness_high': 125,
+
+    # NOUVEAUX SEUILS pour features avancées
+    'texture_entropy_high': 6.5,
+    'texture_entropy_low': 5.0,
+    'color_complexity_high': 0.15,
+    'color_complexity_low': 0.08,
+    'brightness_variance_high': 800,
+    'brightness_variance_low': 400,
+    'spatial_frequency_high': 15,
+    'spatial_frequency_low': 8,
+    'fill_ratio_advanced_high': 0.45,
+    'fill_ratio_advanced_low': 0.25,
+
+    # SEUILS pour les règles avancées ajoutées
+    'spatial_frequency_very_low': 5,
+    'file_size_high': 0.25,
+    'file_size_low': 0.08,
+    'edge_coherence_high': 0.7,
+    'edge_coherence_low': 0.3,
+
+    # NOUVEAUX SEUILS pour règles avancées supplémentaires (PLEIN)
+    'red_blue_ratio_high': 1.2,
+    'saturation_high': 0.4,
+    'corner_variance_high': 0.3,
+    'vertical_fill_high': 0.65,
+    'irregular_shapes_high': 0.5,
+
+    # NOUVEAUX SEUILS pour règles avancées supplémentaires (VIDE)
+    'symmetry_high': 0.7,
+    'background_uniformity_high': 0.6,
+    'center_emptiness_high': 0.7,
+    'vertical_fill_low': 0.4,
+    'perspective_strength': 0.5,
+}
+
+
 class Rule:
     def __init__(self, name, condition_fn, weight=1.0):
         self.name = name
@@ -298,6 +355,7 @@ class RulesEngine:
                  weight=-2.5),  # Augmenté modérément
         ]
 
+    @span("scoring")
     def evaluate(self, features):
         """
         Évalue toutes les règles et calcule un score global normalisé
@@ -374,13 +432,13 @@ class RulesEngine:
             if threshold_name in self.thresholds:
                 old_value = self.thresholds[threshold_name]
                 self.thresholds[threshold_name] = value
-                print(f"Seuil '{threshold_name}' modifié: {old_value} → {value}")
+                logger.info("Seuil modifié", extra={"threshold": threshold_name, "old": old_value, "new": value})
             else:
-                print(f"Seuil '{threshold_name}' introuvable. Seuils disponibles: {list(self.thresholds.keys())}")
+                logger.warning("Seuil '%s' introuvable", threshold_name, extra={"available": list(self.thresholds)})
         
         # Recréer les règles avec les nouveaux seuils
         self.rules = self._create_default_rules()
-        print("Règles mises à jour avec les nouveaux seuils")
+        logger.debug("Règles mises à jour avec les nouveaux seuils")
 
     def get_thresholds(self):
         """
@@ -391,64 +449,35 @@ class RulesEngine:
         """
         return self.thresholds.copy()
 
+    def load_thresholds(self, thresholds, replace=False):
+        """
+        Applique un ensemble de seuils en une fois (les règles ne sont
+        reconstruites qu'une seule fois, sans affichage)
+
+        Args:
+            thresholds (dict): {nom_seuil: valeur}
+            replace (bool): Remplacer tous les seuils au lieu de mettre à jour
+                            seulement ceux fournis
+
+        Returns:
+            dict: Seuils effectivement appliqués
+        """
+        if replace:
+            applied = dict(thresholds)
+            self.thresholds = applied.copy()
+        else:
+            applied = {k: v for k, v in thresholds.items() if k in self.thresholds}
+            self.thresholds.update(applied)
+        self.rules = self._create_default_rules()
+        return applied
+
     def reset_thresholds(self):
         """
         Remet les seuils aux valeurs par défaut
         
         UTILITÉ : Revenir aux paramètres originaux après expérimentation
         """
-        default_thresholds = {
-            # Seuils pour règles "plein" (positives) - RECALIBRÉS PLUS STRICTS
-            'area_ratio_high': 0.60,
-            'hue_std_high': 60,
-            'contrast_iqr_high': 85,
-            'edge_density_low': 0.07,
-            'mean_brightness_low': 115,
-            
-            # Seuils pour règles "vide" (négatives) - RECALIBRÉS PLUS PERMISSIFS
-            'area_ratio_low': 0.50,
-            'hue_std_low': 55,
-            'contrast_iqr_low': 75,
-            'edge_density_high': 0.09,
-            'mean_brightness_high': 125,
-            
-            # NOUVEAUX SEUILS pour features avancées
-            'texture_entropy_high': 6.5,
-            'texture_entropy_low': 5.0,
-            'color_complexity_high': 0.15,
-            'color_complexity_low': 0.08,
-            'brightness_variance_high': 800,
-            'brightness_variance_low': 400,
-            'spatial_frequency_high': 15,
-            'spatial_frequency_low': 8,
-            'fill_ratio_advanced_high': 0.45,
-            'fill_ratio_advanced_low': 0.25,
-            
-            # SEUILS pour les règles avancées ajoutées
-            'spatial_frequency_very_low': 5,
-            'file_size_high': 0.25,
-            'file_size_low': 0.08,
-            'edge_coherence_high': 0.7,
-            'edge_coherence_low': 0.3,
-            
-            # NOUVEAUX SEUILS pour règles avancées supplémentaires (PLEIN)
-            'red_blue_ratio_high': 1.2,
-            'saturation_high': 0.4,
-            'corner_variance_high': 0.3,
-            'vertical_fill_high': 0.65,
-            'irregular_shapes_high': 0.5,
-            
-            # NOUVEAUX SEUILS pour règles avancées supplémentaires (VIDE)
-            'symmetry_high': 0.7,
-            'background_uniformity_high': 0.6,
-            'center_emptiness_high': 0.7,
-            'vertical_fill_low': 0.4,
-            'perspective_strength': 0.5,
-        }
-        
-        self.thresholds = default_thresholds
-        self.rules = self._create_default_rules()
-        print("✅ Seuils remis aux valeurs par défaut")
+        self.load_thresholds(DEFAULT_THRESHOLDS, replace=True)
         
     def add_rule(self, name, condition_fn, weight=1.0):
         """
@@ -510,7 +539,7 @@ class RulesEngine:
         import json
         with open(filepath, 'w', encoding='utf-8') as f:
             json.dump(self.thresholds, f, indent=2, ensure_ascii=False)
-        print(f"Seuils sauvegardés dans {filepath}")
+        logger.info("Seuils sauvegardés", extra={"path": filepath})
 
     def load_thresholds_profile(self, filepath):
         """
@@ -520,9 +549,8 @@ class RulesEngine:
         """
         import json
         with open(filepath, 'r', encoding='utf-8') as f:
-            self.thresholds = json.load(f)
-        self.rules = self._create_default_rules()
-        print(f"sSeuils chargés depuis {filepath}")
+            self.load_thresholds(json.load(f), replace=True)
+        logger.info("Seuils chargés", extra={"path": filepath})
 
 
 # Instance globale pour compatibilité avec l'ancien code
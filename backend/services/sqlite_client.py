@@ -0,0 +1,752 @@
+# backend/services/sqlite_client.py
+
+"""
+Base SQLite locale remplaçant Supabase (benchmarks, tests de charge, hors-ligne)
+
+LOGIQUE GÉNÉRALE :
+- Expose la même interface que le client Supabase utilisé par les services :
+  client.table(...).select(...).eq(...).order(...).limit(...).execute()
+  et client.rpc(nom, params).execute()
+- Reprend les tables de Data/schema.sql (User, image, annotation,
+  image_features, classification_rules) et réimplémente ses fonctions
+  (creation_image, creation_annotation, nb_poubelles_*, verify_password, ...)
+- Au premier démarrage, la base est remplie depuis Data/BDD_Trash_Analyser_*.csv
+- Chaque execute() compte comme un aller-retour réseau : get_stats() donne
+  le nombre de requêtes et leur latence pour mesurer le code applicatif
+
+SÉLECTION :
+  WDP_DATA_BACKEND=sqlite (voir backend/config.py), chemin via WDP_SQLITE_PATH
+"""
+
+import os
+import csv
+import json
+import time
+import sqlite3
+import hashlib
+import secrets
+import threading
+from collections import Counter
+from datetime import datetime
+
+try:
+    import bcrypt  # Optionnel : vérifie les mots de passe importés de Supabase ($2a$...)
+except ImportError:
+    bcrypt = None
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "Data"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS "User" (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL CHECK (role IN ('Admin', 'Citoyen', 'Agent'))
+);
+
+CREATE TABLE IF NOT EXISTS image (
+    image_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_path TEXT NOT NULL,
+    name_image TEXT,
+    upload_date TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    user_id INTEGER REFERENCES "User"(user_id),
+    size REAL,
+    width INTEGER,
+    height INTEGER,
+    avg_red REAL,
+    avg_green REAL,
+    avg_blue REAL,
+    contrast REAL,
+    edges_detected INTEGER,
+    localisation TEXT,
+    date_i TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_image_name ON image(name_image);
+
+CREATE TABLE IF NOT EXISTS annotation (
+    annotation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    label TEXT NOT NULL CHECK (label IN ('plein', 'vide', 'inconnu')),
+    source TEXT NOT NULL CHECK (source IN ('manuel', 'auto')),
+    date_a TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    image_id INTEGER REFERENCES image(image_id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_annotation_image ON annotation(image_id);
+
+CREATE TABLE IF NOT EXISTS image_features (
+    image_id INTEGER NOT NULL REFERENCES image(image_id) ON DELETE CASCADE,
+    extractor_version INTEGER NOT NULL,
+    features TEXT NOT NULL,
+    tier TEXT NOT NULL DEFAULT 'full',
+    computed_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    PRIMARY KEY (image_id, extractor_version)
+);
+
+CREATE TABLE IF NOT EXISTS classification_rules (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    rule_name TEXT UNIQUE NOT NULL,
+    description TEXT NOT NULL,
+    threshold_operator TEXT NOT NULL CHECK (threshold_operator IN ('<', '>', '<=', '>=', '=', '!=')),
+    threshold_value REAL NOT NULL,
+    weight REAL NOT NULL,
+    category TEXT NOT NULL CHECK (category IN ('full', 'empty'))
+);
+"""
+
+PRIMARY_KEYS = {
+    "User": "user_id",
+    "image": "image_id",
+    "annotation": "annotation_id",
+    "image_features": "image_id",
+    "classification_rules": "id",
+}
+
+# Colonnes booléennes (stockées en INTEGER par SQLite)
+BOOLEAN_COLUMNS = {"edges_detected"}
+
+# Colonnes JSONB (stockées en TEXT par SQLite)
+JSON_COLUMNS = {"features"}
+
+# Relations utilisables dans select("..., relation(colonnes)")
+# (table, relation) -> (cardinalité, colonne locale, table distante, colonne distante)
+RELATIONS = {
+    ("image", "annotation"): ("many", "image_id", "annotation", "image_id"),
+    ("image", "image_features"): ("many", "image_id", "image_features", "image_id"),
+    ("annotation", "image"): ("one", "image_id", "image", "image_id"),
+    ("image", "User"): ("one", "user_id", "User", "user_id"),
+}
+
+# Fichiers CSV de Data/ chargés au premier démarrage
+CSV_FILES = [
+    ("User", "BDD_Trash_Analyser_rules_user.csv"),
+    ("image", "BDD_Trash_Analyser_image.csv"),
+    ("annotation", "BDD_Trash_Analyser_annotation.csv"),
+    ("classification_rules", "BDD_Trash_Analyser_rules.csv"),
+]
+
+_OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+class APIResponse:
+    """Réponse au format du client Supabase (attributs data et count)"""
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _split_top_level(text):
+    """Découpe "a, b(c, d), e" sur les virgules hors parenthèses"""
+    parts, depth, current = [], 0, ""
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _parse_select(columns):
+    """
+    Analyse une chaîne de sélection PostgREST.
+
+    Returns:
+        tuple: (colonnes, relations) où relations = [(nom, inner, colonnes)]
+    """
+    fields, embeds = [], []
+    for part in _split_top_level(columns or "*"):
+        if "(" in part:
+            name, inner_columns = part.split("(", 1)
+            name = name.strip()
+            inner = name.endswith("!inner")
+            name = name.replace("!inner", "").split("!")[0]
+            embeds.append((name, inner, inner_columns[:-1]))
+        else:
+            fields.append(part)
+    return fields, embeds
+
+
+def _hash_password(password):
+    if bcrypt is not None:
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    salt = secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), 100_000).hex()
+    return f"pbkdf2_sha256$100000${salt}${digest}"
+
+
+def _check_password(password, stored):
+    """Équivalent de crypt(p_password, password) = password"""
+    if not stored:
+        return False
+    if stored.startswith("$2"):
+        return bcrypt is not None and bcrypt.checkpw(password.encode(), stored.encode())
+    if stored.startswith("pbkdf2_sha256$"):
+        _, iterations, salt, digest = stored.split("$")
+        candidate = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), int(iterations)).hex()
+        return secrets.compare_digest(candidate, digest)
+    # Mot de passe non chiffré : crypt() ne le vérifierait pas non plus
+    return False
+
+
+class QueryBuilder:
+    """Requête sur une table, construite par chaînage comme avec Supabase"""
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.operation = "select"
+        self.columns = "*"
+        self.payload = None
+        self.on_conflict = None
+        self.filters = []
+        self.orders = []
+        self.limit_value = None
+        self.offset_value = 0
+        self.count_mode = None
+        self.single_row = False
+
+    # --- Opérations ---
+    def select(self, columns="*", count=None):
+        self.operation, self.columns, self.count_mode = "select", columns, count
+        return self
+
+    def insert(self, rows):
+        self.operation, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.operation, self.payload = "upsert", rows
+        self.on_conflict = on_conflict or PRIMARY_KEYS[self.table]
+        return self
+
+    def update(self, values):
+        self.operation, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.operation = "delete"
+        return self
+
+    # --- Filtres ---
+    def _filter(self, column, op, value):
+        self.filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def in_(self, column, values):
+        return self._filter(column, "in", list(values))
+
+    def is_(self, column, value):
+        return self._filter(column, "is", value)
+
+    # --- Modificateurs ---
+    def order(self, column, desc=False, **kwargs):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count, **kwargs):
+        self.limit_value = count
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.offset_value = start
+        self.limit_value = end - start + 1
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    def maybe_single(self):
+        return self.single()
+
+    def execute(self):
+        return self.client._execute(self)
+
+
+class RpcCall:
+    """Appel de fonction stockée, exécuté par execute()"""
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params or {}
+
+    def execute(self):
+        return self.client._call_rpc(self.name, self.params)
+
+
+class SQLiteClient:
+    """
+    Client SQLite compatible avec le sous-ensemble du client Supabase
+    utilisé par l'application.
+
+    Args:
+        path (str): Fichier de la base (":memory:" pour une base en mémoire)
+        load_csv (bool): Remplir la base depuis Data/*.csv si elle est vide
+    """
+    def __init__(self, path=":memory:", load_csv=True):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        self.rpcs = {
+            "creation_user": self._rpc_creation_user,
+            "modif_user": self._rpc_modif_user,
+            "supp_user": self._rpc_supp_user,
+            "creation_image": self._rpc_creation_image,
+            "modif_image": self._rpc_modif_image,
+            "supp_image": self._rpc_supp_image,
+            "creation_image_with_annotation": self._rpc_creation_image_with_annotation,
+            "creation_annotation": self._rpc_creation_annotation,
+            "creation_image_features": self._rpc_creation_image_features,
+            "creation_images_batch": self._rpc_creation_images_batch,
+            "modif_annotation": self._rpc_modif_annotation,
+            "supp_annotation": self._rpc_supp_annotation,
+            "nb_poubelles_pleines": self._rpc_nb_poubelles_pleines,
+            "nb_poubelles_vides": self._rpc_nb_poubelles_vides,
+            "nb_poubelles_non_annotées": self._rpc_nb_poubelles_non_annotees,
+            "stats_par_ville": self._rpc_stats_par_ville,
+            "dashboard_summary": self._rpc_dashboard_summary,
+            "verify_password": self._rpc_verify_password,
+            "add_classification_rule": self._rpc_add_classification_rule,
+            "update_classification_rule": self._rpc_update_classification_rule,
+            "delete_classification_rule": self._rpc_delete_classification_rule,
+            "bulk_update_thresholds": self._rpc_bulk_update_thresholds,
+        }
+        self.reset_stats()
+
+        with self.lock:
+            self.conn.executescript(SCHEMA)
+            empty = self.conn.execute("SELECT COUNT(*) FROM image").fetchone()[0] == 0
+            if load_csv and empty:
+                self.load_csv()
+
+    # === Interface Supabase ===
+    def table(self, name):
+        return QueryBuilder(self, name)
+
+    def rpc(self, name, params=None):
+        return RpcCall(self, name, params)
+
+    # === Statistiques ===
+    def reset_stats(self):
+        """Remet à zéro les compteurs de requêtes"""
+        self.stats = {"queries": 0, "total_ms": 0.0, "by_target": Counter()}
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: {"queries": int, "total_ms": float, "by_target": {"select image": n, "rpc creation_image": n, ...}}
+        """
+        return {
+            "queries": self.stats["queries"],
+            "total_ms": round(self.stats["total_ms"], 3),
+            "by_target": dict(self.stats["by_target"]),
+        }
+
+    def _record(self, target, start):
+        self.stats["queries"] += 1
+        self.stats["total_ms"] += (time.perf_counter() - start) * 1000
+        self.stats["by_target"][target] += 1
+
+    # === Chargement des CSV ===
+    def load_csv(self, data_dir=DATA_DIR):
+        """Remplit les tables depuis les exports CSV de Supabase"""
+        with self.lock, self.conn:
+            for table, filename in CSV_FILES:
+                path = os.path.join(data_dir, filename)
+                if not os.path.exists(path):
+                    continue
+                with open(path, newline="", encoding="utf-8") as f:
+                    rows = [self._csv_row(row) for row in csv.DictReader(f)]
+                if not rows:
+                    continue
+                columns = list(rows[0].keys())
+                sql = f"INSERT OR IGNORE INTO {_quote(table)} ({', '.join(map(_quote, columns))}) " \
+                      f"VALUES ({', '.join('?' for _ in columns)})"
+                self.conn.executemany(sql, [tuple(row[c] for c in columns) for row in rows])
+
+    @staticmethod
+    def _csv_row(row):
+        converted = {}
+        for key, value in row.items():
+            value = value.strip() if isinstance(value, str) else value
+            if value in ("", "null"):
+                value = None
+            elif value in ("true", "false"):
+                value = 1 if value == "true" else 0
+            elif key in ("upload_date", "date_a", "date_i"):
+                # Même format que PostgREST : 2025-06-27T09:23:04.615752
+                value = value.replace(" ", "T", 1)
+            converted[key] = value
+        return converted
+
+    # === Exécution des requêtes ===
+    @staticmethod
+    def _to_python(row):
+        data = dict(row)
+        for column in BOOLEAN_COLUMNS & data.keys():
+            if data[column] is not None:
+                data[column] = bool(data[column])
+        for column in JSON_COLUMNS & data.keys():
+            if data[column] is not None:
+                data[column] = json.loads(data[column])
+        return data
+
+    @staticmethod
+    def _to_sql(column, value):
+        return json.dumps(value) if column in JSON_COLUMNS and value is not None else value
+
+    def _where(self, filters):
+        clauses, params = [], []
+        for column, op, value in filters:
+            if op == "is":
+                keyword = "IS NOT NULL" if str(value).lower() in ("not.null", "not null") else "IS NULL"
+                clauses.append(f"{_quote(column)} {keyword}")
+            elif op == "in":
+                if not value:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"{_quote(column)} IN ({', '.join('?' for _ in value)})")
+                params.extend(value)
+            else:
+                clauses.append(f"{_quote(column)} {_OPERATORS[op]} ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _execute(self, query):
+        start = time.perf_counter()
+        with self.lock:
+            try:
+                if query.operation == "select":
+                    response = self._select(query)
+                else:
+                    with self.conn:
+                        response = self._write(query)
+            finally:
+                self._record(f"{query.operation} {query.table}", start)
+        return response
+
+    def _select(self, query):
+        fields, embeds = _parse_select(query.columns)
+        embed_names = {name for name, _, _ in embeds}
+
+        # Les filtres portant sur une relation (ex : is_("annotation", "null")) s'appliquent après
+        sql_filters = [f for f in query.filters if f[0] not in embed_names]
+        post_filters = [f for f in query.filters if f[0] in embed_names]
+        post_process = bool(post_filters) or any(inner for _, inner, _ in embeds)
+
+        where, params = self._where(sql_filters)
+        sql = f"SELECT * FROM {_quote(query.table)}{where}"
+        if query.orders:
+            sql += " ORDER BY " + ", ".join(f"{_quote(c)} {'DESC' if d else 'ASC'}" for c, d in query.orders)
+        if not post_process and query.limit_value is not None:
+            sql += f" LIMIT {int(query.limit_value)} OFFSET {int(query.offset_value)}"
+
+        rows = [self._to_python(r) for r in self.conn.execute(sql, params).fetchall()]
+
+        for name, inner, columns in embeds:
+            self._embed(query.table, rows, name, columns)
+            if inner:
+                rows = [r for r in rows if r[name]]
+        for name, _, value in post_filters:
+            want_null = str(value).lower() == "null"
+            rows = [r for r in rows if (not r[name]) == want_null]
+
+        count = None
+        if query.count_mode:
+            if post_process:
+                count = len(rows)
+            else:
+                count = self.conn.execute(f"SELECT COUNT(*) FROM {_quote(query.table)}{where}", params).fetchone()[0]
+
+        if post_process and query.limit_value is not None:
+            rows = rows[query.offset_value:query.offset_value + query.limit_value]
+
+        if "*" not in fields:
+            keep = set(fields) | embed_names
+            rows = [{k: v for k, v in r.items() if k in keep} for r in rows]
+
+        if query.single_row:
+            return APIResponse(rows[0] if rows else None, count)
+        return APIResponse(rows, count)
+
+    def _embed(self, table, rows, name, columns):
+        kind, local, remote_table, remote = RELATIONS[(table, name)]
+        keys = sorted({r[local] for r in rows if r.get(local) is not None})
+        related = {}
+        # SQLite limite le nombre de paramètres : requêtes par paquets
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            sql = f"SELECT * FROM {_quote(remote_table)} WHERE {_quote(remote)} IN ({', '.join('?' for _ in chunk)}) " \
+                  f"ORDER BY {_quote(PRIMARY_KEYS[remote_table])}"
+            for row in self.conn.execute(sql, chunk).fetchall():
+                related.setdefault(row[remote], []).append(self._to_python(row))
+
+        wanted = [c.strip() for c in columns.split(",")]
+        def project(item):
+            return item if "*" in wanted else {k: v for k, v in item.items() if k in wanted}
+
+        for r in rows:
+            matches = [project(item) for item in related.get(r.get(local), [])]
+            r[name] = matches if kind == "many" else (matches[0] if matches else None)
+
+    def _write(self, query):
+        table = _quote(query.table)
+        if query.operation in ("insert", "upsert"):
+            rows = query.payload if isinstance(query.payload, list) else [query.payload]
+            inserted = []
+            for row in rows:
+                columns = list(row.keys())
+                sql = f"INSERT INTO {table} ({', '.join(map(_quote, columns))}) VALUES ({', '.join('?' for _ in columns)})"
+                if query.operation == "upsert":
+                    updates = [c for c in columns if c != query.on_conflict]
+                    if updates:
+                        sql += f" ON CONFLICT({_quote(query.on_conflict)}) DO UPDATE SET " + \
+                               ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in updates)
+                    else:
+                        sql += f" ON CONFLICT({_quote(query.on_conflict)}) DO NOTHING"
+                sql += " RETURNING *"
+                values = [self._to_sql(c, row[c]) for c in columns]
+                inserted.extend(self._to_python(r) for r in self.conn.execute(sql, values).fetchall())
+            return APIResponse(inserted)
+
+        where, params = self._where(query.filters)
+        if query.operation == "update":
+            columns = list(query.payload.keys())
+            sql = f"UPDATE {table} SET {', '.join(f'{_quote(c)} = ?' for c in columns)}{where} RETURNING *"
+            rows = self.conn.execute(sql, [self._to_sql(c, query.payload[c]) for c in columns] + params).fetchall()
+        else:
+            rows = self.conn.execute(f"DELETE FROM {table}{where} RETURNING *", params).fetchall()
+        return APIResponse([self._to_python(r) for r in rows])
+
+    # === Fonctions stockées (équivalents de Data/schema.sql) ===
+    def _call_rpc(self, name, params):
+        if name not in self.rpcs:
+            raise ValueError(f"Fonction '{name}' inconnue de la base locale")
+        start = time.perf_counter()
+        with self.lock:
+            try:
+                with self.conn:
+                    return APIResponse(self.rpcs[name](**params))
+            finally:
+                self._record(f"rpc {name}", start)
+
+    def _rpc_creation_user(self, p_username, p_email, p_password, p_role="Citoyen"):
+        self.conn.execute(
+            'INSERT INTO "User" (username, email, password, role) VALUES (?, ?, ?, ?)',
+            (p_username, p_email, _hash_password(p_password), p_role),
+        )
+
+    def _rpc_modif_user(self, p_user_id, p_username, p_email, p_password, p_role):
+        self.conn.execute(
+            'UPDATE "User" SET username = ?, email = ?, password = ?, role = ? WHERE user_id = ?',
+            (p_username, p_email, p_password, p_role, p_user_id),
+        )
+
+    def _rpc_supp_user(self, p_user_id):
+        self.conn.execute('DELETE FROM "User" WHERE user_id = ?', (p_user_id,))
+
+    def _rpc_creation_image(self, **image):
+        self._insert_image(**image)
+
+    def _insert_image(self, p_user_id, p_file_path, p_name_image, p_size, p_width, p_height,
+                      p_avg_red, p_avg_green, p_avg_blue, p_contrast, p_edges_detected, p_localisation,
+                      p_features=None, p_extractor_version=None, p_tier="full"):
+        """Insère l'image (et ses features si fournies) et retourne son image_id"""
+        image_id = self.conn.execute(
+            "INSERT INTO image (user_id, file_path, name_image, size, width, height, avg_red, avg_green, "
+            "avg_blue, contrast, edges_detected, localisation, upload_date) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (p_user_id, p_file_path, p_name_image, p_size, p_width, p_height, p_avg_red, p_avg_green,
+             p_avg_blue, p_contrast, p_edges_detected, p_localisation, datetime.now().isoformat()),
+        ).lastrowid
+        if p_features is not None:
+            self.conn.execute(
+                "INSERT INTO image_features (image_id, extractor_version, features, tier) VALUES (?, ?, ?, ?)",
+                (image_id, p_extractor_version, json.dumps(p_features), p_tier),
+            )
+        return image_id
+
+    def _rpc_modif_image(self, p_image_id, p_user_id, p_file_path, p_name_image, p_size, p_width, p_height,
+                         p_avg_red, p_avg_green, p_avg_blue, p_contrast, p_edges_detected, p_localisation):
+        self.conn.execute(
+            "UPDATE image SET user_id = ?, file_path = ?, name_image = ?, size = ?, width = ?, height = ?, "
+            "avg_red = ?, avg_green = ?, avg_blue = ?, contrast = ?, edges_detected = ?, localisation = ? "
+            "WHERE image_id = ?",
+            (p_user_id, p_file_path, p_name_image, p_size, p_width, p_height, p_avg_red, p_avg_green,
+             p_avg_blue, p_contrast, p_edges_detected, p_localisation, p_image_id),
+        )
+
+    def _rpc_supp_image(self, p_image_id):
+        # ON DELETE CASCADE : les annotations et features de l'image sont supprimées aussi
+        self.conn.execute("DELETE FROM annotation WHERE image_id = ?", (p_image_id,))
+        self.conn.execute("DELETE FROM image_features WHERE image_id = ?", (p_image_id,))
+        self.conn.execute("DELETE FROM image WHERE image_id = ?", (p_image_id,))
+
+    def _rpc_creation_annotation(self, p_image_id, p_label, p_source):
+        self.conn.execute(
+            "INSERT INTO annotation (image_id, label, source, date_a) VALUES (?, ?, ?, ?)",
+            (p_image_id, p_label, p_source, datetime.now().isoformat()),
+        )
+
+    def _rpc_creation_image_with_annotation(self, p_label=None, p_source="manuel", **image):
+        image_id = self._insert_image(**image)
+        if p_label is not None:
+            self._rpc_creation_annotation(image_id, p_label, p_source)
+        return image_id
+
+    def _rpc_creation_images_batch(self, p_images, p_extractor_version=None):
+        image_columns = ("user_id", "file_path", "name_image", "size", "width", "height", "avg_red",
+                         "avg_green", "avg_blue", "contrast", "edges_detected", "localisation")
+        return [
+            self._rpc_creation_image_with_annotation(
+                p_label=item.get("label"),
+                p_source=item.get("source") or "manuel",
+                p_features=item.get("features"),
+                p_extractor_version=p_extractor_version,
+                p_tier=item.get("tier") or "full",
+                **{f"p_{column}": item.get(column) for column in image_columns},
+            )
+            for item in p_images
+        ]
+
+    def _rpc_creation_image_features(self, p_image_id, p_extractor_version, p_features, p_tier="full"):
+        self.conn.execute(
+            "INSERT INTO image_features (image_id, extractor_version, features, tier, computed_at) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (image_id, extractor_version) DO UPDATE SET "
+            "features = excluded.features, tier = excluded.tier, computed_at = excluded.computed_at",
+            (p_image_id, p_extractor_version, json.dumps(p_features), p_tier, datetime.now().isoformat()),
+        )
+
+    def _rpc_modif_annotation(self, p_annotation_id, p_image_id, p_label, p_source):
+        self.conn.execute(
+            "UPDATE annotation SET image_id = ?, label = ?, source = ? WHERE annotation_id = ?",
+            (p_image_id, p_label, p_source, p_annotation_id),
+        )
+
+    def _rpc_supp_annotation(self, p_annotation_id):
+        self.conn.execute("DELETE FROM annotation WHERE annotation_id = ?", (p_annotation_id,))
+
+    def _count_label(self, par_ville, label):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM image i JOIN annotation a ON a.image_id = i.image_id "
+            "WHERE i.localisation = ? AND a.label = ?",
+            (par_ville, label),
+        ).fetchone()[0]
+
+    def _rpc_nb_poubelles_pleines(self, par_ville):
+        return self._count_label(par_ville, "plein")
+
+    def _rpc_nb_poubelles_vides(self, par_ville):
+        return self._count_label(par_ville, "vide")
+
+    def _rpc_nb_poubelles_non_annotees(self, par_ville):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM image i LEFT JOIN annotation a ON a.image_id = i.image_id "
+            "WHERE i.localisation = ? AND a.annotation_id IS NULL",
+            (par_ville,),
+        ).fetchone()[0]
+
+    def _rpc_stats_par_ville(self):
+        rows = self.conn.execute(
+            "SELECT i.localisation AS ville, "
+            "SUM(a.label = 'plein') AS pleines, "
+            "SUM(a.label = 'vide') AS vides, "
+            "SUM(a.annotation_id IS NULL) AS \"non_annotées\" "
+            "FROM image i LEFT JOIN annotation a ON a.image_id = i.image_id "
+            "WHERE i.localisation IS NOT NULL AND i.localisation <> '' "
+            "GROUP BY i.localisation ORDER BY i.localisation"
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _rpc_dashboard_summary(self, p_buckets=20):
+        annotated = "SELECT a.label, i.size FROM annotation a JOIN image i ON i.image_id = a.image_id " \
+                    "WHERE a.label IS NOT NULL AND i.size IS NOT NULL"
+        total, avg_size, min_size, max_size = self.conn.execute(
+            f"SELECT COUNT(*), AVG(size), MIN(size), MAX(size) FROM ({annotated})"
+        ).fetchone()
+        labels = self.conn.execute(
+            f"SELECT label, COUNT(*) AS count FROM ({annotated}) GROUP BY label ORDER BY count DESC, label"
+        ).fetchall()
+        histogram = []
+        if total:
+            # Équivalent de width_bucket(size, min, max + 1e-9, p_buckets)
+            histogram = self.conn.execute(
+                f"SELECT MIN(CAST((size - ?) / (? + 1e-9 - ?) * ? AS INTEGER) + 1, ?) AS bucket, COUNT(*) AS count "
+                f"FROM ({annotated}) GROUP BY bucket ORDER BY bucket",
+                (min_size, max_size, min_size, p_buckets, p_buckets),
+            ).fetchall()
+        return {
+            "total": total,
+            "avg_size": avg_size,
+            "min_size": min_size,
+            "max_size": max_size,
+            "labels": [dict(row) for row in labels],
+            "size_histogram": [dict(row) for row in histogram],
+        }
+
+    def _rpc_verify_password(self, p_email, p_password):
+        row = self.conn.execute('SELECT password FROM "User" WHERE email = ?', (p_email,)).fetchone()
+        if row is None:
+            return None
+        return _check_password(p_password, row["password"])
+
+    def _rpc_add_classification_rule(self, p_rule_name, p_description, p_threshold_operator,
+                                     p_threshold_value, p_weight, p_category):
+        self.conn.execute(
+            "INSERT INTO classification_rules (rule_name, description, threshold_operator, "
+            "threshold_value, weight, category) VALUES (?, ?, ?, ?, ?, ?)",
+            (p_rule_name, p_description, p_threshold_operator, p_threshold_value, p_weight, p_category),
+        )
+
+    def _rpc_update_classification_rule(self, p_rule_name, p_description, p_threshold_operator,
+                                        p_threshold_value, p_weight, p_category):
+        cursor = self.conn.execute(
+            "UPDATE classification_rules SET description = ?, threshold_operator = ?, "
+            "threshold_value = ?, weight = ?, category = ? WHERE rule_name = ?",
+            (p_description, p_threshold_operator, p_threshold_value, p_weight, p_category, p_rule_name),
+        )
+        if cursor.rowcount == 0:
+            raise ValueError(f'Rule "{p_rule_name}" does not exist.')
+
+    def _rpc_delete_classification_rule(self, p_rule_name):
+        cursor = self.conn.execute("DELETE FROM classification_rules WHERE rule_name = ?", (p_rule_name,))
+        if cursor.rowcount == 0:
+            raise ValueError(f'Rule "{p_rule_name}" does not exist.')
+
+    def _rpc_bulk_update_thresholds(self, p_thresholds):
+        cursor = self.conn.executemany(
+            "UPDATE classification_rules SET threshold_value = ? WHERE rule_name = ?",
+            [(float(value), name) for name, value in p_thresholds.items()],
+        )
+        return cursor.rowcount
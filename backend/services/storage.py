@@ -0,0 +1,260 @@
+# backend/services/storage.py
+
+"""
+Stockage des images uploadées adressé par contenu
+
+LOGIQUE GÉNÉRALE :
+- Le nom d'un fichier est le SHA-256 de son contenu : <sha256>.<ext>
+  (allocation O(1), sans lister le dossier, et sans collision possible)
+- Les fichiers sont répartis dans des sous-dossiers d'après le préfixe du hash :
+  uploads/ab/cd/abcd...<sha256>.jpg
+- L'écriture passe par un fichier temporaire puis un rename atomique :
+  un lecteur ne voit jamais un fichier à moitié écrit
+- Deux contenus identiques donnent le même fichier (dédoublonnage automatique)
+
+CORRESPONDANCE AVEC LA BASE :
+- name_image = "<sha256>.<ext>"
+- file_path  = "/uploads/ab/cd/<sha256>.<ext>"
+
+DÉRIVÉS :
+- À l'ingestion, une miniature et une version d'affichage sont générées à côté
+  de l'original : <sha256>.thumb.webp et <sha256>.display.webp (JPEG si Pillow
+  n'a pas le support WebP)
+"""
+
+import os
+import re
+import hashlib
+import tempfile
+from functools import lru_cache
+
+# Nombre de niveaux de sous-dossiers et de caractères hexa par niveau
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+
+# Variantes générées à l'ingestion : nom -> plus grand côté en pixels
+VARIANTS = {
+    "thumb": 320,
+    "display": 1280,
+}
+DERIVATIVE_QUALITY = 80
+
+_CONTENT_NAME = re.compile(r"^[0-9a-f]{64}(\.(thumb|display))?\.[a-z0-9]+$")
+_LEGACY_NAME = re.compile(r"^image\d+\.(png|jpg|jpeg)$", re.IGNORECASE)
+
+
+@lru_cache(maxsize=None)
+def derivative_extension():
+    """Format des dérivés : WebP si Pillow le supporte, sinon JPEG"""
+    from PIL import features
+    return "webp" if features.check("webp") else "jpg"
+
+
+def is_content_name(filename):
+    """Indique si `filename` est un nom adressé par contenu (<sha256>.<ext>)"""
+    return bool(_CONTENT_NAME.match(filename))
+
+
+def relative_path(filename):
+    """
+    Chemin relatif au dossier d'upload d'un fichier.
+    Les anciens noms (image12.jpg) restent à la racine du dossier.
+
+    Args:
+        filename (str): Valeur de la colonne name_image
+
+    Returns:
+        str: "ab/cd/<sha256>.<ext>" ou le nom tel quel pour un ancien fichier
+    """
+    if not is_content_name(filename):
+        return filename
+    shards = [filename[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_LEVELS)]
+    return "/".join(shards + [filename])
+
+
+def db_file_path(filename):
+    """Valeur de la colonne file_path pour un fichier du dossier d'upload"""
+    return f"/uploads/{relative_path(filename)}"
+
+
+def resolve_path(upload_folder, filename):
+    """Chemin absolu d'un fichier stocké"""
+    return os.path.join(upload_folder, *relative_path(filename).split("/"))
+
+
+def content_filename(data, extension):
+    """Nom adressé par contenu : <sha256>.<ext>"""
+    return f"{hashlib.sha256(data).hexdigest()}.{extension.lower()}"
+
+
+def store_bytes(upload_folder, data, extension):
+    """
+    Enregistre le contenu d'une image dans le stockage adressé par contenu.
+
+    Args:
+        upload_folder (str): Dossier racine des uploads
+        data (bytes): Contenu du fichier
+        extension (str): Extension du fichier (jpg, png, ...)
+
+    Returns:
+        tuple: (filename, filepath, created)
+            - filename : valeur pour name_image
+            - filepath : chemin absolu du fichier
+            - created : False si un fichier identique existait déjà
+    """
+    filename = content_filename(data, extension)
+    filepath = resolve_path(upload_folder, filename)
+
+    # Dédoublonnage : même hash = même contenu, rien à réécrire
+    if os.path.exists(filepath):
+        return filename, filepath, False
+
+    directory = os.path.dirname(filepath)
+    os.makedirs(directory, exist_ok=True)
+
+    # Écriture atomique : fichier temporaire dans le même dossier puis rename
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return filename, filepath, True
+
+
+def derivative_name(filename, variant):
+    """
+    Nom du fichier dérivé d'une image pour une variante.
+
+    Args:
+        filename (str): Nom de l'original (name_image)
+        variant (str): Clé de VARIANTS ("thumb", "display")
+
+    Returns:
+        str: "<stem>.<variant>.<ext>"
+    """
+    stem = filename.rsplit(".", 1)[0]
+    return f"{stem}.{variant}.{derivative_extension()}"
+
+
+def generate_derivatives(filepath):
+    """
+    Génère les variantes réduites d'une image, à côté de l'original.
+    Les variantes déjà présentes ne sont pas régénérées.
+
+    LOGIQUE :
+    - Image.draft() laisse le décodeur JPEG réduire l'image pendant le décodage
+      (beaucoup moins de pixels à décoder pour une miniature)
+    - Écriture atomique comme pour les originaux
+
+    Args:
+        filepath (str): Chemin absolu de l'image originale
+
+    Returns:
+        dict: {variante: chemin absolu du dérivé}
+    """
+    from PIL import Image
+
+    directory, filename = os.path.split(filepath)
+    targets = {
+        variant: os.path.join(directory, derivative_name(filename, variant))
+        for variant in VARIANTS
+    }
+    missing = {v: p for v, p in targets.items() if not os.path.exists(p)}
+
+    # Du plus grand au plus petit : chaque variante est réduite depuis la précédente
+    img = None
+    for variant, path in sorted(missing.items(), key=lambda item: -VARIANTS[item[0]]):
+        max_side = VARIANTS[variant]
+        if img is None:
+            img = Image.open(filepath)
+            img.draft("RGB", (max_side, max_side))
+            img = img.convert("RGB")
+        img.thumbnail((max_side, max_side))
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                img.save(f, format="WEBP" if derivative_extension() == "webp" else "JPEG",
+                         quality=DERIVATIVE_QUALITY)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    return targets
+
+
+def remove_stored(filepath):
+    """
+    Supprime une image stockée et ses variantes réduites
+    (fichiers créés pour une insertion qui a échoué).
+
+    Args:
+        filepath (str): Chemin absolu de l'image originale
+    """
+    directory, filename = os.path.split(filepath)
+    paths = [filepath] + [os.path.join(directory, derivative_name(filename, v)) for v in VARIANTS]
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def migrate_legacy_uploads(upload_folder, update_db=True):
+    """
+    Déplace les anciens fichiers imageN.<ext> vers le stockage adressé par
+    contenu et met à jour les colonnes name_image / file_path des images.
+
+    Args:
+        upload_folder (str): Dossier racine des uploads
+        update_db (bool): Mettre à jour la table image
+
+    Returns:
+        dict: {ancien_nom: nouveau_nom}
+    """
+    mapping = {}
+    if not os.path.isdir(upload_folder):
+        return mapping
+
+    if update_db:
+        from backend.config import supabase
+
+    for old_name in sorted(os.listdir(upload_folder)):
+        old_path = os.path.join(upload_folder, old_name)
+        if not _LEGACY_NAME.match(old_name) or not os.path.isfile(old_path):
+            continue
+
+        with open(old_path, "rb") as f:
+            data = f.read()
+        extension = old_name.rsplit(".", 1)[1]
+        new_name, new_path, _ = store_bytes(upload_folder, data, extension)
+        generate_derivatives(new_path)
+
+        if update_db:
+            supabase.table("image") \
+                .update({"name_image": new_name, "file_path": db_file_path(new_name)}) \
+                .eq("name_image", old_name) \
+                .execute()
+
+        os.remove(old_path)
+        mapping[old_name] = new_name
+
+    return mapping
+
+
+if __name__ == "__main__":
+    """
+    Migration des anciens uploads : python -m backend.services.storage
+    """
+    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    migrated = migrate_legacy_uploads(os.path.join(base_dir, "uploads"))
+    for old, new in migrated.items():
+        print(f"[OK] {old} -> {relative_path(new)}")
+    print(f"✅ {len(migrated)} fichier(s) migré(s)")
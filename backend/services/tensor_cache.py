@@ -0,0 +1,379 @@
+# backend/services/tensor_cache.py
+
+"""
+Cache de pixels pré-décodés pour les expériences sur le jeu de données
+
+LOGIQUE GÉNÉRALE :
+- Chaque image est décodée une seule fois, redimensionnée à une résolution de
+  travail commune (WORK_SIZE) et rangée dans un unique tableau uint8
+  (N, H, W, 3) écrit sur disque
+- Le tableau est relu en mémoire mappée (np.memmap) : une image est une vue
+  sur les pages du fichier, sans décodage JPEG ni copie, et la mémoire
+  résidente reste bornée quelle que soit la taille du corpus
+- Un index JSON donne pour chaque ligne : chemin, sha256, label, dimensions
+  et taille d'origine, propriétés de base calculées en pleine résolution
+- Reconstruction incrémentale : les images dont le contenu (sha256) est déjà
+  dans le cache sont recopiées sans être redécodées
+
+FICHIERS (dans TENSOR_DIR) :
+  index.json          en-tête + entrées, remplacé de façon atomique
+  images-<id>.u8      tableau brut, un nouveau fichier à chaque construction
+
+LIMITES :
+- Les features calculées sur les pixels (texture, symétrie...) le sont à la
+  résolution de travail : proches mais pas identiques à celles du pipeline
+  d'upload. Les propriétés de base (size, contrast, edges_detected...) sont
+  celles de l'image d'origine.
+"""
+
+import os
+import json
+import uuid
+import logging
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+from PIL import Image
+
+from backend.services.feature_extractor import ImageFeatures
+from backend.utils.helpers import allowed_file, label_for_path
+
+logger = logging.getLogger(__name__)
+
+TENSOR_DIR = "cache/tensors"
+INDEX_FILE = "index.json"
+
+# Résolution de travail (largeur, hauteur)
+WORK_SIZE = (512, 384)
+
+# Images par tâche du pool dans iter_features
+FEATURES_BATCH_SIZE = 32
+
+DEFAULT_FOLDERS = ["Data/train", "Data/test"]
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sources_from_folders(folders):
+    """
+    Images des dossiers (récursivement), label déduit du dossier (label_for_path).
+
+    Returns:
+        list: [{"path", "label"}] triée par chemin
+    """
+    sources = []
+    for folder in folders:
+        for root, dirs, files in os.walk(folder):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for name in sorted(files):
+                if not name.startswith(".") and allowed_file(name):
+                    path = os.path.join(root, name).replace(os.sep, "/")
+                    sources.append({"path": path, "label": label_for_path(path)})
+    return sources
+
+
+def sources_from_metadata(cache_path):
+    """
+    Images d'un cache de métadonnées JSON (cache_manager), label = première annotation.
+
+    Returns:
+        list: [{"path", "label", "image_id"}]
+    """
+    with open(cache_path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    return [
+        {
+            "path": r["file_path"],
+            "label": (r.get("annotation") or [{}])[0].get("label"),
+            "image_id": r.get("image_id"),
+        }
+        for r in records
+        if r.get("file_path")
+    ]
+
+
+def decode_to_tensor(path, size=WORK_SIZE):
+    """
+    Décode une image (admission comprise), calcule ses propriétés de base en
+    pleine résolution puis la redimensionne à `size`.
+    Exécuté dans un processus du pool de bulk_ingest.
+
+    Returns:
+        tuple: (propriétés de base, tableau uint8 (H, W, 3))
+    """
+    from backend.services.bulk_ingest import image_record
+
+    with open(path, "rb") as f:
+        data = f.read()
+    features = ImageFeatures.from_bytes(data, file_path=path)
+    pixels = np.asarray(features.img.resize(size, Image.BILINEAR), dtype=np.uint8)
+    return {**image_record(features), "byte_size": len(data)}, pixels
+
+
+def _write_json_atomic(path, data):
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"), ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def build_tensor_cache(sources, directory=TENSOR_DIR, size=WORK_SIZE):
+    """
+    Construit (ou met à jour) le cache de pixels.
+
+    LOGIQUE :
+    1. Hachage des fichiers (pool de threads), doublons de contenu écartés
+    2. Lignes déjà présentes dans le cache précédent : recopiées telles quelles
+    3. Autres images : décodées sur le pool de processus et écrites ligne par
+       ligne dans le tableau mappé (une seule image en mémoire par tâche)
+    4. Les lignes des images refusées sont retirées, puis l'index est remplacé
+
+    Args:
+        sources (list): [{"path", "label", ...}] (sources_from_folders / sources_from_metadata)
+        directory (str): Dossier du cache
+        size (tuple): Résolution de travail (largeur, hauteur)
+
+    Returns:
+        dict: {"images", "decoded", "reused", "duplicates", "errors"}
+    """
+    from backend.services.bulk_ingest import get_executor, MAX_WORKERS
+
+    os.makedirs(directory, exist_ok=True)
+    width, height = size
+
+    # 1. Hachage, doublons écartés (le premier chemin l'emporte)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        digests = list(pool.map(_file_digest, [s["path"] for s in sources]))
+    entries, seen = [], set()
+    for source, digest in zip(sources, digests):
+        if digest not in seen:
+            seen.add(digest)
+            entries.append({**source, "sha256": digest})
+    if not entries:
+        raise ValueError("Aucune image à mettre en cache")
+
+    # 2. Cache précédent à la même résolution
+    previous, previous_rows = None, {}
+    try:
+        previous = TensorCache(directory)
+        if previous.images.shape[1:3] == (height, width):
+            previous_rows = {e["sha256"]: i for i, e in enumerate(previous.entries)}
+    except (OSError, ValueError, KeyError):
+        pass
+
+    data_file = f"images-{uuid.uuid4().hex[:12]}.u8"
+    data_path = os.path.join(directory, data_file)
+    images = np.memmap(data_path, dtype=np.uint8, mode="w+", shape=(len(entries), height, width, 3))
+
+    stats = {"decoded": 0, "reused": 0, "duplicates": len(sources) - len(entries), "errors": 0}
+    failed = set()
+    complete = False
+    try:
+        executor = get_executor()
+        in_flight = {}
+
+        # Le memmap est passé en argument : la closure ne lit pas un nom supprimé plus bas
+        def collect(done, images):
+            for future in done:
+                row = in_flight.pop(future)
+                try:
+                    properties, pixels = future.result()
+                except Exception as e:
+                    logger.warning("Image non mise en cache", extra={"path": entries[row]["path"], "error": str(e)})
+                    failed.add(row)
+                    continue
+                images[row] = pixels
+                entries[row].update(properties)
+                stats["decoded"] += 1
+
+        for row, entry in enumerate(entries):
+            old_row = previous_rows.get(entry["sha256"])
+            if old_row is not None:
+                images[row] = previous.images[old_row]
+                old = previous.entries[old_row]
+                entry.update({k: v for k, v in old.items() if k not in entry})
+                stats["reused"] += 1
+                continue
+            in_flight[executor.submit(decode_to_tensor, entry["path"], size)] = row
+            if len(in_flight) >= 2 * MAX_WORKERS:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done, images)
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done, images)
+
+        # 4. Compactage : les lignes suivantes remplacent celles des images refusées
+        kept = [row for row in range(len(entries)) if row not in failed]
+        for target, row in enumerate(kept):
+            if target != row:
+                images[target] = images[row]
+        images.flush()
+        complete = True
+    finally:
+        # Le mapping est libéré avant le truncate (ou la suppression en cas d'échec)
+        del images
+        if not complete:
+            os.remove(data_path)
+    row_bytes = height * width * 3
+    os.truncate(data_path, len(kept) * row_bytes)
+    stats["errors"] = len(failed)
+
+    _write_json_atomic(os.path.join(directory, INDEX_FILE), {
+        "version": 1,
+        "data_file": data_file,
+        "shape": [len(kept), height, width, 3],
+        "dtype": "uint8",
+        "entries": [entries[row] for row in kept],
+    })
+
+    # Les lecteurs de l'ancien fichier gardent leur mapping (le fichier n'est
+    # réellement libéré qu'à leur fermeture)
+    if previous is not None:
+        old_path = previous.data_path
+        previous.close()
+        if old_path != data_path and os.path.exists(old_path):
+            os.remove(old_path)
+
+    return {"images": len(kept), **stats}
+
+
+class TensorCache:
+    """
+    Lecture du cache de pixels (mémoire mappée, lecture seule).
+
+    Usage:
+        cache = TensorCache()
+        pixels = cache.images[i]            # vue (H, W, 3) sans copie
+        feats = cache.features(i).extract_all_features()
+        for entries, batch in cache.iter_batches(64):
+            ...                              # batch : vue (n, H, W, 3)
+    """
+    def __init__(self, directory=TENSOR_DIR):
+        with open(os.path.join(directory, INDEX_FILE), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        self.directory = directory
+        self.entries = index["entries"]
+        self.data_file = index["data_file"]
+        self.data_path = os.path.join(directory, self.data_file)
+        self.images = np.memmap(self.data_path, dtype=np.dtype(index["dtype"]), mode="r",
+                                shape=tuple(index["shape"]))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def close(self):
+        mmap = getattr(self.images, "_mmap", None)
+        self.images = None
+        if mmap is not None:
+            mmap.close()
+
+    def pixels(self, i):
+        """Pixels de la ligne i : vue ndarray (H, W, 3) sur le fichier"""
+        return np.asarray(self.images[i])
+
+    def image_data(self, i):
+        """Ligne i au format du cache JSON (propriétés, chemin, annotation)"""
+        entry = self.entries[i]
+        data = {k: v for k, v in entry.items() if k not in ("path", "sha256", "label")}
+        data.update({
+            "file_path": entry["path"],
+            "name_image": os.path.basename(entry["path"]),
+            "annotation": [{"label": entry["label"]}] if entry.get("label") else [],
+        })
+        return data
+
+    def features(self, i):
+        """ImageFeatures de la ligne i, construit sur les pixels mappés (aucun décodage)"""
+        return ImageFeatures(self.image_data(i), image=self.pixels(i))
+
+    def iter_batches(self, batch_size=FEATURES_BATCH_SIZE):
+        """
+        Yields:
+            tuple: (entrées, vue (n, H, W, 3)) par tranches de `batch_size`
+        """
+        for start in range(0, len(self), batch_size):
+            yield self.entries[start:start + batch_size], np.asarray(self.images[start:start + batch_size])
+
+
+# Cache ouvert une fois par processus du pool (les pages sont partagées par le noyau).
+# Le pool est partagé et vit longtemps : le cache est rouvert quand une
+# reconstruction a changé le fichier de données (data_file de l'index)
+_worker_caches = {}
+
+
+def _features_range(directory, data_file, start, stop):
+    cache = _worker_caches.get(directory)
+    if cache is None or cache.data_file != data_file:
+        if cache is not None:
+            cache.close()
+        cache = _worker_caches[directory] = TensorCache(directory)
+        if cache.data_file != data_file:
+            # Reconstruit entre l'ouverture par l'appelant et cette tâche :
+            # les lignes de l'index ne correspondent plus
+            raise RuntimeError(f"Cache de pixels reconstruit pendant la lecture ({directory}), relancer l'extraction")
+    return [cache.features(i).extract_all_features() for i in range(start, stop)]
+
+
+def iter_features(directory=TENSOR_DIR, batch_size=FEATURES_BATCH_SIZE, parallel=True):
+    """
+    Extracteur par lots : features de toutes les images du cache, dans l'ordre.
+    Les processus du pool reçoivent des plages de lignes, jamais de pixels.
+
+    Args:
+        directory (str): Dossier du cache
+        batch_size (int): Lignes par tâche
+        parallel (bool): Utiliser le pool de processus de bulk_ingest
+
+    Yields:
+        tuple: (entrée de l'index, dict des features)
+    """
+    cache = TensorCache(directory)
+    ranges = [(start, min(start + batch_size, len(cache))) for start in range(0, len(cache), batch_size)]
+    try:
+        if parallel:
+            from backend.services.bulk_ingest import get_executor
+            batches = get_executor().map(_features_range, *zip(*[(directory, cache.data_file, a, b) for a, b in ranges]))
+        else:
+            batches = (_features_range(directory, cache.data_file, a, b) for a, b in ranges)
+        for (start, _), batch in zip(ranges, batches):
+            for offset, features in enumerate(batch):
+                yield cache.entries[start + offset], features
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    """
+    Construit le cache : python -m backend.services.tensor_cache [dossiers...] [--metadata cache.json]
+    """
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Cache de pixels pré-décodés (np.memmap)")
+    parser.add_argument("folders", nargs="*", default=DEFAULT_FOLDERS, help="Dossiers d'images")
+    parser.add_argument("--metadata", default=None, help="Prendre les images d'un cache JSON de métadonnées")
+    parser.add_argument("--out", default=TENSOR_DIR, help="Dossier du cache")
+    parser.add_argument("--size", default="x".join(map(str, WORK_SIZE)), help="Résolution de travail LxH")
+    args = parser.parse_args()
+
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+    sources = sources_from_metadata(args.metadata) if args.metadata else sources_from_folders(args.folders)
+    started = time.perf_counter()
+    result = build_tensor_cache(sources, args.out, size)
+    print(f"✅ {result['images']} images en cache ({result['decoded']} décodées, {result['reused']} réutilisées, "
+          f"{result['duplicates']} doublons, {result['errors']} erreurs) en {time.perf_counter() - started:.1f}s "
+          f"dans : {args.out}")
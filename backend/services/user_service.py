@@ -1,4 +1,8 @@
-from backend.config import supabase
+from backend.config import supabase, USERS_CACHE_TTL, CACHE_STALE_TTL
+from backend.utils.ttl_cache import ttl_cache
+
+# Compte utilisé pour les uploads sans connexion
+ANON_EMAIL = "anon@trashalyser.test"
 
 def get_or_create_user(username="ecologiste", email="jsuisecolo@example.com", password="qwerty", role="Admin"):
     result = supabase.table("User").select("*").eq("username", username).execute()
@@ -10,11 +14,28 @@ def get_or_create_user(username="ecologiste", email="jsuisecolo@example.com", pa
         "p_password": password,
         "p_role": role
     }).execute()
+    get_user_id_by_email.invalidate(email)
+    get_all_users.cache_clear()
     result = supabase.table("User").select("*").eq("username", username).execute()
     return result.data[0]['user_id']
 
+@ttl_cache(USERS_CACHE_TTL, stale=CACHE_STALE_TTL)
 def get_user_id_by_email(email):
     result = supabase.table("User").select("user_id").eq("email", email).execute()
     if result.data:
         return result.data[0]['user_id']
     return None
+
+def get_anon_user_id():
+    """Identifiant du compte anonyme (mis en cache : évite une requête par upload)"""
+    user_id = get_user_id_by_email(ANON_EMAIL)
+    if user_id is None:
+        # Compte absent (base neuve) : on ne garde pas None en cache, le
+        # compte sera recherché de nouveau à l'upload suivant
+        get_user_id_by_email.invalidate(ANON_EMAIL)
+    return user_id
+
+@ttl_cache(USERS_CACHE_TTL, stale=CACHE_STALE_TTL)
+def get_all_users():
+    result = supabase.table("User").select("*").execute()
+    return result.data
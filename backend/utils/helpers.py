@@ -2,24 +2,27 @@ import os
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
+# Villes acceptées pour la localisation des images
+VILLES_POSSIBLES = [
+    "Paris", "Lyon", "Marseille", "Toulouse", "Nice",
+    "Lille", "Nantes", "Strasbourg", "Bordeaux", "Montpellier",
+    "Rennes", "Reims", "Le Havre"
+]
+
+# Label du jeu de données déduit du nom d'un dossier parent (Data/train/...)
+FOLDER_LABELS = {
+    "clean": "vide",
+    "dirty": "plein",
+    "no_label": None,
+}
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def generate_unique_filename(upload_path, extension):
-    """Génère un nom de fichier unique comme image1.jpg, image2.jpg, etc."""
-    os.makedirs(upload_path, exist_ok=True)  # Crée le dossier si nécessaire
-
-    max_index = 0
-    for filename in os.listdir(upload_path):
-        if filename.startswith("image") and '.' in filename:
-            base, ext = filename.rsplit('.', 1)
-            if ext.lower() in ALLOWED_EXTENSIONS:
-                try:
-                    number = int(base.replace("image", ""))
-                    if number > max_index:
-                        max_index = number
-                except ValueError:
-                    continue
-
-    return f"image{max_index + 1}.{extension}"
+def label_for_path(path):
+    """Label ("vide", "plein") déduit du dossier de l'image (le plus proche l'emporte), ou None"""
+    for part in reversed(os.path.normpath(os.path.dirname(path)).split(os.sep)):
+        if part in FOLDER_LABELS:
+            return FOLDER_LABELS[part]
+    return None
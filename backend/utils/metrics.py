@@ -0,0 +1,263 @@
+"""
+Métriques de latence en mémoire (format Prometheus) et logs structurés
+
+LOGIQUE GÉNÉRALE :
+- Histogrammes à buckets fixes, agrégés dans le processus : le coût d'une
+  mesure est un verrou et quelques additions, rien n'est écrit pendant la requête
+- span("étape") mesure un bloc (ou une fonction, en décorateur) et alimente
+  l'histogramme wdp_stage_duration_seconds{stage="..."}
+- Pendant une requête, les spans sont aussi rattachés à la requête : le
+  middleware (voir app.py) les renvoie dans l'en-tête Server-Timing et dans
+  la ligne de log de la requête
+- render_prometheus() produit le texte servi par /metrics ; les p50/p99 se
+  calculent côté Prometheus (histogram_quantile)
+
+LIMITES :
+- Les mesures prises dans les processus du pool (ingestion en masse) restent
+  dans ces processus et ne sont pas exportées
+"""
+
+import json
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
+# Bornes des buckets (secondes) : de 1 ms à 10 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_METRIC = "wdp_stage_duration_seconds"
+DB_METRIC = "wdp_db_query_duration_seconds"
+REQUEST_METRIC = "wdp_http_request_duration_seconds"
+
+_HELP = {
+    STAGE_METRIC: "Durée des étapes du traitement d'une image",
+    DB_METRIC: "Durée des appels à la base (une requête ou un appel RPC)",
+    REQUEST_METRIC: "Durée des requêtes HTTP (jusqu'au renvoi de la réponse)",
+}
+
+_histograms = {}
+_lock = threading.Lock()
+
+# Spans de la requête en cours : liste de (nom, secondes), None hors requête
+_request_spans = ContextVar("request_spans", default=None)
+
+
+class Histogram:
+    """Histogramme cumulatif (compatible Prometheus) protégé par un verrou"""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Dernier : +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+def observe(name, seconds, **labels):
+    """Ajoute une mesure (secondes) à l'histogramme `name` pour ces labels"""
+    key = (name, tuple(sorted(labels.items())))
+    histogram = _histograms.get(key)
+    if histogram is None:
+        with _lock:
+            histogram = _histograms.setdefault(key, Histogram())
+    histogram.observe(seconds)
+
+
+class span(ContextDecorator):
+    """
+    Mesure une étape, en bloc `with` ou en décorateur.
+
+    Usage:
+        with span("decode"):
+            ...
+
+        @span("extraction")
+        def extract_all_features(self): ...
+
+    Args:
+        stage (str): Nom de l'étape (label "stage")
+        metric (str): Histogramme alimenté (par défaut : wdp_stage_duration_seconds)
+        **labels: Labels supplémentaires
+    """
+    def __init__(self, stage, metric=STAGE_METRIC, **labels):
+        self.stage = stage
+        self.metric = metric
+        self.labels = labels
+        self._starts = threading.local()
+
+    def __enter__(self):
+        # Pile par thread : le même décorateur peut être réentrant
+        self._starts.__dict__.setdefault("stack", []).append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._starts.stack.pop()
+        if self.metric == STAGE_METRIC:
+            observe(self.metric, elapsed, stage=self.stage, **self.labels)
+        else:
+            observe(self.metric, elapsed, **self.labels)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((self.stage, elapsed))
+        return False
+
+
+def start_request():
+    """Début d'une requête : les spans suivants (même contexte) lui sont rattachés"""
+    return _request_spans.set([])
+
+
+def end_request(token):
+    """
+    Fin d'une requête.
+
+    Returns:
+        dict: {étape: secondes cumulées} dans l'ordre de première apparition
+    """
+    spans = _request_spans.get() or []
+    _request_spans.reset(token)
+    totals = {}
+    for name, elapsed in spans:
+        totals[name] = totals.get(name, 0.0) + elapsed
+    return totals
+
+
+def server_timing(totals):
+    """En-tête Server-Timing (durées en ms) : visible dans les outils du navigateur"""
+    return ", ".join(f"{name.replace(':', '_')};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+
+class _TimedQuery:
+    """
+    Enveloppe d'un query builder Supabase : les appels chaînés sont délégués,
+    execute() est mesuré (histogramme wdp_db_query_duration_seconds{target}).
+    """
+    def __init__(self, builder, target):
+        self._builder = builder
+        self._target = target
+
+    def execute(self, *args, **kwargs):
+        with span(f"db:{self._target}", metric=DB_METRIC, target=self._target):
+            return self._builder.execute(*args, **kwargs)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._builder, name)
+        if not callable(attribute):
+            return _TimedQuery(attribute, self._target) if hasattr(attribute, "execute") else attribute
+
+        def call(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            return _TimedQuery(result, self._target) if hasattr(result, "execute") else result
+        return call
+
+
+def timed_query(builder, target):
+    """Enveloppe un query builder pour mesurer son execute()"""
+    return _TimedQuery(builder, target)
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_bound(bound):
+    return f"{bound:g}"
+
+
+def render_prometheus(counters=None):
+    """
+    Texte au format d'exposition Prometheus (version 0.0.4).
+
+    Args:
+        counters (dict): Compteurs supplémentaires
+            {nom: (aide, type, [(labels dict, valeur)])}
+
+    Returns:
+        str
+    """
+    with _lock:
+        items = sorted(_histograms.items())
+
+    lines = []
+    current = None
+    for (name, labels), histogram in items:
+        if name != current:
+            current = name
+            lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+        counts, total, count = histogram.snapshot()
+        cumulative = 0
+        for bound, n in zip(histogram.buckets, counts):
+            cumulative += n
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_bound(bound))])} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+    for name, (help_text, kind, samples) in (counters or {}).items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_format_labels(sorted(labels.items()))} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Vide tous les histogrammes (tests, benchmarks)"""
+    with _lock:
+        _histograms.clear()
+
+
+# === Logs structurés ===
+
+# Attributs standard d'un LogRecord : tout le reste vient de `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Ligne de log lisible suivie des champs passés en `extra`, en clé=valeur :
+        2025-07-02 14:25:00 INFO backend.routes.upload_routes Classification IA prediction=plein confidence=0.82
+    """
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s", "%Y-%m-%d %H:%M:%S")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = [
+            f"{key}={value if isinstance(value, (int, float)) else json.dumps(str(value), ensure_ascii=False)}"
+            for key, value in vars(record).items()
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_")
+        ]
+        if fields:
+            first, _, rest = line.partition("\n")
+            line = " ".join([first] + fields) + (f"\n{rest}" if rest else "")
+        return line
+
+
+def configure_logging(level="INFO"):
+    """Installe le format structuré sur le logger racine (une seule fois)"""
+    root = logging.getLogger()
+    if not any(isinstance(h.formatter, StructuredFormatter) for h in root.handlers):
+        handler = logging.StreamHandler()
+        handler.setFormatter(StructuredFormatter())
+        root.addHandler(handler)
+    root.setLevel(level)
@@ -0,0 +1,159 @@
+"""
+Profilage à la demande d'une requête (cProfile)
+
+LOGIQUE GÉNÉRALE :
+- Activé requête par requête par un administrateur : en-tête « X-Profile: 1 »
+  ou paramètre « ?profile=1 »
+- La requête (hooks, vue, rendu du template) tourne sous cProfile ; le
+  résultat est écrit dans PROFILE_DIR/<id>.pstats, avec ses métadonnées
+  dans <id>.json. L'identifiant est renvoyé dans l'en-tête X-Profile-Id
+- Sans drapeau, le seul coût est la lecture d'un en-tête et d'un paramètre :
+  aucun profileur n'est créé
+- Seuls les PROFILE_KEEP derniers profils sont gardés
+
+Lecture d'un profil : python -m pstats cache/profiles/<id>.pstats
+(ou snakeviz / gprof2dot pour une vue graphique)
+
+LIMITES :
+- Les réponses en flux (ingestion en masse) ne sont profilées que jusqu'au
+  renvoi de la réponse, pas pendant la production du flux
+"""
+
+import io
+import os
+import re
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import logging
+from datetime import datetime
+
+from flask import request, session, g
+
+from backend.config import PROFILE_DIR, PROFILE_KEEP
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_PARAM = "profile"
+PROFILE_ID = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$")
+
+
+def _requested():
+    return request.headers.get(PROFILE_HEADER) == "1" or request.args.get(PROFILE_PARAM) == "1"
+
+
+def _new_profile_id():
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+
+def profile_path(profile_id, extension="pstats"):
+    """Chemin d'un fichier de profil, ou None si l'identifiant est invalide"""
+    if not PROFILE_ID.match(profile_id or ""):
+        return None
+    return os.path.join(PROFILE_DIR, f"{profile_id}.{extension}")
+
+
+def list_profiles():
+    """
+    Returns:
+        list: Métadonnées des profils enregistrés, du plus récent au plus ancien
+    """
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(PROFILE_DIR, name), "r", encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return profiles
+
+
+def profile_summary(profile_id, limit=40, sort="cumulative"):
+    """Résumé texte d'un profil (fonctions les plus coûteuses), ou None s'il n'existe pas"""
+    path = profile_path(profile_id)
+    if path is None or not os.path.exists(path):
+        return None
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def _prune():
+    """Supprime les profils au-delà des PROFILE_KEEP plus récents"""
+    ids = sorted((n[:-len(".json")] for n in os.listdir(PROFILE_DIR) if n.endswith(".json")), reverse=True)
+    for profile_id in ids[PROFILE_KEEP:]:
+        for extension in ("json", "pstats"):
+            try:
+                os.remove(profile_path(profile_id, extension))
+            except (OSError, TypeError):
+                pass
+
+
+def _save(profiler, response, elapsed):
+    profile_id = _new_profile_id()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profiler.dump_stats(profile_path(profile_id))
+    metadata = {
+        "id": profile_id,
+        "method": request.method,
+        "path": request.full_path.rstrip("?"),
+        "endpoint": request.endpoint,
+        "status": response.status_code,
+        "duration_ms": round(elapsed * 1000, 1),
+        "user_id": session.get("user_id"),
+        "created": datetime.now().isoformat(timespec="seconds"),
+    }
+    with open(profile_path(profile_id, "json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False)
+    _prune()
+    return profile_id
+
+
+def init_app(app):
+    """Installe les hooks de profilage sur l'application"""
+
+    @app.before_request
+    def _start_profile():
+        if not _requested():
+            return
+        if session.get("role") != "Admin":
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Un autre profileur est déjà actif dans ce thread
+            logger.warning("Profilage impossible : un profileur est déjà actif")
+            return
+        g.profiler = profiler
+        g.profile_start = time.perf_counter()
+
+    @app.after_request
+    def _stop_profile(response):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        elapsed = time.perf_counter() - g.pop("profile_start")
+        try:
+            profile_id = _save(profiler, response, elapsed)
+        except OSError:
+            logger.exception("Enregistrement du profil échoué")
+            return response
+        response.headers["X-Profile-Id"] = profile_id
+        logger.info("Requête profilée", extra={"profile_id": profile_id, "path": request.path,
+                                                "ms": round(elapsed * 1000, 1)})
+        return response
+
+    @app.teardown_request
+    def _discard_profile(exc):
+        # Requête interrompue avant after_request : le profileur ne doit pas rester actif
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
@@ -0,0 +1,164 @@
+"""
+Cache de lecture en mémoire partagé par les services
+
+LOGIQUE GÉNÉRALE :
+- Lecture traversante (read-through) : en cas d'absence, la valeur est chargée
+  par la fonction fournie puis gardée pendant `ttl` secondes
+- Stale-while-revalidate : pendant `stale` secondes après expiration, l'ancienne
+  valeur est renvoyée immédiatement et rechargée en arrière-plan
+- Invalidation explicite par clé ou pour tout un cache (après une écriture)
+- Chaque cache est enregistré sous un nom : get_cache_stats() donne les
+  compteurs (hits, misses, taux de hit) de tous les caches
+"""
+
+import time
+import threading
+from functools import wraps
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class ReadThroughCache:
+    """
+    Cache clé -> valeur avec durée de vie par entrée.
+
+    Args:
+        name (str): Nom du cache (pour les statistiques)
+        ttl (float): Durée de vie par défaut d'une entrée (secondes)
+        stale (float): Durée pendant laquelle une entrée expirée est encore servie
+                       pendant son rechargement en arrière-plan (0 = désactivé)
+    """
+    def __init__(self, name, ttl, stale=0):
+        self.name = name
+        self.ttl = ttl
+        self.stale = stale
+        self._entries = {}
+        self._refreshing = set()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "errors": 0}
+
+    def get(self, key, loader, ttl=None):
+        """
+        Retourne la valeur de `key`, en appelant `loader()` si besoin.
+
+        Args:
+            key: Clé (hashable)
+            loader (callable): Fonction sans argument qui charge la valeur
+            ttl (float): Durée de vie de cette entrée (par défaut : celle du cache)
+        """
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generation
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if now < expires:
+                    self._stats["hits"] += 1
+                    return value
+                if now < expires + self.stale:
+                    self._stats["stale_hits"] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(target=self._refresh, args=(key, loader, ttl, generation), daemon=True).start()
+                    return value
+            self._stats["misses"] += 1
+
+        value = loader()
+        self._store(key, value, ttl, generation)
+        return value
+
+    def _refresh(self, key, loader, ttl, generation):
+        try:
+            self._store(key, loader(), ttl, generation)
+            with self._lock:
+                self._stats["refreshes"] += 1
+        except Exception:
+            # L'ancienne valeur reste servie jusqu'à la fin de la fenêtre `stale`
+            with self._lock:
+                self._stats["errors"] += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key, value, ttl, generation):
+        # Une invalidation pendant le chargement rend la valeur chargée obsolète
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+
+    def invalidate(self, key=None):
+        """Supprime une entrée, ou toutes si `key` est None"""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries))
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def get_cache(name, ttl, stale=0):
+    """Retourne le cache `name`, créé au premier appel"""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = ReadThroughCache(name, ttl, stale)
+        return _registry[name]
+
+
+def invalidate(name, key=None):
+    """Invalide une entrée (ou tout) d'un cache enregistré"""
+    cache = _registry.get(name)
+    if cache is not None:
+        cache.invalidate(key)
+
+
+def get_cache_stats():
+    """
+    Returns:
+        dict: {nom du cache: {"hits", "stale_hits", "misses", "refreshes", "errors", "size", "hit_rate"}}
+    """
+    with _registry_lock:
+        caches = list(_registry.values())
+    return {cache.name: cache.stats() for cache in caches}
+
+
+def ttl_cache(seconds, stale=0, name=None):
+    """
+    Met en cache le résultat d'une fonction pendant `seconds` secondes
+    (une entrée par jeu d'arguments).
+
+    Comme functools.lru_cache, la fonction décorée expose cache_clear() ;
+    invalidate(*args, **kwargs) retire l'entrée de ces arguments seulement.
+
+    Args:
+        seconds (float): Durée de vie d'une entrée
+        stale (float): Fenêtre stale-while-revalidate (secondes)
+        name (str): Nom du cache (par défaut : module.fonction)
+    """
+    def decorator(f):
+        cache = get_cache(name or f"{f.__module__}.{f.__qualname__}", seconds, stale)
+
+        def make_key(args, kwargs):
+            return (args, tuple(sorted(kwargs.items())))
+
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            return cache.get(make_key(args, kwargs), lambda: f(*args, **kwargs))
+
+        decorated.cache = cache
+        decorated.cache_clear = cache.invalidate
+        decorated.invalidate = lambda *args, **kwargs: cache.invalidate(make_key(args, kwargs))
+        return decorated
+    return decorator
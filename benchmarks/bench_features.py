@@ -0,0 +1,283 @@
+# benchmarks/bench_features.py
+
+"""
+Micro-benchmarks de l'extraction de features et du moteur de règles
+
+LOGIQUE GÉNÉRALE :
+- Corpus fixe : les CORPUS_SIZE premières images de Data/test (ordre
+  alphabétique), décodées une fois par le chemin de production (admission
+  comprise), plus des images synthétiques déterministes de 0,3 à 48 MP
+- Chaque ImageFeatures.compute_*, extract_all_features, RulesEngine.evaluate
+  et BinClassifier.classify est mesuré séparément
+- Pour chaque mesure : échauffement, calibrage du nombre d'appels par
+  répétition (les fonctions rapides sont appelées en boucle), puis
+  `repeat` répétitions ; on garde médiane, moyenne, écart-type, min, max
+- Les résultats sont écrits dans un fichier JSON (baseline) ; --compare
+  relit une baseline et signale les régressions au-delà d'une tolérance
+  (code de sortie 1)
+
+Usage :
+    python -m benchmarks.bench_features --output benchmarks/baseline.json
+    python -m benchmarks.bench_features --compare benchmarks/baseline.json --tolerance 0.15
+    python -m benchmarks.bench_features --sizes 0.3,3 --filter compute_hue
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import platform
+import argparse
+import statistics
+from datetime import datetime
+
+import numpy as np
+
+from backend.services.feature_extractor import ImageFeatures
+from backend.services.rules_engine import RulesEngine
+from backend.services.classifier import BinClassifier
+from backend.utils.helpers import allowed_file
+
+CORPUS_DIR = "Data/test"
+CORPUS_SIZE = 10
+SYNTHETIC_SIZES_MP = (0.3, 1, 3, 12, 24, 48)
+
+DEFAULT_REPEAT = 5
+DEFAULT_WARMUP = 1
+MIN_RUN_SECONDS = 0.02     # Durée minimale d'une répétition (calibrage du nombre d'appels)
+MAX_BENCH_SECONDS = 20.0   # Au-delà, on s'arrête après MIN_REPEAT répétitions
+MIN_REPEAT = 3
+
+DEFAULT_TOLERANCE = 0.10   # +10 % sur la médiane
+NOISE_FLOOR_MS = 0.05      # Écarts absolus ignorés (bruit de mesure)
+
+COMPUTE_METHODS = sorted(name for name in dir(ImageFeatures) if name.startswith("compute_"))
+
+
+# === Corpus ===
+
+def load_corpus(directory=CORPUS_DIR, size=CORPUS_SIZE):
+    """Images réelles, décodées une fois par ImageFeatures.from_bytes"""
+    names = sorted(n for n in os.listdir(directory) if allowed_file(n))[:size]
+    corpus = []
+    for name in names:
+        path = os.path.join(directory, name)
+        with open(path, "rb") as f:
+            corpus.append(ImageFeatures.from_bytes(f.read(), file_path=path))
+    return corpus
+
+
+def synthetic_image(megapixels, seed=0):
+    """
+    Image synthétique déterministe 4:3 : dégradés, motifs et bruit, pour
+    que les features (contours, texture, teinte) ne soient pas triviales.
+    """
+    width = int(round(math.sqrt(megapixels * 1e6 * 4 / 3)))
+    height = int(round(width * 3 / 4))
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    for channel in range(3):
+        wave = np.sin(2 * np.pi * ((3 + channel) * x + 2 * y) + 2 * channel)
+        blocks = ((x * 8).astype(np.int32) + (y * 6).astype(np.int32)) % 2
+        value = 110 + 70 * wave * (0.4 + 0.6 * x) + 30 * blocks
+        value = value + rng.standard_normal((height, width), dtype=np.float32) * 12
+        pixels[:, :, channel] = np.clip(value, 0, 255)
+    return pixels
+
+
+def synthetic_features(megapixels, seed=0):
+    """ImageFeatures construit sur une image synthétique (propriétés de base calculées en numpy)"""
+    pixels = synthetic_image(megapixels, seed)
+    height, width = pixels.shape[:2]
+    avg_red, avg_green, avg_blue = pixels.reshape(-1, 3).mean(axis=0)
+    image_data = {
+        "size": pixels.nbytes / 10 / 1024,  # Taille d'un JPEG typique (~1:10), en Ko
+        "width": width,
+        "height": height,
+        "avg_red": float(avg_red),
+        "avg_green": float(avg_green),
+        "avg_blue": float(avg_blue),
+        "contrast": float(pixels.std()),
+        "edges_detected": True,
+        "file_path": "",
+    }
+    return ImageFeatures(image_data, image=pixels)
+
+
+# === Mesure ===
+
+def measure(fn, repeat=DEFAULT_REPEAT, warmup=DEFAULT_WARMUP):
+    """
+    Mesure `fn()` : échauffement, calibrage puis répétitions.
+
+    Returns:
+        dict: median_ms, mean_ms, stdev_ms, min_ms, max_ms (par appel), runs, calls_per_run
+    """
+    for _ in range(warmup):
+        fn()
+
+    # Calibrage : assez d'appels par répétition pour dépasser MIN_RUN_SECONDS
+    start = time.perf_counter()
+    fn()
+    single = time.perf_counter() - start
+    number = max(1, int(MIN_RUN_SECONDS / single)) if single > 0 else 1000
+
+    samples = []
+    bench_start = time.perf_counter()
+    while len(samples) < repeat:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number * 1000)
+        if len(samples) >= MIN_REPEAT and time.perf_counter() - bench_start > MAX_BENCH_SECONDS:
+            break
+
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "stdev_ms": round(statistics.stdev(samples), 4) if len(samples) > 1 else 0.0,
+        "min_ms": round(min(samples), 4),
+        "max_ms": round(max(samples), 4),
+        "runs": len(samples),
+        "calls_per_run": number,
+    }
+
+
+def bench_case(name, images, repeat, warmup, name_filter=None):
+    """
+    Mesure toutes les étapes sur un cas (une ou plusieurs images).
+    Pour un corpus, un appel = l'étape sur chaque image ; le temps est ramené par image.
+
+    Returns:
+        dict: {"<cas>/<étape>": statistiques}
+    """
+    engine = RulesEngine()
+    classifier = BinClassifier(rules_engine=engine)
+    features = []
+
+    steps = {method: (lambda m=method: [getattr(image, m)() for image in images]) for method in COMPUTE_METHODS}
+    steps["extract_all_features"] = lambda: [image.extract_all_features() for image in images]
+    steps["rules_evaluate"] = lambda: [engine.evaluate(f) for f in features]
+    steps["classify"] = lambda: [classifier.classify(f) for f in features]
+
+    results = {}
+    for step, fn in steps.items():
+        key = f"{name}/{step}"
+        if name_filter and name_filter not in key:
+            continue
+        if step in ("rules_evaluate", "classify") and not features:
+            # Features calculées une seule fois, hors mesure
+            features.extend(image.extract_all_features() for image in images)
+        stats = measure(fn, repeat, warmup)
+        for field in ("median_ms", "mean_ms", "stdev_ms", "min_ms", "max_ms"):
+            stats[field] = round(stats[field] / len(images), 4)
+        results[key] = stats
+        print(f"  {key:50} {stats['median_ms']:10.3f} ms  (±{stats['stdev_ms']:.3f}, n={stats['runs']}x{stats['calls_per_run']})")
+    return results
+
+
+def run(sizes=SYNTHETIC_SIZES_MP, corpus_size=CORPUS_SIZE, repeat=DEFAULT_REPEAT,
+        warmup=DEFAULT_WARMUP, name_filter=None):
+    """Lance toute la suite et retourne le document JSON des résultats"""
+    results = {}
+    if corpus_size:
+        corpus = load_corpus(size=corpus_size)
+        print(f"Corpus : {len(corpus)} images de {CORPUS_DIR}")
+        results.update(bench_case("corpus", corpus, repeat, warmup, name_filter))
+
+    for megapixels in sizes:
+        image = synthetic_features(megapixels)
+        height, width = image.pixels.shape[:2]
+        print(f"Synthétique {megapixels} MP ({width}x{height})")
+        results.update(bench_case(f"synthetic_{megapixels}mp", [image], repeat, warmup, name_filter))
+        del image
+
+    import cv2
+    import PIL
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "pillow": PIL.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "repeat": repeat,
+            "warmup": warmup,
+            "corpus_size": corpus_size,
+            "sizes_mp": list(sizes),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare deux documents de résultats (médianes).
+
+    Returns:
+        list: Régressions [(clé, médiane baseline, médiane actuelle, variation)]
+    """
+    regressions = []
+    print(f"\n{'Mesure':50} {'Baseline':>10} {'Actuel':>10} {'Écart':>8}")
+    for key, stats in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            print(f"{key:50} {'-':>10} {stats['median_ms']:10.3f}   nouveau")
+            continue
+        before, after = base["median_ms"], stats["median_ms"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > tolerance and after - before > NOISE_FLOOR_MS:
+            flag = "  RÉGRESSION"
+            regressions.append((key, before, after, change))
+        elif change < -tolerance and before - after > NOISE_FLOOR_MS:
+            flag = "  amélioration"
+        print(f"{key:50} {before:10.3f} {after:10.3f} {change:+7.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks des features et du moteur de règles")
+    parser.add_argument("--output", help="Écrire les résultats (baseline) dans ce fichier JSON")
+    parser.add_argument("--compare", help="Baseline JSON à comparer aux résultats")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Hausse relative de la médiane tolérée (0.10 = +10 %%)")
+    parser.add_argument("--sizes", default=",".join(map(str, SYNTHETIC_SIZES_MP)),
+                        help="Tailles synthétiques en mégapixels (vide : aucune)")
+    parser.add_argument("--corpus-size", type=int, default=CORPUS_SIZE, help="Images de Data/test (0 : aucune)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Répétitions par mesure")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP, help="Appels d'échauffement")
+    parser.add_argument("--filter", default=None, help="Ne mesurer que les clés contenant ce texte")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    sizes = [float(s) if "." in s else int(s) for s in args.sizes.split(",") if s.strip()]
+    current = run(sizes, args.corpus_size, args.repeat, args.warmup, args.filter)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"\n✅ Résultats écrits dans : {args.output}")
+
+    if baseline is not None:
+        regressions = compare(current, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} régression(s) au-delà de {args.tolerance:.0%}")
+            return 1
+        print(f"\n✅ Aucune régression au-delà de {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+# benchmarks/load_test.py
+
+"""
+Test de charge de bout en bout des routes Flask
+
+LOGIQUE GÉNÉRALE :
+- Chaque worker est un processus qui sert l'application (serveur WSGI
+  threadé de werkzeug) sur un port local, avec la couche de données SQLite
+  (WDP_DATA_BACKEND=sqlite, une base par worker remplie depuis Data/*.csv).
+  Tout ce que l'application écrit est redirigé vers un dossier temporaire
+  par worker : base, uploads, profils, agrégats d'empreinte, file de
+  re-classification du mode éco et PNG du tableau de bord (chart_cache)
+- Des threads clients rejouent un mélange pondéré de routes avec les vraies
+  images de Data/test, à concurrence fixe, pendant une durée donnée
+- Rapport : débit, percentiles de latence et taux d'erreur par route, puis
+  requêtes servies et RSS maximale (VmHWM) par worker
+
+Usage :
+    python -m benchmarks.load_test --workers 2 --concurrency 8 --duration 30
+    python -m benchmarks.load_test --mix classify=1 --concurrency 4 --json /tmp/load.json
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import http.client
+import multiprocessing
+from urllib.parse import quote
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGES_DIR = os.path.join(PROJECT_ROOT, "Data", "test")
+IMAGE_CSV = os.path.join(PROJECT_ROOT, "Data", "BDD_Trash_Analyser_image.csv")
+
+# Routes rejouées : nom -> poids par défaut
+DEFAULT_MIX = {"upload": 1, "classify": 2, "dashboard": 2, "annotate": 2}
+UPLOAD_CITIES = ["Paris", "Lyon", "Marseille", "Toulouse", "Nice"]
+
+PERCENTILES = (50, 90, 99)
+REQUEST_TIMEOUT = 60
+
+
+# === Worker (processus serveur) ===
+
+def _serve(index, base_dir, port_queue):
+    """Processus worker : application Flask sur la couche SQLite, port choisi par le système"""
+    os.environ["WDP_DATA_BACKEND"] = "sqlite"
+    os.environ["WDP_SQLITE_PATH"] = os.path.join(base_dir, f"worker{index}.db")
+    os.environ["WDP_PROFILE_DIR"] = os.path.join(base_dir, "profiles")
+    # Mesures d'empreinte et file du mode éco : jamais celles de cache/ (page /greenit)
+    os.environ["WDP_FOOTPRINT_PATH"] = os.path.join(base_dir, f"footprint{index}.json")
+    os.environ["WDP_ECO_RESCORE_QUEUE"] = os.path.join(base_dir, f"rescore_queue{index}.jsonl")
+    os.environ.setdefault("WDP_LOG_LEVEL", "WARNING")
+    sys.path.insert(0, PROJECT_ROOT)
+
+    import logging
+    from werkzeug.serving import make_server
+    from backend.app import create_app
+    from backend.services import chart_cache
+
+    # Les PNG du tableau de bord sont rendus comme en production mais jamais
+    # demandés par le test : hors de static/plots
+    chart_cache.PLOT_DIR = os.path.join(base_dir, f"plots{index}")
+
+    app = create_app(warmup=True)
+    app.config["UPLOAD_FOLDER"] = os.path.join(base_dir, f"uploads{index}")
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    port_queue.put((index, os.getpid(), server.server_port))
+    server.serve_forever()
+
+
+def peak_rss_kb(pid):
+    """RSS maximale (VmHWM) et actuelle (VmRSS) d'un processus, en Ko (Linux)"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmHWM", "VmRSS"):
+                    values[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return values.get("VmHWM"), values.get("VmRSS")
+
+
+# === Requêtes ===
+
+def _multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, data) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: image/jpeg\r\n\r\n'.encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def build_request(route, rng, images, known_names):
+    """
+    Returns:
+        tuple: (méthode, chemin, corps, en-têtes)
+    """
+    if route in ("upload", "classify"):
+        filename, data = rng.choice(images)
+        fields = {"location": rng.choice(UPLOAD_CITIES), "choice": "IA"} if route == "upload" else {}
+        body, content_type = _multipart(fields, {"file": (filename, data)})
+        path = "/upload/" if route == "upload" else "/upload/classify_image"
+        return "POST", path, body, {"Content-Type": content_type}
+    if route == "dashboard":
+        return "GET", "/dashboard/", None, {}
+    if route == "annotate":
+        return "GET", f"/annotate/annotate/{quote(rng.choice(known_names))}", None, {}
+    raise ValueError(f"Route inconnue : {route}")
+
+
+def send(port, method, path, body, headers):
+    """Envoie une requête (nouvelle connexion) et retourne (statut, secondes)"""
+    start = time.perf_counter()
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=REQUEST_TIMEOUT)
+    try:
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status, time.perf_counter() - start
+    finally:
+        connection.close()
+
+
+def percentile(sorted_values, p):
+    """Percentile par interpolation linéaire sur une liste triée"""
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(samples, elapsed):
+    """Débit, latences (ms) et taux d'erreur d'une liste de (statut, secondes)"""
+    latencies = sorted(seconds * 1000 for _, seconds in samples)
+    errors = sum(1 for status, _ in samples if status is None or status >= 400)
+    summary = {
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "max_ms": round(latencies[-1], 1) if latencies else None,
+    }
+    for p in PERCENTILES:
+        value = percentile(latencies, p)
+        summary[f"p{p}_ms"] = round(value, 1) if value is not None else None
+    return summary
+
+
+# === Orchestration ===
+
+def load_images(directory=IMAGES_DIR):
+    from backend.utils.helpers import allowed_file
+
+    images = []
+    for name in sorted(os.listdir(directory)):
+        if allowed_file(name):
+            with open(os.path.join(directory, name), "rb") as f:
+                images.append((name, f.read()))
+    return images
+
+
+def known_image_names(csv_path=IMAGE_CSV):
+    """Images présentes dans la base de démonstration (cible de /annotate)"""
+    import csv
+
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return [row["name_image"] for row in csv.DictReader(f) if row.get("name_image")]
+
+
+def run_load(workers=1, concurrency=4, duration=20.0, mix=None, seed=0):
+    """
+    Lance les workers, applique la charge puis mesure.
+
+    Returns:
+        dict: {"config", "total", "routes": {route: résumé}, "workers": [...]}
+    """
+    mix = mix or DEFAULT_MIX
+    routes = [route for route, weight in mix.items() if weight > 0]
+    weights = [mix[route] for route in routes]
+    images = load_images()
+    names = known_image_names()
+
+    base_dir = tempfile.mkdtemp(prefix="wdp-load-")
+    context = multiprocessing.get_context("spawn")
+    port_queue = context.Queue()
+    processes = [context.Process(target=_serve, args=(i, base_dir, port_queue), daemon=True)
+                 for i in range(workers)]
+    try:
+        for process in processes:
+            process.start()
+        servers = sorted(port_queue.get(timeout=120) for _ in processes)
+        ports = [port for _, _, port in servers]
+
+        # Échauffement : chaque route une fois sur chaque worker (non mesuré)
+        rng = random.Random(seed)
+        for port in ports:
+            for route in routes:
+                send(port, *build_request(route, rng, images, names))
+
+        samples = {route: [] for route in routes}
+        served = [0] * workers
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def client(index):
+            local_rng = random.Random(seed * 1000 + index)
+            worker = index % workers
+            while time.perf_counter() < deadline:
+                route = local_rng.choices(routes, weights)[0]
+                request = build_request(route, local_rng, images, names)
+                try:
+                    status, seconds = send(ports[worker], *request)
+                except (OSError, http.client.HTTPException):
+                    status, seconds = None, REQUEST_TIMEOUT
+                with lock:
+                    samples[route].append((status, seconds))
+                    served[worker] += 1
+
+        threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        all_samples = [s for route_samples in samples.values() for s in route_samples]
+        worker_stats = []
+        for (index, pid, port), count in zip(servers, served):
+            peak, current = peak_rss_kb(pid)
+            worker_stats.append({
+                "worker": index,
+                "pid": pid,
+                "requests": count,
+                "throughput_rps": round(count / elapsed, 2),
+                "peak_rss_mb": round(peak / 1024, 1) if peak else None,
+                "rss_mb": round(current / 1024, 1) if current else None,
+            })
+
+        return {
+            "config": {"workers": workers, "concurrency": concurrency, "duration_s": duration,
+                       "mix": mix, "images": len(images), "elapsed_s": round(elapsed, 2)},
+            "total": summarize(all_samples, elapsed),
+            "routes": {route: summarize(route_samples, elapsed) for route, route_samples in samples.items()},
+            "workers": worker_stats,
+        }
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join(timeout=5)
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+
+def print_report(report):
+    config = report["config"]
+    print(f"\n{config['workers']} worker(s), concurrence {config['concurrency']}, "
+          f"{config['elapsed_s']} s, mélange {config['mix']}\n")
+    header = f"{'Route':12} {'Req.':>6} {'Req/s':>8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'Erreurs':>8}"
+    print(header)
+    print("-" * len(header))
+    for route, s in list(report["routes"].items()) + [("TOTAL", report["total"])]:
+        print(f"{route:12} {s['requests']:6d} {s['throughput_rps']:8.2f} {s['p50_ms'] or 0:9.1f} "
+              f"{s['p90_ms'] or 0:9.1f} {s['p99_ms'] or 0:9.1f} {s['max_ms'] or 0:9.1f} {s['error_rate']:8.2%}")
+    print()
+    for w in report["workers"]:
+        print(f"Worker {w['worker']} (pid {w['pid']}) : {w['requests']} requêtes, {w['throughput_rps']} req/s, "
+              f"RSS max {w['peak_rss_mb']} Mo (actuelle {w['rss_mb']} Mo)")
+
+
+def parse_mix(text):
+    """ "upload=1,classify=2" -> {"upload": 1, "classify": 2} """
+    mix = {}
+    for item in text.split(","):
+        route, _, weight = item.partition("=")
+        route = route.strip()
+        if route not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"route inconnue : {route} (choix : {', '.join(DEFAULT_MIX)})")
+        mix[route] = float(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge des routes Flask (couche de données SQLite)")
+    parser.add_argument("--workers", type=int, default=1, help="Processus serveurs")
+    parser.add_argument("--concurrency", type=int, default=4, help="Clients simultanés (répartis sur les workers)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Durée de la charge (secondes)")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="Poids des routes, ex : upload=1,classify=2,dashboard=2,annotate=2")
+    parser.add_argument("--seed", type=int, default=0, help="Graine du tirage des routes et des images")
+    parser.add_argument("--json", default=None, help="Écrire aussi le rapport dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    report = run_load(args.workers, args.concurrency, args.duration, args.mix, args.seed)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 1 if report["total"]["error_rate"] > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
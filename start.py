@@ -1,10 +1,15 @@
 import os
 import sys
-import subprocess
 
 # Ajoute le dossier courant au sys.path
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
-# Exécute backend.app avec l'interpréteur Python du venv actif
-python_executable = sys.executable  # Ce sera le bon venv (ex: venv\Scripts\python.exe)
-subprocess.run([python_executable, "-m", "backend.app"])
+from backend.app import create_app
+
+# Lancement dans le même processus (plus de sous-processus Python).
+# En mode debug, le reloader relance le script dans un processus enfant
+# (WERKZEUG_RUN_MAIN=true) : seul ce processus qui sert les requêtes peut être
+# pré-chauffé, et seulement si WDP_WARMUP=1 (décision laissée à create_app).
+if __name__ == "__main__":
+    app = create_app(warmup=None if os.environ.get("WERKZEUG_RUN_MAIN") == "true" else False)
+    app.run(debug=True)